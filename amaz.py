@@ -1,49 +1,76 @@
-##Criado para tratar os dados previamente 
-import pandas as pd 
-import geopandas as gpd
-import plotly.express as px 
-import numpy as np 
-import mapclassify	
+##Criado para tratar os dados previamente
+"""
+Pré-processamento dos limites geográficos.
 
+    python amaz.py municipios <Mun_Amazonia_Legal_2022.shp>
+        simplifica o shapefile do IBGE e grava limite_municipios_amz_legal.geojson
 
-gdf_mun = gpd.read_file(r"F:\VSCode\01 - CONSULTORIA\Ana\Asset\Mun_Amazonia_Legal_2022.shp")
-gdf_mun.drop(columns=['CD_UF','AREA_INT','AREA_TOT','PORC_INT','NM_REGIAO'], inplace=True)
+    python amaz.py piramide [camada ...]
+        grava os níveis simplificados de cada camada de limites
+        (<arquivo>.z<N>.geojson, N em app.geo.LEVELS) em SIMEX_DATA_DIR
+        (padrão: datasets/); sem camadas, processa todas. Os níveis não são
+        versionados: o Procfile roda este passo antes do gunicorn a cada
+        deploy (exige shapely>=2.1). Sem eles o app usa os limites originais
+        em todos os zooms e avisa no log.
 
-# Define a tolerância para a simplificação (ajuste o valor conforme necessário)
-tolerancia = 0.01  # Unidade é geralmente em graus, ajuste conforme a precisão desejada
+Os níveis guardam só as colunas de identificação (geo_key e, se houver,
+geo_id) e a geometria, simplificada como cobertura: as arestas
+compartilhadas entre áreas vizinhas são simplificadas juntas (sem buracos
+nem sobreposições). O app usa o nível que corresponde ao zoom do mapa e o
+GeoJSON original nos zooms mais próximos, e envia aos mapas a topologia
+quantizada de cada nível (app.topology; o tamanho dos arcos é mostrado junto
+de cada arquivo).
+"""
+import sys
 
-gdf_mun['geometry'] = gdf_mun['geometry'].simplify(tolerance=tolerancia, preserve_topology=True)
+import geopandas as gpd
+import shapely
 
-gdf_mun = gdf_mun.to_crs(epsg=4674)
+from app import datasets, geo
+from app.topology import Topology
 
-output_path_geo = 'datasets/geojson/'
-gdf_mun.to_file(f'{output_path_geo}limite_municipios_amz_legal.geojson')
 
+def municipios(shp):
+    gdf_mun = gpd.read_file(shp)
+    gdf_mun.drop(columns=['CD_UF','AREA_INT','AREA_TOT','PORC_INT','NM_REGIAO'], inplace=True)
 
+    # Define a tolerância para a simplificação (ajuste o valor conforme necessário)
+    tolerancia = 0.01  # Unidade é geralmente em graus, ajuste conforme a precisão desejada
 
-# import geopandas as gpd
+    gdf_mun['geometry'] = gdf_mun['geometry'].simplify(tolerance=tolerancia, preserve_topology=True)
 
+    gdf_mun = gdf_mun.to_crs(epsg=4674)
 
-# def load_geojson(url):
-#     try:
-#         return gpd.read_file(url)
-#     except Exception as e:
-#         print(f"Erro ao carregar {url}: {e}")
-#         return None
+    output = datasets.local_path('municipios', 'geojson')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    gdf_mun.to_file(output)
 
-# # Carregar GeoJSON
-# roi = load_geojson('https://github.com/ScriptsRemote/Amazon/raw/main/geojson/AMZ_municipios.geojson')
-# roi
 
-# ##Geoejson simplificado 
-# gdf_edit = roi.drop(columns=['UF','AREA_KM2'])
-# gdf_edit
+def piramide(camadas):
+    for key in camadas or datasets.DATASETS:
+        gdf = datasets.load_geojson(key)
+        if gdf.empty:
+            print(f"{key}: sem limites, ignorado")
+            continue
+        spec = datasets.DATASETS[key]
+        cols = [c for c in (spec['geo_key'], spec.get('geo_id')) if c in gdf.columns]
+        gdf = gdf[[*cols, gdf.geometry.name]]
+        total = shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum()
+        for z in geo.LEVELS:
+            nivel = geo.simplify(gdf, z)
+            output = datasets.local_path(key, f'geojson.z{z}')
+            output.parent.mkdir(parents=True, exist_ok=True)
+            nivel.to_file(output, driver='GeoJSON')
+            n = shapely.get_num_coordinates(nivel.geometry.to_numpy()).sum()
+            topo = Topology(nivel, datasets.geo_ids(key, nivel), geo.quantum(z), key)
+            print(f"{key} z{z}: tolerância {geo.pixel(z):.4f}°, {n}/{total} vértices ({n / total:.0%}), "
+                  f"{output.stat().st_size / 1024:.0f} KB (TopoJSON {topo.nbytes / 1024:.0f} KB) → {output}")
 
-# # Define a tolerância para a simplificação (ajuste o valor conforme necessário)
-# tolerancia = 0.01  # Unidade é geralmente em graus, ajuste conforme a precisão desejada
- 
-# # Aplica a simplificação mantendo a topologia
-# gdf_edit['geometry'] = gdf_edit['geometry'].simplify(tolerance=tolerancia, preserve_topology=True)
 
-# output_path_geo = 'datasets/geojson/'
-# gdf_edit.to_file(f'{output_path_geo}limite_municipios_amz_legal.geojson')
\ No newline at end of file
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('municipios', 'piramide'):
+        sys.exit(__doc__)
+    if sys.argv[1] == 'municipios':
+        municipios(sys.argv[2])
+    else:
+        piramide(sys.argv[2:])
@@ -1,5 +1,8 @@
 # app/__init__.py
-from flask import Flask
+import os
+
+from flask import Flask, jsonify
+from app import datasets, features, figure_cache, query_cache, tiles, warmup
 from app.dashboards.simex_assentamentos import register_simex_assentamentos_dashboard
 from app.dashboards.simex_imoveis_rurais import register_simex_imoveis_rurais_dashboard
 from app.dashboards.simex_municipios import register_simex_municipios_dashboard
@@ -9,11 +12,26 @@ from app.dashboards.simex_uc import register_simex_uc_dashboard
 
 def create_app():
     server = Flask(__name__)
-    register_simex_assentamentos_dashboard(server)  # rota /simex_assentamentos/
-    register_simex_imoveis_rurais_dashboard(server) # rota /simex_imoveis_rurais/
-    register_simex_municipios_dashboard(server)  # rota /simex_municipios/
-    register_simex_terra_dest_dashboard(server)  # rota /simex_terra_dest/
-    register_simex_terras_indigenas_dashboard(server) # rota /simex_ti/
-    register_simex_uc_dashboard(server) # rota /simex_uc/
+    datasets.prefetch()  # downloads remotos em paralelo (só com SIMEX_REMOTE=1)
+    if os.environ.get("SIMEX_PRELOAD"):
+        datasets.preload()  # master do gunicorn: carrega e grava o snapshot antes do fork
+    apps = [
+        register_simex_assentamentos_dashboard(server),  # rota /simex_assentamentos/
+        register_simex_imoveis_rurais_dashboard(server), # rota /simex_imoveis_rurais/
+        register_simex_municipios_dashboard(server),  # rota /simex_municipios/
+        register_simex_terra_dest_dashboard(server),  # rota /simex_terra_dest/
+        register_simex_terras_indigenas_dashboard(server), # rota /simex_ti/
+        register_simex_uc_dashboard(server), # rota /simex_uc/
+    ]
+
+    features.register(server)  # rota /simex/_features/ (GeoJSON dos mapas)
+    tiles.register(server)  # rota /simex/_tiles/ (tiles vetoriais dos limites)
+
+    @server.route("/simex/_stats")
+    def simex_stats():
+        # Acertos/faltas dos caches do worker que atendeu a requisição.
+        return jsonify({"query_cache": query_cache.stats(), "figure_cache": figure_cache.stats()})
+
+    warmup.run(server, apps)  # visões padrão e por estado (só com SIMEX_WARMUP)
     
     return server 
@@ -0,0 +1,95 @@
+# app/__main__.py
+"""
+Linha de comando do SIMEX.
+
+    python -m app cache prewarm [--all]   # baixa/revalida as URLs dos datasets
+    python -m app cache info              # lista o conteúdo do cache HTTP
+    python -m app cache prune             # remove blobs órfãos
+    python -m app memory                  # memória de cada dataset antes/depois do esquema
+    python -m app figures info|clear      # cache de figuras compartilhado entre workers
+    python -m app tiles build [--zmax N] [camada ...]   # pré-corta os tiles vetoriais
+    python -m app tiles clear             # apaga os tiles gravados em disco
+    python -m app backends [--engine E ...] [--scale N ...] [camada ...]   # pandas × DuckDB/Polars
+"""
+from __future__ import annotations
+
+import argparse, json, logging, sys
+
+from app import bench, datasets, figure_cache, http_cache, tiles
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app", description="Utilitários do SIMEX")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    cache = sub.add_parser("cache", help="cache HTTP dos datasets remotos")
+    csub = cache.add_subparsers(dest="action", required=True)
+    pw = csub.add_parser("prewarm", help="baixa/revalida as URLs dos datasets")
+    pw.add_argument("--all", action="store_true",
+                    help="inclui datasets que já têm cópia local em datasets/")
+    csub.add_parser("info", help="lista o conteúdo do cache")
+    csub.add_parser("prune", help="remove blobs órfãos")
+
+    sub.add_parser("memory", help="memória dos datasets antes/depois do esquema declarado")
+
+    figs = sub.add_parser("figures", help="cache de figuras serializadas (SQLite)")
+    figs.add_argument("action", choices=("info", "clear"))
+
+    tl = sub.add_parser("tiles", help="tiles vetoriais (MVT) das camadas de limites")
+    tsub = tl.add_subparsers(dest="action", required=True)
+    tb = tsub.add_parser("build", help="pré-corta os tiles que tocam alguma área")
+    tb.add_argument("camadas", nargs="*", metavar="camada",
+                    help=f"datasets (padrão: todos): {', '.join(datasets.DATASETS)}")
+    tb.add_argument("--zmax", type=int, default=tiles.ZCUT,
+                    help=f"último zoom pré-cortado (padrão: {tiles.ZCUT}, SIMEX_TILE_ZMAX)")
+    tsub.add_parser("clear", help="apaga os tiles gravados em disco")
+
+    bk = sub.add_parser("backends", help="compara os backends de consulta com o cubo pandas")
+    bk.add_argument("camadas", nargs="*", metavar="camada",
+                    help=f"datasets (padrão: todos): {', '.join(datasets.DATASETS)}")
+    bk.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100],
+                    help="réplicas da tabela (padrão: 1 10 100)")
+    bk.add_argument("--engine", nargs="+", default=["duckdb"], choices=datasets.BACKENDS[1:],
+                    help="motores comparados ao pandas (padrão: duckdb)")
+    bk.add_argument("--repeat", type=int, default=5, help="repetições de cada medida (padrão: 5)")
+
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if args.cmd == "cache":
+        if args.action == "prewarm":
+            return 1 if http_cache.prewarm(args.all) else 0
+        if args.action == "info":
+            http_cache.info()
+        else:
+            http_cache.prune()
+    elif args.cmd == "memory":
+        for key in datasets.DATASETS:
+            datasets.load_parquet(key)
+        for key, (before, after) in datasets.memory_report().items():
+            print(f"{key:16} {before / 2**20:8.2f} MB → {after / 2**20:7.2f} MB  ({after / before:.0%})")
+    elif args.cmd == "figures":
+        if args.action == "clear":
+            figure_cache.CACHE.clear()
+        print(json.dumps(figure_cache.stats(), indent=1))
+    elif args.cmd == "tiles":
+        if args.action == "clear":
+            tiles.clear()
+        else:
+            print(json.dumps(tiles.build(args.camadas, args.zmax), indent=1))
+    elif args.cmd == "backends":
+        res = bench.compare(args.camadas, args.scale, args.engine, args.repeat)
+        engines = ["pandas", *args.engine]
+        print(f"{'dataset':16} {'escala':>6} {'linhas':>9}  " + "  ".join(
+            f"{e + ' montagem/consultas (ms)':>34}" for e in engines) + "  resultado")
+        for key, by_scale in res.items():
+            for n, r in by_scale.items():
+                cols = "  ".join(f"{r['build_ms'][e]:>23.1f} / {r['ms'][e]:<8.1f}" for e in engines)
+                print(f"{key:16} {n:>5}× {r['rows']:>9}  {cols}  "
+                      f"{'iguais' if not r['mismatches'] else 'DIFERENTES: ' + ', '.join(r['mismatches'])}")
+        return 1 if any(r["mismatches"] for by_scale in res.values() for r in by_scale.values()) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
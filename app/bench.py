@@ -0,0 +1,96 @@
+# app/bench.py
+"""
+Comparação dos backends de consulta com o cubo em memória (``app.cube``).
+
+    python -m app backends [--engine duckdb polars] [--scale 1 10 100] [camada ...]
+
+Para cada dataset e escala ``N``, a tabela é replicada ``N`` vezes (o
+parquet replicado vai para um diretório temporário), as consultas de uma
+interação típica dos dashboards (``_workload``) rodam no cubo pandas e em
+cada motor pedido, e os resultados precisam ser os mesmos. A latência é a
+mediana de ``repeat`` execuções da interação inteira.
+"""
+from __future__ import annotations
+
+import statistics, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app import datasets
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and np.allclose(a, b, rtol=1e-9, atol=1e-6)
+    if isinstance(a, pd.DataFrame):
+        if list(a.columns) != list(b.columns) or len(a) != len(b):
+            return False
+        return all(np.allclose(a[c].to_numpy("float64"), b[c].to_numpy("float64"), rtol=1e-9, atol=1e-6)
+                   if pd.api.types.is_float_dtype(a[c]) else
+                   pd.Series(a[c].to_numpy(object)).equals(pd.Series(b[c].to_numpy(object)))
+                   for c in a.columns)
+    return a == b
+
+
+def _workload(key: str, c, ufs, cat, years) -> dict:
+    """Consultas de uma interação típica do dashboard."""
+    y0, y1 = years[0], years[-1]
+    top = datasets.named(key, c.totals(y0, y1).nlargest(10, c.value))[datasets.AREA_ID].tolist()
+    out = {
+        "totals": c.totals(y0, y1),
+        "totals_uf": c.totals(y0, y1, ufs=ufs),
+        "totals_cat": c.totals(y1 - 3, y1, cat=cat),
+        "by_uf": c.by_uf(y0, y1, entities=top),
+        "matrix": c.matrix(y0, y1, ufs=ufs, focus=top, years=years),
+        "years": c.active_years(y0, y1, entities=top[:1]),
+    }
+    for col in c.first:
+        out[col] = c.attribute(col).reset_index()
+        out[f"{col}_uf"] = c.by_attribute(col, y0, y1, cat=cat, uf=True)
+    return out
+
+
+def _timed(fn, repeat: int) -> float:
+    ts = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        ts.append(time.perf_counter() - t)
+    return statistics.median(ts)
+
+
+def compare(keys=(), scales=(1, 10, 100), engines=("duckdb",), repeat: int = 5) -> dict:
+    """``{key: {scale: medidas}}``: linhas, tempo de montagem e de uma
+    interação (ms) de cada backend e as consultas com resultado diferente."""
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for key in keys or datasets.DATASETS:
+            raw = pd.read_parquet(datasets.resolve(key, "parquet"))
+            typed = datasets.load_parquet(key)
+            ufs = list(typed["sigla_uf"].value_counts().index[:2])
+            cat = typed["categoria"].value_counts().index[0]
+            years = sorted(int(a) for a in typed["ano"].unique())
+            for n in scales:
+                src = Path(tmp) / f"{key}.x{n}.parquet"
+                pd.concat([raw] * n, ignore_index=True).to_parquet(src)
+                df = pd.concat([typed] * n, ignore_index=True)
+                t = time.perf_counter()
+                ref = datasets._pandas_cube(key, df)
+                r = {"rows": len(df), "build_ms": {"pandas": (time.perf_counter() - t) * 1e3}, "ms": {},
+                     "mismatches": []}
+                expected = _workload(key, ref, ufs, cat, years)
+                r["ms"]["pandas"] = _timed(lambda: _workload(key, ref, ufs, cat, years), repeat) * 1e3
+                n_rows = int(df["sigla_uf"].isin(ufs[:1]).sum())
+                for engine in engines:
+                    t = time.perf_counter()
+                    c = datasets.new_cube(key, engine, str(src))
+                    r["build_ms"][engine] = (time.perf_counter() - t) * 1e3
+                    got = _workload(key, c, ufs, cat, years)
+                    r["mismatches"] += [f"{engine}:{q}" for q in expected if not _same(expected[q], got[q])]
+                    if len(c.rows(ufs=ufs[:1])) != n_rows:
+                        r["mismatches"].append(f"{engine}:rows")
+                    r["ms"][engine] = _timed(lambda: _workload(key, c, ufs, cat, years), repeat) * 1e3
+                out.setdefault(key, {})[n] = r
+    return out
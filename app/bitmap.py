@@ -0,0 +1,67 @@
+# app/bitmap.py
+"""
+Índice de bitsets das linhas de uma tabela, por valor de cada dimensão.
+
+Para cada valor de cada dimensão (ano, UF, categoria, área) guarda um
+bitset empacotado em palavras de 64 bits com as linhas que têm esse valor.
+Um filtro vira operações bit a bit: OU entre os valores pedidos de uma
+dimensão, E entre as dimensões, e só no fim o bitset é expandido para as
+posições das linhas. O custo não depende de quantos estados ou áreas o
+usuário marcou (só do número de palavras, linhas / 64).
+
+Como no ``isin`` / ``==`` dos dashboards, uma dimensão sem valores pedidos
+não filtra; valores desconhecidos não casam com nenhuma linha e linhas sem
+valor na dimensão nunca entram quando ela é filtrada.
+
+Serve às consultas que devolvem linhas da tabela (hoje a exportação CSV,
+``datasets.filtered``). Os callbacks de figuras não filtram linhas:
+totais, séries e rankings saem do cubo com somas de prefixo
+(``app.cube``), que responde a qualquer filtro sem percorrer a tabela e é
+mais rápido que bitsets seguidos de ``groupby`` (0,2 contra 1,2 ms em
+municípios, 0,5 contra 1,2 ms em imóveis rurais).
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def _pack(codes: np.ndarray, k: int, words: int) -> np.ndarray:
+    """Matriz ``k`` × ``words`` (uint64): bit ``i`` da linha ``c`` ligado se ``codes[i] == c``."""
+    bits = np.zeros((k, words * 8), dtype=np.uint8)
+    rows = np.flatnonzero(codes >= 0)
+    np.bitwise_or.at(bits, (codes[rows], rows >> 3), (1 << (rows & 7)).astype(np.uint8))
+    return bits.view(np.uint64)
+
+
+class BitmapIndex:
+    """Bitsets das linhas de cada valor das dimensões ``dims`` (categóricas)."""
+
+    def __init__(self, dims: dict[str, pd.Categorical]):
+        self.n = len(next(iter(dims.values()))) if dims else 0
+        self.words = (self.n + 63) // 64
+        self.values = {d: pd.Index(c.categories) for d, c in dims.items()}
+        self.bits = {d: _pack(np.asarray(c.codes, dtype=np.int64), len(c.categories), self.words)
+                     for d, c in dims.items()}
+        self.nbytes = sum(b.nbytes for b in self.bits.values())
+
+    def bitset(self, **filters) -> np.ndarray:
+        """Bitset das linhas que passam em ``filters`` (``dimensão=valores``)."""
+        out = np.full(self.words, np.uint64(0xFFFFFFFFFFFFFFFF))
+        for dim, values in filters.items():
+            if values is None or not len(values):
+                continue
+            ix = self.values[dim].get_indexer(list(values))
+            ix = ix[ix >= 0]
+            if not len(ix):
+                return np.zeros(self.words, dtype=np.uint64)
+            out &= np.bitwise_or.reduce(self.bits[dim][ix], axis=0)
+        return out
+
+    def mask(self, **filters) -> np.ndarray:
+        """Máscara booleana (uma posição por linha) do filtro."""
+        return np.unpackbits(self.bitset(**filters).view(np.uint8), count=self.n, bitorder="little").view(bool)
+
+    def rows(self, **filters) -> np.ndarray:
+        """Posições das linhas que passam no filtro."""
+        return np.flatnonzero(self.mask(**filters))
@@ -0,0 +1,54 @@
+# app/clientside.py
+"""
+Callbacks que rodam no navegador (``app.clientside_callback``), como a
+injeção de CSS: abrir e fechar os modais e a contabilidade das seleções de
+áreas (clique em barra liga/desliga um destaque, clique no mapa liga/desliga
+uma área do filtro, a lista do modal substitui as áreas, o reset limpa
+tudo). Nada disso depende dos dados, então não vira requisição para os
+workers do gunicorn; só o que consulta o cubo ou o índice espacial (caixa
+ou laço no mapa, ``datasets.select``) continua em Python.
+
+Os ids dos componentes são os mesmos nos seis dashboards.
+"""
+from __future__ import annotations
+
+# abre/fecha um modal: Input(abrir), Input(fechar), State(is_open)
+TOGGLE = "function(n1, n2, is_open) { return (n1 || n2) ? !is_open : is_open; }"
+
+# destaques (selected-areas-store): Input(barras.clickData), Input(reset), State(store)
+HIGHLIGHTS = """function(bar_click, reset, areas) {
+    const C = window.dash_clientside;
+    const trig = C.callback_context.triggered.map(t => t.prop_id);
+    if (trig.includes("reset-button-top.n_clicks")) { return []; }
+    const point = bar_click && (bar_click.points || [])[0];
+    let id = point && point.customdata;   // id da área (ou [id, rótulo])
+    if (Array.isArray(id)) { id = id[0]; }
+    if (id === undefined || id === null) { return C.no_update; }   // ponto sem área
+    areas = areas || [];
+    return areas.includes(id) ? areas.filter(a => a !== id) : areas.concat([id]);
+}"""
+
+
+def areas(modal: bool = True) -> str:
+    """Áreas do filtro (selected-area) e valor da lista do modal:
+    Input(mapa.clickData), Input(lista.value), Input(reset), State(store).
+
+    ``modal=False``: a lista só é limpa, sem mudar a seleção (dashboards em
+    que ela não filtra).
+    """
+    return """function(map_click, listed, reset, areas) {
+    const C = window.dash_clientside;
+    const trig = C.callback_context.triggered.map(t => t.prop_id);
+    if (trig.includes("reset-button-top.n_clicks")) { return [[], null]; }
+    if (trig.includes("choropleth-map.clickData") && map_click) {
+        const point = (map_click.points || [])[0];
+        const id = point && point.location;   // id da área = "id" da feição
+        if (id === undefined || id === null) { return [C.no_update, C.no_update]; }   // ponto sem área
+        areas = areas || [];
+        return [areas.includes(id) ? areas.filter(a => a !== id) : areas.concat([id]), C.no_update];
+    }
+    if (%s && listed && listed.length) {
+        return [typeof listed === "string" ? [listed] : listed, null];
+    }
+    return [C.no_update, null];
+}""" % ("true" if modal else "false")
@@ -0,0 +1,184 @@
+# app/cube.py
+"""
+Cubo pré-agregado de ``area_ha`` por área × ano × UF × categoria.
+
+O eixo dos anos guarda somas acumuladas: o total de qualquer intervalo
+``[y0, y1]`` é ``cum[:, y1 + 1] - cum[:, y0]``. Top-10, mapa, opções de
+áreas, série anual e pizzas (``by_attribute``) saem de subtrações de fatias
+e somas sobre eixos pequenos, sem varrer a tabela a cada interação. Uma contagem de linhas
+acumulada do mesmo jeito reproduz o ``observed=True`` do ``groupby`` (só
+aparecem combinações que têm linhas no filtro).
+
+Linhas sem UF ou sem categoria ficam numa posição extra do respectivo eixo:
+entram quando o filtro está vazio e nunca quando ele está preenchido, como
+no ``isin`` / ``==`` dos dashboards.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+_NONE = np.iinfo(np.int64).max   # célula sem linhas no índice de "primeira linha"
+
+
+class Cube:
+    """Cubo de um dataset já tipado (colunas categóricas, ``ano`` inteiro).
+
+    ``first``: colunas cujo valor da primeira linha de cada área (na ordem
+    da tabela) deve acompanhar os totais, como o ``agg({"col": "first"})``.
+    """
+
+    def __init__(self, df: pd.DataFrame, entity: str, value: str = "area_ha",
+                 first: tuple[str, ...] = ()):
+        self.entity, self.value = entity, value
+        self.entities = df[entity].cat.categories
+        self.ufs = df["sigla_uf"].cat.categories
+        self.cats = df["categoria"].cat.categories
+        ano = df["ano"].to_numpy()
+        self.y0 = int(ano.min())
+        self.years = np.arange(self.y0, int(ano.max()) + 1)
+
+        e = df[entity].cat.codes.to_numpy()
+        u = _codes(df["sigla_uf"], len(self.ufs))
+        c = _codes(df["categoria"], len(self.cats))
+        rows = np.flatnonzero(e >= 0)   # groupby descarta área ausente
+        shape = (len(self.entities), len(self.years), len(self.ufs) + 1, len(self.cats) + 1)
+        idx = np.ravel_multi_index((e[rows], ano[rows] - self.y0, u[rows], c[rows]), shape)
+        size = int(np.prod(shape))
+
+        area = np.bincount(idx, weights=df[value].to_numpy("float64")[rows], minlength=size)
+        count = np.bincount(idx, minlength=size)
+        self.cum = _prefix(area.reshape(shape))
+        self.cnt = _prefix(count.reshape(shape))
+
+        self.first = {}
+        if first:
+            pos = np.full(size, _NONE)
+            np.minimum.at(pos, idx, rows)
+            self._pos = pos.reshape(shape)
+            self.first = {col: df[col].to_numpy() for col in first}
+        self.nbytes = self.cum.nbytes + self.cnt.nbytes + (self._pos.nbytes if first else 0)
+
+    # ─────────── seleção ───────────
+    def _span(self, y0, y1) -> tuple[int, int]:
+        i0 = min(max(int(y0) - self.y0, 0), len(self.years))
+        return i0, min(max(int(y1) - self.y0 + 1, i0), len(self.years))
+
+    def _axes(self, cat=None, ufs=None, entities=None):
+        """Índices de área, UF e categoria do filtro (vazio = sem filtro)."""
+        ie = _take(self.entities, entities, len(self.entities))
+        iu = _take(self.ufs, ufs, len(self.ufs) + 1)
+        ic = _take(self.cats, [cat] if cat else None, len(self.cats) + 1)
+        return ie, iu, ic
+
+    def _block(self, y0, y1, cat, ufs, entities):
+        """Área e contagem do intervalo por (área, UF, categoria) filtrados."""
+        i0, i1 = self._span(y0, y1)
+        ie, iu, ic = self._axes(cat, ufs, entities)
+        sel = np.ix_(ie, iu, ic)
+        area = (self.cum[:, i1] - self.cum[:, i0])[sel]
+        count = (self.cnt[:, i1] - self.cnt[:, i0])[sel]
+        return ie, iu, area, count
+
+    # ─────────── consultas ───────────
+    def totals(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """``groupby(entity).agg(area_ha="sum", <first>="first")`` do filtro,
+        na ordem das categorias da coluna."""
+        ie, _, area, count = self._block(y0, y1, cat, ufs, entities)
+        has = count.sum(axis=(1, 2)) > 0
+        ie = ie[has]
+        out = pd.DataFrame({self.entity: pd.Categorical.from_codes(ie, dtype=self._dtype()),
+                            self.value: area[has].sum(axis=(1, 2))})
+        if self.first:
+            i0, i1 = self._span(y0, y1)
+            _, iu, ic = self._axes(cat, ufs, entities)
+            pos = self._pos[ie, i0:i1][:, :, iu][:, :, :, ic].min(axis=(1, 2, 3), initial=_NONE)
+            for col, values in self.first.items():
+                out[col] = values[pos]
+        return out
+
+    def by_uf(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """``groupby([entity, "sigla_uf"])[area_ha].sum()`` do filtro."""
+        ie, iu, area, count = self._block(y0, y1, cat, ufs, entities)
+        area, count = area.sum(axis=2), count.sum(axis=2)
+        e, u = np.nonzero(count)
+        ufs_ = self.ufs.append(pd.Index([np.nan]))
+        return pd.DataFrame({self.entity: pd.Categorical.from_codes(ie[e], dtype=self._dtype()),
+                             "sigla_uf": ufs_[iu[u]], self.value: area[e, u]})
+
+    def _yearly(self, y0, y1, cat, ufs, entities):
+        """Área e contagem por (área, ano) do filtro, anos em ``[y0, y1]``."""
+        i0, i1 = self._span(y0, y1)
+        ie, iu, ic = self._axes(cat, ufs, entities)
+        area = np.diff(self.cum[ie, i0:i1 + 1], axis=1)[:, :, iu][:, :, :, ic].sum(axis=(2, 3))
+        count = np.diff(self.cnt[ie, i0:i1 + 1], axis=1)[:, :, iu][:, :, :, ic].sum(axis=(2, 3))
+        return ie, self.years[i0:i1], area, count
+
+    def series(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """``groupby(["ano", entity])[area_ha].sum()`` do filtro (formato longo)."""
+        ie, years, area, count = self._yearly(y0, y1, cat, ufs, entities)
+        y, e = np.nonzero(count.T)   # ordem do groupby: ano, depois área
+        return pd.DataFrame({"ano": years[y],
+                             self.entity: pd.Categorical.from_codes(ie[e], dtype=self._dtype()),
+                             self.value: area[e, y]})
+
+    def matrix(self, y0, y1, cat=None, ufs=None, entities=None, focus=(), years=None) -> np.ndarray:
+        """Matriz densa ``len(focus)`` × ``len(years)`` das áreas anuais do filtro.
+
+        Linhas na ordem de ``focus``; colunas em ``years`` (padrão: todo o
+        intervalo ``[y0, y1]``). Áreas fora do filtro ou desconhecidas e anos
+        sem dados ficam zerados, como no ``reindex(..., fill_value=0)``.
+        """
+        years = np.arange(int(y0), int(y1) + 1) if years is None else np.asarray(years, dtype=np.int64)
+        out = np.zeros((len(focus), len(years)))
+        i0, i1 = self._span(y0, y1)
+        ie, iu, ic = self._axes(cat, ufs, entities)
+        rows = self.entities.get_indexer(list(focus))
+        keep = np.flatnonzero(np.isin(rows, ie))
+        col = years - self.y0 - i0
+        cols = np.flatnonzero((col >= 0) & (col < i1 - i0))
+        if len(keep) and len(cols):
+            area = np.diff(self.cum[rows[keep], i0:i1 + 1], axis=1)[:, :, iu][:, :, :, ic].sum(axis=(2, 3))
+            out[np.ix_(keep, cols)] = area[:, col[cols]]
+        return out
+
+    def active_years(self, y0, y1, cat=None, ufs=None, entities=None) -> list[int]:
+        """Anos do intervalo com alguma linha no filtro."""
+        _, years, _, count = self._yearly(y0, y1, cat, ufs, entities)
+        return [int(y) for y in years[count.sum(axis=0) > 0]]
+
+    def attribute(self, col: str) -> pd.Series:
+        """Valor de ``col`` na primeira linha de cada área (atributos fixos da área)."""
+        pos = self._pos.min(axis=(1, 2, 3))
+        has = pos != _NONE
+        return pd.Series(self.first[col][pos[has]], index=self.entities[has], name=col)
+
+    def by_attribute(self, col: str, y0, y1, cat=None, ufs=None, entities=None, uf: bool = False) -> pd.DataFrame:
+        """Soma do filtro por valor do atributo fixo ``col`` das áreas
+        (``attribute``) e, com ``uf``, por UF antes: ``groupby([["sigla_uf"], col])``."""
+        df = self.by_uf(y0, y1, cat, ufs, entities) if uf else self.totals(y0, y1, cat, ufs, entities)
+        df[col] = df[self.entity].map(self.attribute(col)).astype(object)
+        return df.groupby(["sigla_uf", col] if uf else [col])[self.value].sum().reset_index()
+
+    def _dtype(self) -> pd.CategoricalDtype:
+        return pd.CategoricalDtype(self.entities)
+
+
+def _codes(s: pd.Series, missing: int) -> np.ndarray:
+    c = s.cat.codes.to_numpy().astype(np.intp)
+    c[c < 0] = missing
+    return c
+
+
+def _prefix(a: np.ndarray) -> np.ndarray:
+    """Somas acumuladas no eixo dos anos, com uma fatia de zeros à frente."""
+    out = np.zeros((a.shape[0], a.shape[1] + 1, *a.shape[2:]), dtype=a.dtype)
+    np.cumsum(a, axis=1, out=out[:, 1:])
+    return out
+
+
+def _take(index: pd.Index, values, n: int) -> np.ndarray:
+    if values is None or not len(values):
+        return np.arange(n)
+    ix = index.get_indexer(list(values))
+    return np.unique(ix[ix >= 0])
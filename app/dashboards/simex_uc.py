@@ -4,62 +4,23 @@ Dashboard – SIMEX • Exploração Madeireira em Unidades de Conservação
 Rota Flask: /simex/uc/
 """
 from __future__ import annotations
-import io, os, tempfile, requests, unidecode
+
+import logging
 
 import dash
 import dash_bootstrap_components as dbc
-import geopandas as gpd
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from dash import html, dcc, Input, Output, State, callback_context
 
-HEADERS = {"User-Agent": "Mozilla/5.0"}
-
-# ───────────────────────── helpers ─────────────────────────
-def _temp(url: str, suf: str) -> str:
-    r = requests.get(url, headers=HEADERS, timeout=45, stream=True); r.raise_for_status()
-    f = tempfile.NamedTemporaryFile(delete=False, suffix=suf)
-    for ch in r.iter_content(1024 * 1024): f.write(ch)
-    f.close(); return f.name
-
-def read_geo(url: str):
-    try: return gpd.read_file(url)
-    except Exception:
-        try:
-            p = _temp(url, ".geojson"); g = gpd.read_file(p)
-            os.unlink(p); return g
-        except Exception: return None
-
-def read_parq(url: str):
-    try: return pd.read_parquet(url)
-    except Exception:
-        try:
-            buf = io.BytesIO(requests.get(url, headers=HEADERS, timeout=45).content)
-            return pd.read_parquet(buf)
-        except Exception: return None
+from app import clientside, datasets, features, figure_cache, query_cache, tiles
+from app.figures import line_figure, partial
+from app.ranking import Ranking
+
+log = logging.getLogger(__name__)
 
 # ───────────────────────── dados ──────────────────────────
-GEO = (
-    "https://cdn.jsdelivr.net/gh/imazon-cgi/simex@main/"
-    "datasets/geojson/simex_amazonia_PAMT2007_2023_UC.geojson"
-)
-PARQ = (
-    "https://cdn.jsdelivr.net/gh/imazon-cgi/simex@main/"
-    "datasets/csv/simex_amazonia_PAMT2007_2023_UC.parquet"
-)
-
-roi = read_geo(GEO)
-roi["nome_1"] = roi["nome_1"].str.encode("latin1","ignore").str.decode("utf-8","ignore")
-df  = read_parq(PARQ)
-df["nome_1"] = (df["nome_1"].str.encode("latin1","ignore")
-                               .str.decode("utf-8","ignore")
-                               .astype(str))
-
-list_states = df["sigla_uf"].unique()
-list_anual  = sorted(df["ano"].unique())
-state_options = [{"label": s, "value": s} for s in list_states]
-year_options  = [{"label": a, "value": a} for a in list_anual]
+DATASET = "uc"
 
 category_options = [
     {"label":"Não autorizada","value":"não autorizada"},
@@ -114,6 +75,7 @@ GLOBAL_CSS = """
 def register_simex_uc_dashboard(server):
     app = dash.Dash(
         __name__, server=server, url_base_pathname="/simex/uc/",
+        external_scripts=[features.DECODER],  # TopoJSON dos mapas → GeoJSON no navegador
         external_stylesheets=[dbc.themes.BOOTSTRAP,
                               "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css"],
         suppress_callback_exceptions=True,
@@ -129,312 +91,316 @@ def register_simex_uc_dashboard(server):
     )
 
     # ---------------- layout ----------------
-    app.layout = html.Div([
-        dcc.Store(id="css-in", data=0), html.Div(id="css-out"),
-
-        dbc.Container([
-            html.Meta(name="viewport",
-                      content="width=device-width, initial-scale=1"),
-
-            # ───── linha de controles ─────
-            dbc.Row([
-                dbc.Col(html.Label("Ano Inicial:", className="label-fit"),
-                        xs="auto", className="d-flex align-items-center"),
-                dbc.Col(dcc.Dropdown(id="start-year-dropdown",
-                                     options=year_options, value=2016,
-                                     clearable=False),
-                        xs=12, sm=6, md=3, lg=3),
-
-                dbc.Col(html.Label("Ano Final:", className="label-fit"),
-                        xs="auto", className="d-flex align-items-center"),
-                dbc.Col(dcc.Dropdown(id="end-year-dropdown",
-                                     options=year_options, value=2023,
-                                     clearable=False),
-                        xs=12, sm=6, md=3, lg=3),
-
-                dbc.Col(dbc.Button([html.I(className="fa fa-refresh me-1"),
-                                    "Atualizar Intervalo"],
-                                   id="refresh-button", n_clicks=0,
-                                   color="success",
-                                   className="btn-sm custom-button"),
-                        xs="auto",
-                        className="d-flex align-items-center justify-content-end mt-2 mt-md-0"),
-
-                dbc.Col(dbc.Button([html.I(className="fa fa-filter me-1"),
-                                    "Remover Filtros"],
-                                   id="reset-button-top", n_clicks=0,
-                                   color="success",
-                                   className="btn-sm custom-button"),
-                        xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
-
-                dbc.Col(dbc.Button([html.I(className="fa fa-map me-1"),
-                                    "Selecione o Estado"],
-                                   id="open-state-modal-button",
-                                   color="success",
-                                   className="btn-sm custom-button"),
-                        xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
-
-                dbc.Col(dbc.Button([html.I(className="fa fa-map me-1"),
-                                    "Selecionar Área de Interesse"],
-                                   id="open-area-modal-button",
-                                   color="success",
-                                   className="btn-sm custom-button"),
-                        xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
-
-                dbc.Col(dbc.Button([html.I(className="fa fa-download me-1"),
-                                    "Baixar CSV"],
-                                   id="open-modal-button",
-                                   color="success",
-                                   className="btn-sm custom-button"),
-                        xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
-            ], className="gx-2 mb-3 flex-wrap"),
-
-            # categoria
-            dbc.Row([
-                dbc.Col(html.Label("Categoria:", className="label-fit"),
-                        xs="auto", className="d-flex align-items-center"),
-                dbc.Col(dcc.Dropdown(id="category-dropdown",
-                                     options=category_options,
-                                     value=None, clearable=False),
-                        xs=12, sm=6, md=4, lg=3),
-            ], className="gx-2 mb-4"),
-
-            # ───── gráficos ─────
-            dbc.Row([
-                dbc.Col(dbc.Card(dcc.Graph(id="bar-graph-yearly",
-                                           config={"responsive": True}),
-                                 className="graph-block shadow-sm"),
-                        xs=12, lg=6, className="mb-4"),
-                dbc.Col(dbc.Card(dcc.Graph(id="choropleth-map",
-                                           config={"responsive": True}),
-                                 className="graph-block shadow-sm"),
-                        xs=12, lg=6, className="mb-4"),
-            ]),
-            dbc.Row([
-                dbc.Col(dbc.Card(dcc.Graph(id="line-graph",
-                                           config={"responsive": True}),
-                                 className="graph-block shadow-sm"),
-                        xs=12, className="mb-4")
-            ]),
-            dbc.Row([
-                dbc.Col(dbc.Card(dcc.Graph(id="pie-chart",
-                                           config={"responsive": True}),
-                                 className="graph-block shadow-sm"),
-                        xs=12, lg=6, className="mb-4"),
-                dbc.Col(dbc.Card(dcc.Graph(id="pie-chart-uf-esfera",
-                                           config={"responsive": True}),
-                                 className="graph-block shadow-sm"),
-                        xs=12, lg=6, className="mb-4"),
-            ]),
-
-            # stores + download
-            dcc.Store(id="selected-states",      data=[]),
-            dcc.Store(id="selected-area",        data=[]),
-            dcc.Store(id="selected-areas-store", data=[]),
-            dcc.Download(id="download-dataframe-csv"),
-
-            # ──────── MODAIS ────────
-            dbc.Modal([
-                dbc.ModalHeader(dbc.ModalTitle("Escolha Estados")),
-                dbc.ModalBody(
-                    dcc.Dropdown(id="state-dropdown-modal",
-                                 options=state_options,
-                                 placeholder="Selecione o(s) Estado(s)",
-                                 multi=True)
-                ),
-                dbc.ModalFooter(
-                    dbc.Button("Fechar", id="close-state-modal-button",
-                               color="danger")
-                )
-            ], id="state-modal", is_open=False, size="lg", scrollable=True),
-
-            dbc.Modal([
-                dbc.ModalHeader(dbc.ModalTitle("Escolha as Áreas de Interesse")),
-                dbc.ModalBody(
-                    dcc.Dropdown(id="area-dropdown",
-                                 placeholder="Selecione as Áreas",
-                                 multi=True)
-                ),
-                dbc.ModalFooter(
-                    dbc.Button("Fechar", id="close-area-modal-button",
-                               color="danger")
-                )
-            ], id="area-modal", is_open=False, size="lg", scrollable=True),
-
-            dbc.Modal([
-                dbc.ModalHeader(dbc.ModalTitle("Configurações para gerar o CSV")),
-                dbc.ModalBody([
-                    dbc.Checklist(options=state_options, id="state-checklist",
-                                  inline=True),
-                    html.Hr(),
-                    dbc.RadioItems(options=[{"label":"Ponto","value":"."},
-                                            {"label":"Vírgula","value":","}],
-                                   value=".", id="decimal-separator",
-                                   inline=True, className="mb-2"),
-                    dbc.Checkbox(label="Sem acentuação",
-                                 id="remove-accents", value=False)
+    def serve_layout():
+        state_options, year_options, list_anual = datasets.filter_options(DATASET)
+        return html.Div([
+            dcc.Store(id="css-in", data=0), html.Div(id="css-out"),
+
+            dbc.Container([
+                html.Meta(name="viewport",
+                          content="width=device-width, initial-scale=1"),
+
+                # ───── linha de controles ─────
+                dbc.Row([
+                    dbc.Col(html.Label("Ano Inicial:", className="label-fit"),
+                            xs="auto", className="d-flex align-items-center"),
+                    dbc.Col(dcc.Dropdown(id="start-year-dropdown",
+                                         options=year_options, value=2016,
+                                         clearable=False),
+                            xs=12, sm=6, md=3, lg=3),
+
+                    dbc.Col(html.Label("Ano Final:", className="label-fit"),
+                            xs="auto", className="d-flex align-items-center"),
+                    dbc.Col(dcc.Dropdown(id="end-year-dropdown",
+                                         options=year_options, value=2023,
+                                         clearable=False),
+                            xs=12, sm=6, md=3, lg=3),
+
+                    dbc.Col(dbc.Button([html.I(className="fa fa-refresh me-1"),
+                                        "Atualizar Intervalo"],
+                                       id="refresh-button", n_clicks=0,
+                                       color="success",
+                                       className="btn-sm custom-button"),
+                            xs="auto",
+                            className="d-flex align-items-center justify-content-end mt-2 mt-md-0"),
+
+                    dbc.Col(dbc.Button([html.I(className="fa fa-filter me-1"),
+                                        "Remover Filtros"],
+                                       id="reset-button-top", n_clicks=0,
+                                       color="success",
+                                       className="btn-sm custom-button"),
+                            xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
+
+                    dbc.Col(dbc.Button([html.I(className="fa fa-map me-1"),
+                                        "Selecione o Estado"],
+                                       id="open-state-modal-button",
+                                       color="success",
+                                       className="btn-sm custom-button"),
+                            xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
+
+                    dbc.Col(dbc.Button([html.I(className="fa fa-map me-1"),
+                                        "Selecionar Área de Interesse"],
+                                       id="open-area-modal-button",
+                                       color="success",
+                                       className="btn-sm custom-button"),
+                            xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
+
+                    dbc.Col(dbc.Button([html.I(className="fa fa-download me-1"),
+                                        "Baixar CSV"],
+                                       id="open-modal-button",
+                                       color="success",
+                                       className="btn-sm custom-button"),
+                            xs="auto", className="d-flex align-items-center mt-2 mt-md-0"),
+                ], className="gx-2 mb-3 flex-wrap"),
+
+                # categoria
+                dbc.Row([
+                    dbc.Col(html.Label("Categoria:", className="label-fit"),
+                            xs="auto", className="d-flex align-items-center"),
+                    dbc.Col(dcc.Dropdown(id="category-dropdown",
+                                         options=category_options,
+                                         value=None, clearable=False),
+                            xs=12, sm=6, md=4, lg=3),
+                ], className="gx-2 mb-4"),
+
+                # ───── gráficos ─────
+                dbc.Row([
+                    dbc.Col(dbc.Card(dcc.Graph(id="bar-graph-yearly",
+                                               config={"responsive": True}),
+                                     className="graph-block shadow-sm"),
+                            xs=12, lg=6, className="mb-4"),
+                    dbc.Col(dbc.Card(dcc.Graph(id="choropleth-map",
+                                               config={"responsive": True}),
+                                     className="graph-block shadow-sm"),
+                            xs=12, lg=6, className="mb-4"),
+                ]),
+                dbc.Row([
+                    dbc.Col(dbc.Card(dcc.Graph(id="line-graph",
+                                               config={"responsive": True}),
+                                     className="graph-block shadow-sm"),
+                            xs=12, className="mb-4")
+                ]),
+                dbc.Row([
+                    dbc.Col(dbc.Card(dcc.Graph(id="pie-chart",
+                                               config={"responsive": True}),
+                                     className="graph-block shadow-sm"),
+                            xs=12, lg=6, className="mb-4"),
+                    dbc.Col(dbc.Card(dcc.Graph(id="pie-chart-uf-esfera",
+                                               config={"responsive": True}),
+                                     className="graph-block shadow-sm"),
+                            xs=12, lg=6, className="mb-4"),
                 ]),
-                dbc.ModalFooter([
-                    dbc.Button("Download", id="download-button", color="success"),
-                    dbc.Button("Fechar", id="close-modal-button", color="danger")
-                ])
-            ], id="modal", is_open=False, size="lg", scrollable=True),
-        ], fluid=True)
-    ])
+
+                # stores + download
+                dcc.Store(id="filter-store",         data=[2016, 2023, None, None]),   # anos, categoria, estados
+                dcc.Store(id="selected-states",      data=[]),
+                dcc.Store(id="selected-area",        data=[]),
+                dcc.Store(id="selected-areas-store", data=[]),
+                dcc.Download(id="download-dataframe-csv"),
+
+                # ──────── MODAIS ────────
+                dbc.Modal([
+                    dbc.ModalHeader(dbc.ModalTitle("Escolha Estados")),
+                    dbc.ModalBody(
+                        dcc.Dropdown(id="state-dropdown-modal",
+                                     options=state_options,
+                                     placeholder="Selecione o(s) Estado(s)",
+                                     multi=True)
+                    ),
+                    dbc.ModalFooter(
+                        dbc.Button("Fechar", id="close-state-modal-button",
+                                   color="danger")
+                    )
+                ], id="state-modal", is_open=False, size="lg", scrollable=True),
+
+                dbc.Modal([
+                    dbc.ModalHeader(dbc.ModalTitle("Escolha as Áreas de Interesse")),
+                    dbc.ModalBody(
+                        dcc.Dropdown(id="area-dropdown",
+                                     placeholder="Selecione as Áreas",
+                                     multi=True)
+                    ),
+                    dbc.ModalFooter(
+                        dbc.Button("Fechar", id="close-area-modal-button",
+                                   color="danger")
+                    )
+                ], id="area-modal", is_open=False, size="lg", scrollable=True),
+
+                dbc.Modal([
+                    dbc.ModalHeader(dbc.ModalTitle("Configurações para gerar o CSV")),
+                    dbc.ModalBody([
+                        dbc.Checklist(options=state_options, id="state-checklist",
+                                      inline=True),
+                        html.Hr(),
+                        dbc.RadioItems(options=[{"label":"Ponto","value":"."},
+                                                {"label":"Vírgula","value":","}],
+                                       value=".", id="decimal-separator",
+                                       inline=True, className="mb-2"),
+                        dbc.Checkbox(label="Sem acentuação",
+                                     id="remove-accents", value=False)
+                    ]),
+                    dbc.ModalFooter([
+                        dbc.Button("Download", id="download-button", color="success"),
+                        dbc.Button("Fechar", id="close-modal-button", color="danger")
+                    ])
+                ], id="modal", is_open=False, size="lg", scrollable=True),
+            ], fluid=True)
+        ])
+
+    app.layout = serve_layout  # dados lidos só na primeira visita
 
     # ───────── auxiliares ─────────
-    def preencher_anos_faltantes(df_in, anos, areas):
-        idx = pd.MultiIndex.from_product([anos, areas], names=["ano","nome_1"])
-        return (df_in.groupby(["ano","nome_1"], as_index=False)["area_ha"]
-                  .sum()
-                  .set_index(["ano","nome_1"])
-                  .reindex(idx, fill_value=0)
-                  .reset_index())
-
-    def get_centroid(gjson, nm):
-        try:
-            g = gjson.loc[gjson["nome_1"] == nm]
-            if not g.empty:
-                c = g.geometry.centroid.iloc[0]
-                return c.y, c.x
-        except Exception: pass
-        return -14, -55
-
-    # Funções de callback do Dash para atualizar gráficos e manipular filtros e seleção de áreas.
+    def ranking(start_year, end_year, category, states, areas, *_):
+        """
+        Calcula o ranking de um filtro: opções de área e top 10 com posições (não depende dos destaques).
+        """
+        cube = datasets.cube(DATASET)
+        filtro = (start_year, end_year, category, states, areas)
+
+        # Totais por UC (id da área), com o primeiro `nome` (município) de cada UC.
+        df_acumulado_municipio = cube.totals(*filtro)
+
+        # Seleção parcial das top 10 áreas; a posição de cada uma é calculada entre todas as UCs do filtro.
+        rk = Ranking(cube.totals(*filtro[:4]) if areas else df_acumulado_municipio, datasets.AREA_ID)
+        df_top_10 = datasets.named(DATASET, rk.top(10, within=areas))  # ids + nomes das UCs em `nome_1`
+        posicao = [f"{p}º de {len(rk)}" for p in rk.ranks(df_top_10[datasets.AREA_ID])]
+
+        # Truncar os nomes das áreas para até 10 caracteres
+        df_top_10['short_nome_1'] = df_top_10['nome_1'].apply(lambda x: x[:10] + '...' if len(x) > 10 else x)
+
+        # Opções do dropdown: nome da UC → id.
+        opts = datasets.named(DATASET, df_acumulado_municipio)
+
+        return {
+            'area_options': [{'label': nome_1, 'value': i} for i, nome_1 in zip(opts[datasets.AREA_ID].tolist(), opts['nome_1'])],
+            'top_10': df_top_10,
+            'posicao': posicao,
+        }
+
+    def serie(start_year, end_year, category, states, areas, destaques):
+        """
+        Série anual (matriz área × ano) das áreas em destaque (ou do top 10).
+        """
+        cube = datasets.cube(DATASET)
+        filtro = (start_year, end_year, category, states, areas)
+        areas_to_plot = list(destaques or query_cache.cached(DATASET, ranking, *filtro)['top_10'][datasets.AREA_ID])
+        anos = cube.active_years(*filtro)
+        return datasets.names(DATASET, areas_to_plot), anos, cube.matrix(*filtro, focus=areas_to_plot, years=anos)
+
+    def pizzas(start_year, end_year, category, states, areas, *_):
+        """
+        Somas das áreas do filtro por 'grupo' e por sigla_uf × 'esfera' (atributos fixos por UC).
+        """
+        cube = datasets.cube(DATASET)
+        filtro = (start_year, end_year, category, states, areas)
+        return {
+            'por_grupo': cube.by_attribute('grupo', *filtro),
+            'por_uf_esfera': cube.by_attribute('esfera', *filtro, uf=True),
+        }
+
+    # Filtro compartilhado (anos, categoria, estados) lido por todos os gráficos.
     @app.callback(
-        # Define as saídas dos callbacks.
-        [Output('bar-graph-yearly', 'figure'),
-         Output('choropleth-map', 'figure'),
-         Output('line-graph', 'figure'),
-         Output('pie-chart', 'figure'),  # Nova saída
-         Output('pie-chart-uf-esfera', 'figure'),  # Novo gráfico
-         Output('selected-states', 'data'),
+        [Output('filter-store', 'data'),
+         Output('start-year-dropdown', 'value'),
+         Output('end-year-dropdown', 'value'),
+         Output('category-dropdown', 'value'),
          Output('state-dropdown-modal', 'value'),
-         Output('selected-area', 'data'),
-         Output('area-dropdown', 'options'),
-         Output('area-dropdown', 'value'),
-         Output('selected-areas-store', 'data')],
-
-        # Define as entradas dos callbacks.
+         Output('selected-states', 'data')],
         [Input('start-year-dropdown', 'value'),
          Input('end-year-dropdown', 'value'),
          Input('category-dropdown', 'value'),
-         Input('choropleth-map', 'clickData'),
-         Input('bar-graph-yearly', 'clickData'),
          Input('state-dropdown-modal', 'value'),
-         Input('area-dropdown', 'value'),
          Input('reset-button-top', 'n_clicks'),
          Input('refresh-button', 'n_clicks')],
-
-        # Define os estados dos callbacks.
-        [State('selected-states', 'data'),
-         State('selected-area', 'data'),
-         State('selected-areas-store', 'data')]
+        prevent_initial_call=True
     )
-    def update_graphs(start_year, end_year, selected_category, map_click_data, bar_click_data, selected_state, selected_area, reset_clicks, refresh_clicks, selected_states, selected_area_state, selected_areas_store):
+    def update_filter(start_year, end_year, selected_category, selected_state, reset_clicks, refresh_clicks):
         """
-        Função de callback para atualizar os gráficos e seleções de área de interesse com base nos filtros aplicados.
+        Normaliza o filtro em [ano inicial, ano final, categoria, estados]; o reset também devolve os controles ao padrão.
         """
-        # Obtenção do ID do elemento que desencadeou o callback.
         triggered_id = [p['prop_id'] for p in callback_context.triggered][0]
 
+        # Reseta o filtro (e os controles da tela) ao clicar no botão de reset.
+        if triggered_id == 'reset-button-top.n_clicks':
+            return [2016, 2023, None, None], 2016, 2023, None, None, []
+
         # Atribuição de valores padrão para o ano inicial e final.
-        if start_year is None:
-            start_year = 2016
-        if end_year is None:
-            end_year = 2023
+        filtro = [int(start_year or 2016), int(end_year or 2023), selected_category, selected_state]
+        return filtro, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-        start_year = int(start_year)  # Converte ano inicial para inteiro.
-        end_year = int(end_year)  # Converte ano final para inteiro.
+    # Seleção de áreas no navegador (app.clientside): destaques das barras, UCs clicadas no mapa e lista do modal.
+    app.clientside_callback(
+        clientside.HIGHLIGHTS,
+        Output('selected-areas-store', 'data'),
+        [Input('bar-graph-yearly', 'clickData'),
+         Input('reset-button-top', 'n_clicks')],
+        [State('selected-areas-store', 'data')],
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        clientside.areas(modal=True),
+        [Output('selected-area', 'data'),
+         Output('area-dropdown', 'value')],
+        [Input('choropleth-map', 'clickData'),
+         Input('area-dropdown', 'value'),
+         Input('reset-button-top', 'n_clicks')],
+        [State('selected-area', 'data')],
+        prevent_initial_call=True
+    )
 
-        df['ano'] = df['ano'].astype(int)  # Converte a coluna 'ano' do DataFrame para inteiro.
+    # Seleção por caixa/laço no mapa: consulta o índice espacial, então fica no servidor.
+    @app.callback(
+        Output('selected-area', 'data', allow_duplicate=True),
+        [Input('choropleth-map', 'selectedData')],
+        [State('selected-area', 'data')],
+        prevent_initial_call=True
+    )
+    def select_box(map_selected_data, selected_area_state):
+        """
+        Acrescenta à seleção todas as UCs tocadas pela caixa/laço.
+        """
+        if not map_selected_data:
+            return dash.no_update
+        return list(dict.fromkeys(selected_area_state + datasets.select(DATASET, map_selected_data)))
 
-        # Reseta as seleções ao clicar no botão de reset.
-        if triggered_id == 'reset-button-top.n_clicks':
-            selected_states = []
-            selected_state = None
-            selected_area_state = []
-            selected_category = None
-            start_year = 2016
-            end_year = 2023
-            selected_areas_store = []
-
-        # Manipulação do clique no gráfico de barras.
-        if triggered_id == 'bar-graph-yearly.clickData' and bar_click_data:
-            clicked_area = bar_click_data['points'][0]['y']  # Identifica o assentamento clicado.
-            if clicked_area in selected_areas_store:
-                selected_areas_store.remove(clicked_area)  # Remove a área caso esteja selecionada.
-            else:
-                selected_areas_store.append(clicked_area)  # Adiciona a área caso não esteja.
-
-        # Manipulação do clique no mapa.
-        if triggered_id == 'choropleth-map.clickData' and map_click_data:
-            selected_municipio = map_click_data['points'][0]['location']  # Identifica o assentamento clicado no mapa.
-            if selected_municipio in df['nome_1'].values:
-                if selected_municipio in selected_area_state:
-                    selected_area_state.remove(selected_municipio)  # Remove a área caso esteja selecionada.
-                else:
-                    selected_area_state.append(selected_municipio)  # Adiciona a área caso não esteja.
-
-        # Define a seleção de áreas e categoria com base nos filtros.
-        if selected_area:
-            selected_area_state = selected_area
-        if selected_category:
-            if selected_category is not None:
-                df_filtered = df[df['categoria'] == selected_category]  # Filtra o DataFrame pela categoria selecionada.
-            else:
-                df_filtered = df
-        else:
-            df_filtered = df
-
-        # Filtra o DataFrame pelo intervalo de anos.
-        df_filtered = df_filtered[(df_filtered['ano'] >= start_year) & (df_filtered['ano'] <= end_year)]
-
-        # Converte a seleção de áreas para lista.
-        if isinstance(selected_area_state, str):
-            selected_area_state = [selected_area_state]
-        elif selected_area_state is None:
-            selected_area_state = []
-
-        # Filtra o DataFrame por estado e áreas selecionadas.
-        if selected_state:
-            df_filtered = df_filtered[df_filtered['sigla_uf'].isin(selected_state)]
-        if selected_area_state:
-            df_filtered = df_filtered[df_filtered['nome_1'].isin(selected_area_state)]
-
-        # Define as opções de áreas para o dropdown de áreas de interesse.
-        area_options = [{'label': nome_1, 'value': nome_1} for nome_1 in df_filtered['nome_1'].unique()]
-        title_text = f"Categoria: {selected_category or 'Todas'}"
-
-        # Seleção das top 10 áreas por ordem decrescente de exploração.
-        df_acumulado_municipio = df_filtered.groupby(['nome_1'], as_index=False).agg({
-            'area_ha': 'sum',  # Soma as áreas por `nome_1`.
-            'nome': 'first'    # Mantém o primeiro valor de `nome` correspondente a cada `nome_1`.
-        })
-        df_top_10 = df_acumulado_municipio.sort_values(by='area_ha', ascending=False).head(10)
-
-        # Remove caracteres inválidos e normaliza a codificação
-        df_top_10['nome_1'] = df_top_10['nome_1'].str.encode('latin1', errors='ignore').str.decode('utf-8', errors='ignore')
-        df_top_10['nome_1'] = df_top_10['nome_1'].str.replace(r'[^\x00-\x7F]+', '', regex=True)  # Remove caracteres não-ASCII
-
-         # Truncar os nomes das áreas para até 10 caracteres
-        df_top_10['short_nome_1'] = df_top_10['nome_1'].apply(lambda x: x[:10] + '...' if len(x) > 10 else x)
+    # Opções da lista de áreas: dependem só do filtro e das UCs selecionadas.
+    @app.callback(
+        Output('area-dropdown', 'options'),
+        [Input('filter-store', 'data'),
+         Input('selected-area', 'data')]
+    )
+    def update_area_options(filtro, selected_area_state):
+        return query_cache.cached(DATASET, ranking, *filtro, selected_area_state)['area_options']
+
+    # Gráfico de barras com as top 10 áreas (destaques em outra cor).
+    @app.callback(
+        Output('bar-graph-yearly', 'figure'),
+        [Input('filter-store', 'data'),
+         Input('selected-area', 'data'),
+         Input('selected-areas-store', 'data')]
+    )
+    def update_bar(filtro, selected_area_state, selected_areas_store):
+        agg = query_cache.cached(DATASET, ranking, *filtro, selected_area_state)
+        df_top_10, posicao = agg['top_10'], agg['posicao']
+        title_text = f"Categoria: {filtro[2] or 'Todas'}"
 
         # Cria o gráfico de barras com top 10 áreas.
-        marker_colors = ['darkcyan' if nome in selected_areas_store else 'lightgray' for nome in df_top_10['nome_1']]
+        marker_colors = ['darkcyan' if i in selected_areas_store else 'lightgray' for i in df_top_10[datasets.AREA_ID]]
         # Cria o gráfico de barras com top 10 áreas.
         bar_yearly_fig = go.Figure(go.Bar(
-            y=df_top_10['nome_1'],  # Usa os nomes originais como identificadores.
+            y=df_top_10['nome_1'],  # Nomes das UCs (o id vai em customdata).
             x=df_top_10['area_ha'],
             orientation='h',
             marker_color=marker_colors,
             # text=df_top_10['nome'],  # Exibe os nomes truncados como rótulos.
             textposition='auto',
-            customdata=df_top_10['nome'],  # Inclui os dados originais como referência para interação.
+            customdata=df_top_10[[datasets.AREA_ID, 'nome']],  # Id da UC (clique) e o município.
+            hovertext=posicao,  # Posição da UC no ranking (mesmo fora do top 10).
             hovertemplate=(
                 "<b>Área:</b> %{x:.2f} ha<br>"
                 "<b>Assentamento:</b> %{y}<br>"  # Mostra o rótulo truncado.
-                "<b>Nome completo:</b> %{customdata}"  # Mostra o nome completo.
+                "<b>Nome completo:</b> %{customdata[1]}<br>"  # Mostra o nome completo.
+                "<b>Posição:</b> %{hovertext}"
                 "<extra></extra>"
             )
     ))
@@ -456,54 +422,68 @@ def register_simex_uc_dashboard(server):
             ),
              yaxis=dict(
             categoryorder='array',
-            categoryarray=df_top_10.sort_values(by='area_ha', ascending=True)['nome_1'].tolist(),
+            categoryarray=df_top_10['nome_1'][::-1].tolist(),
             tickfont=dict(size=8)  # Reduz o tamanho da fonte
                          ),
         )
+        # cliques que não mudam o filtro: só as cores (destaques) ou o top 10 (áreas)
+        return partial(bar_yearly_fig, {"selected-areas-store.data": ["data.0.marker.color"],
+                                     "selected-area.data": ["data", "layout.yaxis.categoryarray"]})
 
-        # Mapa com top 10 áreas usando GeoJSON.
-        if selected_areas_store:
-            roi_selected = roi[roi['nome_1'].isin(selected_areas_store)]
-        else:
-            roi_selected = roi[roi['nome_1'].isin(df_top_10['nome_1'])]
+    # Mapa coroplético das top 10 áreas (geometria dos destaques, se houver).
+    @app.callback(
+        Output('choropleth-map', 'figure'),
+        [Input('filter-store', 'data'),
+         Input('selected-area', 'data'),
+         Input('selected-areas-store', 'data'),
+         Input('choropleth-map', 'relayoutData')]
+    )
+    def update_map(filtro, selected_area_state, selected_areas_store, relayout):
+        df_top_10 = query_cache.cached(DATASET, ranking, *filtro, selected_area_state)['top_10']
+        title_text = f"Categoria: {filtro[2] or 'Todas'}"
 
-        # Define o centro do mapa com base na seleção.
-        if selected_area_state:
-            lat, lon = get_centroid(roi, selected_area_state[0])
-            zoom = 6
-        else:
-            lat, lon = -14, -55
-            zoom = 4
+        # Centro e zoom que enquadram as UCs clicadas (visão padrão sem seleção).
+        lat, lon, zoom = datasets.view(DATASET, selected_area_state)
+        # Zoom que o usuário deixou no mapa (define o nível da pirâmide das feições).
+        map_zoom = features.map_zoom(relayout, zoom)
+
+        # Mapa com top 10 áreas usando o GeoJSON pré-serializado no nível do zoom (URL da coleção de feições).
+        roi_selected = features.url(DATASET, selected_areas_store or df_top_10[datasets.AREA_ID], map_zoom)
 
         # Configura o mapa coroplético.
         map_fig = px.choropleth_mapbox(
             df_top_10, geojson=roi_selected, color='area_ha',
-            locations="nome_1",
-            featureidkey="properties.nome_1",
+            locations=datasets.AREA_ID,  # id da UC = "id" das feições
             mapbox_style="carto-positron",
             center={"lat": lat, "lon": lon},
             color_continuous_scale='YlOrRd',
-            hover_data={"nome": True, "nome_1": True, "area_ha": True},  # Adiciona 'nome_1' ao tooltip
+            hover_data={datasets.AREA_ID: False, "nome": True, "nome_1": True, "area_ha": True},  # Adiciona 'nome_1' ao tooltip
             zoom=zoom
         )
 
         # Ajusta o layout do mapa.
         map_fig.update_layout(
+            mapbox_layers=[tiles.layer(DATASET)],  # contorno de todas as áreas (tiles vetoriais)
             coloraxis_colorbar=dict(title="Hectares"),
             margin={"r": 0, "t": 50, "l": 0, "b": 0},
             title={'text': f"Mapa de Exploração Madeireira (ha) - {title_text}", 'x': 0.5}
         )
+        # destaques: só a URL das feições; áreas do filtro: top 10 e enquadramento
+        return partial(map_fig, {"selected-areas-store.data": ["data.0.geojson"],
+                              "choropleth-map.relayoutData": ["data.0.geojson"],
+                              "selected-area.data": ["data", "layout.mapbox.center", "layout.mapbox.zoom"]})
 
-        # Gráfico de linha para áreas selecionadas ou top 10.
-        if selected_areas_store:
-            areas_to_plot = selected_areas_store
-        else:
-            areas_to_plot = df_top_10['nome_1']
+    # Série histórica das áreas em destaque (ou do top 10).
+    @app.callback(
+        Output('line-graph', 'figure'),
+        [Input('filter-store', 'data'),
+         Input('selected-area', 'data'),
+         Input('selected-areas-store', 'data')]
+    )
+    def update_line(filtro, selected_area_state, selected_areas_store):
+        title_text = f"Categoria: {filtro[2] or 'Todas'}"
 
-        # Agrupamento de dados para gráfico de linhas.
-        df_line = df_filtered[df_filtered['nome_1'].isin(areas_to_plot)].groupby(['ano', 'nome_1', 'sigla_uf'])['area_ha'].sum().reset_index()
-        df_line_full = preencher_anos_faltantes(df_line, sorted(df_filtered['ano'].unique()), areas_to_plot)
-        line_fig = px.line(df_line_full, x='ano', y='area_ha', color='nome_1',
+        line_fig = line_figure(*query_cache.cached(DATASET, serie, *filtro, selected_area_state, selected_areas_store), 'nome_1',
                         title=f'Série Histórica de Área de Exploração Madeireira - {title_text}',
                         labels={'area_ha': 'Área por ano (ha)', 'ano': 'Ano'},
                         template='plotly_white', line_shape='linear')
@@ -525,13 +505,22 @@ def register_simex_uc_dashboard(server):
                 x=0.5  # Posiciona a legenda no centro da largura do gráfico
             )
     )
+        return partial(line_fig, {"selected-area.data": ["data"], "selected-areas-store.data": ["data"]})   # só os traços
 
-        # Agrupar os dados pela coluna 'grupo' e somar as áreas.
-        df_grouped = df_filtered.groupby('grupo')['area_ha'].sum().reset_index()
+    # Pizzas por grupo e por estado × esfera: não dependem dos destaques das barras.
+    @app.callback(
+        [Output('pie-chart', 'figure'),
+         Output('pie-chart-uf-esfera', 'figure')],
+        [Input('filter-store', 'data'),
+         Input('selected-area', 'data')]
+    )
+    def update_pies(filtro, selected_area_state):
+        start_year, end_year = filtro[:2]
+        agg = query_cache.cached(DATASET, pizzas, *filtro, selected_area_state)
 
         # Criar o gráfico de pizza.
         pie_fig = px.pie(
-            df_grouped,
+            agg['por_grupo'],
             names='grupo',
             values='area_ha',
             title=f'Proporção de Áreas Acumuladas por Grupo ({start_year} - {end_year})',
@@ -539,12 +528,9 @@ def register_simex_uc_dashboard(server):
             color_discrete_sequence=px.colors.sequential.RdBu
         )
 
-        # Agrupar os dados por sigla_uf e esfera.
-        df_grouped_uf_esfera = df_filtered.groupby(['sigla_uf', 'esfera'])['area_ha'].sum().reset_index()
-
         # Criar o gráfico de pizza por sigla_uf e esfera.
         pie_fig_uf_esfera = px.pie(
-            df_grouped_uf_esfera,
+            agg['por_uf_esfera'],
             names='sigla_uf',
             values='area_ha',
             color='esfera',
@@ -553,42 +539,33 @@ def register_simex_uc_dashboard(server):
             color_discrete_sequence=px.colors.diverging.RdBu
         )
 
-        # Retorno das figuras e dados para armazenar.
-        return bar_yearly_fig, map_fig, line_fig, pie_fig,pie_fig_uf_esfera,selected_states, selected_state, selected_area_state, area_options, None, selected_areas_store
+        # áreas do filtro: só as fatias (títulos dependem só dos anos)
+        return partial(pie_fig, {'selected-area.data': ['data']}), partial(pie_fig_uf_esfera, {'selected-area.data': ['data']})
 
 
-    # Callback para abrir e fechar o modal de seleção de estado.
-    @app.callback(
+    # Callback (no navegador) para abrir e fechar o modal de seleção de estado.
+    app.clientside_callback(
+        clientside.TOGGLE,
         Output("state-modal", "is_open"),
         [Input("open-state-modal-button", "n_clicks"), Input("close-state-modal-button", "n_clicks")],
         [State("state-modal", "is_open")]
     )
-    def toggle_state_modal(n1, n2, is_open):
-        if n1 or n2:
-            return not is_open
-        return is_open
 
-    # Callback para abrir e fechar o modal de seleção de áreas.
-    @app.callback(
+    # Callback (no navegador) para abrir e fechar o modal de seleção de áreas.
+    app.clientside_callback(
+        clientside.TOGGLE,
         Output("area-modal", "is_open"),
         [Input("open-area-modal-button", "n_clicks"), Input("close-area-modal-button", "n_clicks")],
         [State("area-modal", "is_open")]
     )
-    def toggle_area_modal(n1, n2, is_open):
-        if n1 or n2:
-            return not is_open
-        return is_open
 
-    # Callback para abrir e fechar o modal de download.
-    @app.callback(
+    # Callback (no navegador) para abrir e fechar o modal de download.
+    app.clientside_callback(
+        clientside.TOGGLE,
         Output("modal", "is_open"),
         [Input("open-modal-button", "n_clicks"), Input("close-modal-button", "n_clicks")],
         [State("modal", "is_open")]
     )
-    def toggle_modal(n1, n2, is_open):
-        if n1 or n2:
-            return not is_open
-        return is_open
 
     # Callback para gerar e fazer download do CSV filtrado.
     @app.callback(
@@ -600,19 +577,15 @@ def register_simex_uc_dashboard(server):
         if n_clicks is None or n_clicks == 0:
             return dash.no_update
 
-        print(f"Download button clicked {n_clicks} times")
-        print(f"Selected States: {selected_states}")
-
-        if selected_states:
-            filtered_df = df[df['sigla_uf'].isin(selected_states)]  # Filtra pelo estado selecionado.
-        else:
-            filtered_df = df
-
-        print(f"Filtered DataFrame shape: {filtered_df.shape}")
+        filtered_df = datasets.filtered(DATASET, ufs=selected_states)  # Filtra pelos estados selecionados (bitsets por UF).
+        log.info("download CSV %s (clique %s): estados %s, %d linhas", DATASET, n_clicks, selected_states, len(filtered_df))
 
         if remove_accents:
-            filtered_df = filtered_df.applymap(lambda x: unidecode.unidecode(x) if isinstance(x, str) else x)  # Remove acentos se selecionado.
+            filtered_df = datasets.to_ascii(DATASET, filtered_df)  # Remove acentos se selecionado.
 
         return dcc.send_data_frame(filtered_df.to_csv, "degradacao_amazonia.csv", sep=decimal_separator, index=False)
 
+    # Respostas dos callbacks de figuras servidas do cache compartilhado entre workers.
+    figure_cache.install(app, DATASET)
 
+    return app
@@ -0,0 +1,709 @@
+# app/datasets.py
+"""
+Registro central dos conjuntos de dados do SIMEX.
+
+Cada dataset é resolvido primeiro para o arquivo local em ``datasets/`` e só
+é carregado no primeiro uso (nada é lido no import nem em ``create_app()``).
+A URL remota (CDN) só é usada quando o arquivo local não existe e o fallback
+remoto está habilitado:
+
+    SIMEX_DATA_DIR=/caminho/datasets   # raiz local (padrão: <repo>/datasets)
+    SIMEX_REMOTE=1                     # permite buscar no CDN o que faltar
+
+Com o fallback remoto ligado, ``prefetch()`` (chamado por ``create_app()``)
+baixa de uma vez, em paralelo, tudo o que não existe localmente, passando
+pelo cache HTTP em disco (``app.http_cache``) que revalida com ETag.
+
+Com ``SIMEX_SNAPSHOT_DIR`` definido, cada dataset carregado é gravado em
+Arrow IPC e servido a partir do arquivo mapeado em memória
+(``app.snapshot``); ``preload()`` faz isso no master do gunicorn antes do
+fork.
+
+As áreas são identificadas por um id inteiro (``AREA_ID``): o código da
+área quando a tabela tem um (``id``, p. ex. o geocódigo do IBGE) ou um
+hash estável do nome. Cubo, agregados, stores dos dashboards e feições dos
+mapas usam só o id; o nome (``labels``) entra apenas na hora de desenhar.
+
+As consultas dos dashboards (``cube`` e ``filtered``) passam pelo backend
+de cada dataset (``backend``): ``pandas`` (padrão; cubo em memória,
+``app.cube``), ``duckdb`` (SQL sobre o parquet local, ``app.duck``) ou
+``polars`` (LazyFrames Arrow, ``app.lazy``):
+
+    SIMEX_QUERY_BACKEND=duckdb                  # todos os dashboards
+    SIMEX_QUERY_BACKEND_IMOVEIS_RURAIS=polars   # só um dataset
+"""
+from __future__ import annotations
+
+import hashlib, io, logging, os, threading, zlib
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import unidecode
+
+from app import duck, fetch, geo, http_cache, query_cache, snapshot
+from app.bitmap import BitmapIndex
+from app.cube import Cube
+
+log = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(os.environ.get("SIMEX_DATA_DIR", ROOT / "datasets"))
+
+BACKEND = os.environ.get("SIMEX_QUERY_BACKEND", "pandas").lower()
+BACKENDS = ("pandas", "duckdb", "polars")
+
+AREA_TOL = 0.01   # ha: erro máximo aceito no total ao guardar area_ha em float32
+SCHEMA = 2        # formato dos derivados (ids, feições, tiles, figuras): entra em version()
+
+CDN = "https://cdn.jsdelivr.net/gh/imazon-cgi/simex@main/datasets/"
+RAW = "https://raw.githubusercontent.com/imazon-cgi/simex/main/datasets/"
+
+
+class DatasetError(RuntimeError):
+    """Dataset sem arquivo local e sem fallback remoto disponível."""
+
+
+class MissingSource(DatasetError):
+    """Arquivo ausente (sem cópia local e com SIMEX_REMOTE desabilitado)."""
+
+
+# ───────────────────────── especificações ─────────────────────────
+BASE_SCHEMA = {"sigla_uf": "category", "categoria": "category",
+               "ano": "int16", "area_ha": "float32"}
+
+
+# parquet / geojson: caminho relativo a DATA_DIR (e à URL base)
+# entity:            coluna da tabela com o nome da área (rótulos de exibição)
+# id:                coluna da tabela com o código inteiro da área (sem ela, o
+#                    id é derivado do nome: ver ``name_id``)
+# geo_key:           coluna com o nome da área nas feições do GeoJSON
+# geo_id:            coluna com o código da área nas feições (sem ela, as
+#                    feições são ligadas às áreas pelo nome)
+# repair:            colunas de texto com codificação a corrigir (mojibake)
+# schema:            tipos além de BASE_SCHEMA (colunas de texto repetitivas
+#                    viram categóricas: filtros e groupby operam sobre códigos)
+# first:             colunas "primeiro valor por área" servidas pelo cubo
+# dedup:             chave de linhas duplicadas descartadas antes de somar
+DATASETS: dict[str, dict] = {
+    "assentamentos": {
+        "parquet": "csv/simex_amazonia_PAMT2007_2023_assentamentos.parquet",
+        "geojson": "geojson/simex_amazonia_PAMT2007_2023_assentamentos.geojson",
+        "base_url": CDN,
+        "entity": "name",
+        "geo_key": "name",
+        "repair": ("name",),
+        "schema": dict.fromkeys(("name", "sub_class", "nome", "geocodigo"), "category"),
+    },
+    "imoveis_rurais": {
+        "parquet": "csv/simex_amazonia_PAMT2007_2023_imoveisrurais.parquet",
+        "geojson": "geojson/simex_amazonia_PAMT2007_2023_imoveisrurais.geojson",
+        "base_url": RAW,   # arquivos acima do limite de tamanho do jsDelivr
+        "entity": "nome",
+        "id": "geocodigo",
+        "geo_key": "nome",
+        "repair": ("name",),
+        "schema": dict.fromkeys(("name", "sub_class", "nome", "geocodigo"), "category"),
+        "first": ("name",),
+        "dedup": ("name", "area_ha", "nome", "geocodigo", "ano"),
+    },
+    "municipios": {
+        "parquet": "csv/simex_amazonia_PAMT2007_2023_mun.parquet",
+        "geojson": "geojson/limite_municipios_amz_legal.geojson",
+        "base_url": CDN,
+        "entity": "nome",
+        "id": "geocodigo",
+        "geo_key": "NM_MUN",
+        "geo_id": "CD_MUN",
+        "repair": (),
+        "schema": dict.fromkeys(("nome", "geocodigo"), "category"),
+    },
+    "terra_dest": {
+        "parquet": "csv/simex_amazonia_PAMT2007_2023_TerrasNDest.parquet",
+        "geojson": "geojson/simex_amazonia_PAMT2007_2023_TerrasNDest.geojson",
+        "base_url": CDN,
+        "entity": "name",
+        "geo_key": "name",
+        "repair": ("name",),
+        "schema": dict.fromkeys(("name", "sub_class", "nome", "geocodigo"), "category"),
+    },
+    "ti": {
+        "parquet": "csv/simex_amazonia_PAMT2007_2023_TI.parquet",
+        "geojson": "geojson/simex_amazonia_PAMT2007_2023_TI.geojson",
+        "base_url": CDN,
+        "entity": "terrai_nom",
+        "geo_key": "terrai_nom",
+        "repair": ("terrai_nom",),
+        "schema": dict.fromkeys(("terrai_nom", "fase_ti", "nome", "geocodigo"), "category"),
+    },
+    "uc": {
+        "parquet": "csv/simex_amazonia_PAMT2007_2023_UC.parquet",
+        "geojson": "geojson/simex_amazonia_PAMT2007_2023_UC.geojson",
+        "base_url": CDN,
+        "entity": "nome_1",
+        "geo_key": "nome_1",
+        "repair": ("nome_1",),
+        "schema": dict.fromkeys(("nome", "nome_1", "grupo", "esfera", "geocodigo"), "category"),
+        "first": ("nome", "grupo", "esfera"),
+    },
+}
+
+
+def remote_enabled() -> bool:
+    return os.environ.get("SIMEX_REMOTE", "").lower() in ("1", "true", "yes", "on")
+
+
+def relpath(key: str, kind: str) -> str:
+    """Caminho relativo do arquivo; ``geojson.z<N>`` é o nível N da pirâmide."""
+    base, _, level = kind.partition(".")
+    path = DATASETS[key][base]
+    if level:
+        stem, dot, ext = path.rpartition(".")
+        path = f"{stem}.{level}{dot}{ext}"
+    return path
+
+
+def local_path(key: str, kind: str) -> Path:
+    return DATA_DIR / relpath(key, kind)
+
+
+def remote_url(key: str, kind: str) -> str:
+    return DATASETS[key]["base_url"] + relpath(key, kind)
+
+
+def resolve(key: str, kind: str) -> str:
+    """Caminho local do arquivo ou, se permitido, a URL remota."""
+    p = local_path(key, kind)
+    if p.exists():
+        return str(p)
+    if remote_enabled():
+        return remote_url(key, kind)
+    raise MissingSource(f"{key}/{kind}: {p} não encontrado e SIMEX_REMOTE desabilitado")
+
+
+# ───────────────────────── leitura ─────────────────────────
+_downloaded: dict[tuple[str, str], bytes] = {}   # prefetch() sem cache em disco
+
+
+def _remote(key: str, kind: str, url: str):
+    """Origem legível (caminho ou buffer) do arquivo remoto."""
+    if http_cache.enabled():
+        return str(http_cache.cached(url))
+    data = _downloaded.pop((key, kind), None)
+    return io.BytesIO(data if data is not None else fetch.fetch(url))
+
+
+def _read_parquet(key: str, src: str) -> pd.DataFrame:
+    if src.startswith("http"):
+        src = _remote(key, "parquet", src)
+    return pd.read_parquet(src)
+
+
+def _read_geojson(key: str, src: str) -> gpd.GeoDataFrame:
+    if src.startswith("http"):
+        src = _remote(key, "geojson", src)
+    return gpd.read_file(src)
+
+
+def prefetch() -> dict:
+    """Baixa em paralelo todos os arquivos sem cópia local.
+
+    Só tem efeito com ``SIMEX_REMOTE`` ligado; devolve ``{(key, kind): erro}``
+    dos downloads que falharam (esses voltam a ser tentados no primeiro uso).
+    """
+    if not remote_enabled():
+        return {}
+    urls = {(key, kind): remote_url(key, kind)
+            for key in DATASETS for kind in ("parquet", "geojson")
+            if (key, kind) not in _cache and not local_path(key, kind).exists()}
+    use_cache = http_cache.enabled()
+    errors = {}
+    for k, res in fetch.fetch_many(urls, getter=http_cache.cached if use_cache else fetch.fetch).items():
+        if isinstance(res, Exception):
+            errors[k] = res
+        elif not use_cache:
+            _downloaded[k] = res
+    return errors
+
+
+# ───────────────────────── normalização de texto ─────────────────────────
+def _raw_bytes(s: str) -> bytes:
+    # bytes originais do texto decodificado errado: CP1252 para ‚ ƒ „ … e
+    # Latin-1 para o resto (inclui 0x81, 0x8D, 0x8F, 0x90 e 0x9D, que o
+    # CP1252 não define)
+    return b"".join(bytes((ord(c),)) if ord(c) < 256 else c.encode("cp1252") for c in s)
+
+
+def fix_text(s: str) -> str:
+    """Desfaz o mojibake (UTF-8 lido como Latin-1/CP1252, às vezes em mais
+    de uma camada): ``'IRMÃ\\x83Æ\\x92'`` → ``'IRMÃ'``. Texto já correto não muda."""
+    for _ in range(4):
+        try:
+            t = _raw_bytes(s).decode("utf-8")
+        except UnicodeError:
+            return s
+        if t == s:
+            return s
+        s = t
+    return s
+
+
+def _repair(s: pd.Series) -> pd.Series:
+    # cada valor distinto é corrigido uma vez (os nomes se repetem ano a ano)
+    u = s.dropna().unique()
+    return s.map(dict(zip(u, map(fix_text, u))))
+
+
+_cache: dict[tuple[str, str], object] = {}
+_memory: dict[str, tuple[int, int]] = {}
+_versions: dict[tuple[str, str], str] = {}   # fingerprint da origem de cada objeto carregado
+_missing: set[tuple[str, str]] = set()       # origens ausentes: não são procuradas a cada pedido
+_coarse: set[str] = set()                    # datasets sem pirâmide já avisados no log
+_lock = threading.Lock()
+
+
+def fingerprint(src: str) -> str:
+    """Identifica a versão da origem (arquivo local: mtime + tamanho; URL: hash
+    do conteúdo no cache HTTP, quando ligado)."""
+    if src.startswith("http"):
+        return f"{src}:{http_cache.cached(src).stem}" if http_cache.enabled() else src
+    st = os.stat(src)
+    return f"{src}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _apply_schema(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Converte ``df`` para o esquema declarado do dataset, registrando a memória."""
+    before = df.memory_usage(deep=True).sum()
+    for col, dtype in {**BASE_SCHEMA, **DATASETS[key].get("schema", {})}.items():
+        if col not in df.columns:
+            continue
+        if dtype == "float32":
+            # só reduz a precisão se o total acumulado em float32 continuar exato
+            a = df[col].to_numpy("float64")
+            if abs(a.sum() - a.astype("float32").sum()) > AREA_TOL:
+                log.info("%s.%s mantido em float64 (precisão)", key, col)
+                continue
+        df[col] = df[col].astype(dtype)
+    after = df.memory_usage(deep=True).sum()
+    _memory[key] = (before, after)
+    log.info("memória %s: %.2f MB → %.2f MB", key, before / 2**20, after / 2**20)
+    return df
+
+
+def memory_report() -> dict:
+    """``{key: (bytes antes, bytes depois)}`` dos datasets já carregados."""
+    return dict(_memory)
+
+
+def _read_source(key: str, kind: str, reader, src: str):
+    try:
+        obj = reader(key, src)
+    except Exception as e:
+        raise DatasetError(f"{key}/{kind}: falha ao ler {src}: {e}") from e
+    for col in DATASETS[key]["repair"]:
+        if col in obj.columns:
+            obj[col] = _repair(obj[col])
+    log.info("dataset %s/%s carregado de %s (%d linhas)", key, kind, src, len(obj))
+    return _apply_schema(key, obj) if kind == "parquet" else obj
+
+
+def _load(key: str, kind: str, reader, rebuild: bool = False):
+    k = (key, kind)
+    if k in _cache and not rebuild:
+        return _cache[k]
+    with _lock:
+        if k not in _cache or rebuild:
+            src = resolve(key, kind)
+            fp, obj = fingerprint(src), None
+            if snapshot.enabled():
+                if not rebuild:
+                    obj = snapshot.read(key, kind, fp)
+                if obj is None:
+                    snapshot.write(key, kind, _read_source(key, kind, reader, src), fp)
+                    obj = snapshot.read(key, kind)
+            else:
+                obj = _read_source(key, kind, reader, src)
+            _cache[k], _versions[k] = obj, fp
+            if kind == "parquet":   # rótulos derivados da versão anterior
+                _labels.pop(key, None); _ascii.pop(key, None); _cubes.pop(key, None); _bitmaps.pop(key, None)
+                _frames.pop(key, None); _indexes.pop(key, None)   # ids das feições vêm da tabela
+                query_cache.CACHE.invalidate(key)
+            elif kind == "geojson":
+                _frames.pop(key, None); _indexes.pop(key, None)
+    return _cache[k]
+
+
+def load_parquet(key: str) -> pd.DataFrame:
+    """Tabela do dataset (carregada uma única vez por processo)."""
+    return _load(key, "parquet", _read_parquet)
+
+
+_version: dict[str, tuple[tuple, str]] = {}   # key -> (fingerprints, versão)
+
+
+def version(key: str) -> str:
+    """Versão curta dos dados servidos de ``key`` (tabela, limites e níveis da
+    pirâmide); muda quando qualquer origem muda e é a mesma em todos os workers.
+
+    Roda a cada POST de figura (``figure_cache``): com as origens já carregadas
+    ou marcadas como ausentes, é só a comparação das fingerprints com as da
+    última chamada.
+    """
+    kinds = ["parquet", "geojson", *(f"geojson.z{z}" for z in geo.LEVELS)]
+    load_parquet(key)
+    for z in (None, *geo.LEVELS):
+        load_geojson(key, z)
+    fps = (SCHEMA, *(_versions.get((key, kind), "") for kind in kinds))
+    cached = _version.get(key)
+    if cached is None or cached[0] != fps:
+        _version[key] = cached = (fps, hashlib.sha1("|".join(map(str, fps)).encode()).hexdigest()[:12])
+    return cached[1]
+
+
+def preload(rebuild: bool = True) -> None:
+    """Carrega todos os datasets agora (no master do gunicorn, antes do fork).
+
+    Com snapshot ligado, ``rebuild`` regrava os arquivos Arrow a partir das
+    origens, garantindo que um deploy novo não sirva dados antigos.
+    """
+    _missing.clear(); _coarse.clear()
+    for key in DATASETS:
+        _load(key, "parquet", _read_parquet, rebuild)
+        try:
+            _load(key, "geojson", _read_geojson, rebuild)
+        except MissingSource as e:
+            log.warning("%s", e)
+            _missing.add((key, "geojson"))
+        except DatasetError as e:
+            log.warning("%s", e)
+        for z in geo.LEVELS:
+            if local_path(key, f"geojson.z{z}").exists():
+                _load(key, f"geojson.z{z}", _read_geojson, rebuild)
+        frames(key)   # enquadramento do mapa herdado pelos workers
+        index(key)    # índice espacial da seleção por caixa/laço
+
+
+# ───────────────────────── ids e rótulos ─────────────────────────
+AREA_ID = "area_id"   # coluna do id inteiro da área no cubo e nos agregados
+
+_labels: dict[str, pd.DataFrame] = {}
+_ascii: dict[str, dict[str, dict]] = {}
+
+
+def name_id(name: str) -> int:
+    """Id estável de uma área sem código próprio: CRC-32 do nome (31 bits)."""
+    return zlib.crc32(name.encode()) & 0x7FFFFFFF
+
+
+def _name_ids(names) -> dict[str, int]:
+    """``{nome: name_id(nome)}``. Dois nomes com o mesmo CRC-32 são erro
+    (``DatasetError``): desviar um deles para outro id o faria depender dos
+    demais nomes da versão dos dados (e da camada de limites)."""
+    out, seen = {}, {}
+    for n in sorted(names):
+        out[n] = i = name_id(n)
+        if seen.setdefault(i, n) != n:
+            raise DatasetError(f"colisão de id: {seen[i]!r} e {n!r} têm o mesmo CRC-32 ({i}); "
+                               "o dataset precisa de uma coluna de código (DATASETS[...]['id'])")
+    return out
+
+
+def _row_ids(key: str, df: pd.DataFrame) -> np.ndarray:
+    """Id da área de cada linha da tabela (-1: linha sem área)."""
+    spec = DATASETS[key]
+    ent = df[spec["entity"]]
+    col = df[spec["id"]] if spec.get("id") else ent
+    cats = col.cat.categories
+    if spec.get("id"):
+        table = pd.to_numeric(pd.Series(cats.astype(str)), errors="coerce").fillna(-1).to_numpy(np.int64)
+    else:
+        m = _name_ids(cats)
+        table = np.array([m[c] for c in cats], dtype=np.int64)
+    codes = col.cat.codes.to_numpy()
+    ids = table[codes] if len(table) else np.full(len(codes), -1, np.int64)
+    return np.where((codes >= 0) & (ent.cat.codes.to_numpy() >= 0), ids, -1)
+
+
+def labels(key: str) -> pd.DataFrame:
+    """Áreas do dataset indexadas pelo id, na ordem dos nomes: ``name``
+    (valor da coluna ``entity``), ``label`` (exibição; nomes repetidos em
+    áreas diferentes levam a UF) e ``ascii`` (rótulo transliterado)."""
+    if key not in _labels:
+        df = load_parquet(key)
+        ids, first = np.unique(_row_ids(key, df), return_index=True)
+        ids, first = ids[ids >= 0], first[ids >= 0]
+        t = pd.DataFrame({"name": df[DATASETS[key]["entity"]].to_numpy()[first].astype(str),
+                          "uf": df["sigla_uf"].to_numpy()[first].astype(str)},
+                         index=pd.Index(ids, name=AREA_ID))
+        t = t.sort_values("name", kind="stable")
+        dup = t["name"].duplicated(keep=False)
+        t["label"] = t["name"].where(~dup, t["name"] + " (" + t["uf"] + ")")
+        t["ascii"] = [unidecode.unidecode(n) for n in t["label"]]
+        _labels[key] = t.drop(columns="uf")
+    return _labels[key]
+
+
+def names(key: str, ids) -> np.ndarray:
+    """Rótulos de exibição das áreas ``ids`` (NaN para ids desconhecidos)."""
+    return labels(key)["label"].reindex(np.asarray(ids, dtype=np.int64)).to_numpy()
+
+
+def named(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` (agregado do cubo) com ``AREA_ID`` inteiro e o rótulo de cada
+    área na coluna ``entity`` do dataset."""
+    ids = df[AREA_ID].to_numpy(np.int64)
+    return df.assign(**{AREA_ID: ids, DATASETS[key]["entity"]: names(key, ids)})
+
+
+def geo_ids(key: str, gdf: gpd.GeoDataFrame) -> np.ndarray:
+    """Id da área de cada feição de ``gdf`` (-1: área desconhecida): o código
+    ``geo_id`` ou, sem ele, o id da área com o mesmo nome na tabela."""
+    spec = DATASETS[key]
+    if spec.get("geo_id") in gdf.columns:
+        ids = pd.to_numeric(gdf[spec["geo_id"]], errors="coerce")
+    else:
+        t = labels(key)
+        by_name = dict(zip(t["name"][::-1], t.index[::-1]))   # nome repetido: o primeiro id
+        miss = (lambda n: -1) if spec.get("id") else name_id   # sem código: nomes fora da tabela também têm id
+        ids = gdf[spec["geo_key"]].map(lambda n: by_name.get(n, miss(n)) if isinstance(n, str) else -1)
+    return ids.fillna(-1).to_numpy(np.int64)
+
+
+def to_ascii(key: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia de ``df`` sem acentos (exportação CSV).
+
+    Colunas categóricas usam o mapa valor → ASCII calculado uma vez por
+    coluna; só as demais colunas de texto são transliteradas na hora.
+    """
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            maps = _ascii.setdefault(key, {})
+            if col not in maps:
+                maps[col] = {c: unidecode.unidecode(c) if isinstance(c, str) else c
+                             for c in s.cat.categories}
+            out[col] = s.map(maps[col])
+        elif pd.api.types.is_string_dtype(s.dtype):
+            out[col] = s.map(lambda x: unidecode.unidecode(x) if isinstance(x, str) else x)
+    return df.assign(**out)
+
+
+# ───────────────────────── cubo ─────────────────────────
+_cubes: dict[str, Cube] = {}
+
+
+def _pandas_cube(key: str, df: pd.DataFrame) -> Cube:
+    spec = DATASETS[key]
+    if spec.get("dedup"):
+        df = df.drop_duplicates(subset=list(spec["dedup"]))
+    ids = labels(key).index
+    area = pd.Categorical.from_codes(ids.get_indexer(_row_ids(key, df)), categories=ids)
+    return Cube(df.assign(**{AREA_ID: area}), AREA_ID, first=spec.get("first", ()))
+
+
+def _scan_cube(key: str, cls, src: str):
+    """Cubo ``cls`` (``DuckCube`` ou ``LazyCube``) sobre o parquet ``src``,
+    com os mesmos ids de ``_row_ids``."""
+    spec = DATASETS[key]
+    col = spec.get("id") or spec["entity"]
+    raws = cls.distinct(src, col)
+    if spec.get("id"):
+        codes = pd.to_numeric(pd.Series(raws, dtype=object), errors="coerce")
+        mapping = {r: int(i) for r, i in zip(raws, codes) if i == i}
+    else:
+        names = [fix_text(r) for r in raws] if col in spec["repair"] else raws
+        m = _name_ids(set(names))
+        mapping = {r: m[n] for r, n in zip(raws, names)}
+    ids = labels(key).index
+    known = set(ids)
+    return cls(src, col, {r: i for r, i in mapping.items() if i in known}, ids, AREA_ID,
+               entity=spec["entity"], first=spec.get("first", ()), dedup=spec.get("dedup", ()),
+               repair=dict.fromkeys(spec["repair"], fix_text),
+               float32=load_parquet(key)["area_ha"].dtype == np.float32)
+
+
+def new_cube(key: str, engine: str, src: str | None = None):
+    """Cubo do dataset no backend ``engine`` (``BACKENDS``); ``src``: parquet
+    lido pelos motores DuckDB e Polars."""
+    if engine == "duckdb":
+        return _scan_cube(key, duck.DuckCube, src)
+    if engine == "polars":
+        from app import lazy   # Polars é opcional
+        return _scan_cube(key, lazy.LazyCube, src)
+    if engine != "pandas":
+        raise ValueError(f"{key}: backend {engine!r} desconhecido (use {', '.join(BACKENDS)})")
+    return _pandas_cube(key, load_parquet(key))
+
+
+def backend(key: str) -> str:
+    """Backend de consultas do dataset: ``SIMEX_QUERY_BACKEND_<KEY>`` ou,
+    sem ele, ``SIMEX_QUERY_BACKEND``."""
+    return os.environ.get(f"SIMEX_QUERY_BACKEND_{key.upper()}", BACKEND).lower()
+
+
+def _parquet_file(key: str) -> str | None:
+    """Arquivo parquet local do dataset (cópia em DATA_DIR ou no cache HTTP)."""
+    src = resolve(key, "parquet")
+    if not src.startswith("http"):
+        return src
+    return str(http_cache.cached(src)) if http_cache.enabled() else None
+
+
+def cube(key: str):
+    """Cubo área × ano × UF × categoria do dataset, com as áreas indexadas pelo
+    id inteiro (``AREA_ID``, na ordem dos nomes), no backend de ``backend``:
+    ``app.cube.Cube`` em memória, ``app.duck.DuckCube`` ou
+    ``app.lazy.LazyCube`` (mesmas consultas)."""
+    if key not in _cubes:
+        engine = backend(key)
+        src = _parquet_file(key) if engine != "pandas" else None
+        if engine != "pandas" and not src:
+            log.warning("%s: parquet sem cópia local, usando o cubo em memória", key)
+            engine = "pandas"
+        c = new_cube(key, engine, src)
+        if isinstance(c, Cube):
+            log.info("cubo %s: %s, %.1f KB", key, c.cum.shape, c.nbytes / 1024)
+        else:
+            log.info("cubo %s: %s sobre %s", key, engine, src)
+        _cubes[key] = c
+    return _cubes[key]
+
+
+# ───────────────────────── filtro de linhas ─────────────────────────
+_bitmaps: dict[str, BitmapIndex] = {}
+
+
+def bitmaps(key: str) -> BitmapIndex:
+    """Bitsets das linhas da tabela por ano, UF, categoria e área (ver
+    ``app.bitmap``); usados só por ``filtered``, os callbacks consultam o cubo."""
+    if key not in _bitmaps:
+        df = load_parquet(key)
+        ids = labels(key).index
+        b = BitmapIndex({
+            "ano": pd.Categorical(df["ano"]),
+            "sigla_uf": pd.Categorical(df["sigla_uf"]),
+            "categoria": pd.Categorical(df["categoria"]),
+            AREA_ID: pd.Categorical.from_codes(ids.get_indexer(_row_ids(key, df)), categories=ids),
+        })
+        log.info("bitsets %s: %d linhas, %.1f KB", key, b.n, b.nbytes / 1024)
+        _bitmaps[key] = b
+    return _bitmaps[key]
+
+
+def filtered(key: str, y0=None, y1=None, cat=None, ufs=None, areas=None) -> pd.DataFrame:
+    """Linhas da tabela que passam no filtro (vazio = sem filtro), como os
+    ``==`` / ``isin`` encadeados, resolvidas com os bitsets de ``bitmaps`` ou,
+    nos backends DuckDB e Polars, com o filtro aplicado na leitura do parquet."""
+    c = cube(key)
+    if not isinstance(c, Cube):
+        df = c.rows(y0, y1, cat, ufs, areas)
+        for col in DATASETS[key]["repair"]:
+            if col in df.columns:
+                df[col] = _repair(df[col])
+        return df.astype(load_parquet(key).dtypes.to_dict())
+    df, b = load_parquet(key), bitmaps(key)
+    anos = None
+    if y0 is not None or y1 is not None:
+        v = b.values["ano"]
+        anos = v[(v >= (v.min() if y0 is None else int(y0))) & (v <= (v.max() if y1 is None else int(y1)))]
+        if not len(anos):
+            return df.iloc[:0]
+    rows = b.rows(ano=anos, sigla_uf=ufs, categoria=[cat] if cat else None, **{AREA_ID: areas})
+    return df if len(rows) == len(df) else df.iloc[rows]
+
+
+def filter_options(key: str):
+    """Opções de estado/ano dos filtros e a lista ordenada de anos."""
+    df = load_parquet(key)
+    list_states = df["sigla_uf"].unique()
+    list_anual  = sorted(int(a) for a in df["ano"].unique())
+    return ([{"label": s, "value": s} for s in list_states],
+            [{"label": a, "value": a} for a in list_anual],
+            list_anual)
+
+
+_empty: dict[str, gpd.GeoDataFrame] = {}
+
+
+def geo_level(key: str, level: int | None) -> int | None:
+    """Nível que ``load_geojson(key, level)`` de fato carrega: ``level`` se a
+    cópia local do nível existe, senão None (limites originais)."""
+    if level is None:
+        return None
+    kind = f"geojson.z{level}"
+    if (key, kind) in _cache:
+        return level
+    if (key, kind) not in _missing:
+        if local_path(key, kind).exists():
+            return level
+        _missing.add((key, kind))
+    return None
+
+
+def load_geojson(key: str, level: int | None = None) -> gpd.GeoDataFrame:
+    """Limites do dataset; sem geometria disponível devolve um GeoDataFrame
+    vazio para que o dashboard continue funcionando (mapa em branco). Arquivos
+    ausentes são lembrados até o próximo ``preload``.
+
+    ``level``: nível da pirâmide (``geo.LEVELS``), lido só de cópia local
+    gerada por ``amaz.py piramide``; sem ela, os limites originais (avisado
+    uma vez por dataset).
+    """
+    if geo_level(key, level) is not None:
+        return _load(key, f"geojson.z{level}", _read_geojson)
+    if (key, "geojson") not in _missing:
+        try:
+            gdf = _load(key, "geojson", _read_geojson)
+        except MissingSource as e:   # avisa uma vez; as próximas chamadas já sabem
+            log.warning("%s", e)
+            _missing.add((key, "geojson"))
+        except DatasetError as e:    # falha de leitura: tenta de novo na próxima chamada
+            log.warning("%s", e)
+        else:
+            if level is not None and key not in _coarse:
+                _coarse.add(key)
+                log.warning("%s: pirâmide de simplificação ausente (%s); mapas usam os limites "
+                            "originais em todos os zooms. Gere com: python amaz.py piramide %s",
+                            key, local_path(key, f"geojson.z{level}").parent, key)
+            return gdf
+    if key not in _empty:
+        _empty[key] = gpd.GeoDataFrame({DATASETS[key]["geo_key"]: []}, geometry=[], crs="EPSG:4326")
+    return _empty[key]
+
+
+# ───────────────────────── enquadramento do mapa ─────────────────────────
+_frames: dict[str, dict] = {}
+
+
+def frames(key: str) -> dict:
+    """Centróide, bbox e zoom de cada área do GeoJSON (ver ``app.geo``)."""
+    if key not in _frames:
+        gdf = load_geojson(key)
+        _frames[key] = geo.frames(gdf, geo_ids(key, gdf))
+        log.info("enquadramento %s: %d áreas", key, len(_frames[key]))
+    return _frames[key]
+
+
+def view(key: str, ids) -> tuple[float, float, float]:
+    """``(lat, lon, zoom)`` do mapa enquadrando as áreas ``ids`` (vazio: visão padrão)."""
+    return geo.view(frames(key), ids)
+
+
+# ───────────────────────── seleção no mapa ─────────────────────────
+_indexes: dict[str, geo.Index] = {}
+
+
+def index(key: str) -> geo.Index:
+    """Índice espacial das feições do GeoJSON (ver ``app.geo``)."""
+    if key not in _indexes:
+        gdf = load_geojson(key)
+        _indexes[key] = geo.Index(gdf, geo_ids(key, gdf))
+    return _indexes[key]
+
+
+def select(key: str, selected) -> list[int]:
+    """Áreas do dataset tocadas pela caixa/laço do ``selectedData`` do mapa."""
+    entities = cube(key).entities
+    return [i for i in index(key).select(geo.selection(selected)) if i in entities]
@@ -0,0 +1,225 @@
+# app/duck.py
+"""
+Backend de consultas em DuckDB sobre os arquivos parquet locais.
+
+``DuckCube`` responde às mesmas consultas de ``app.cube.Cube`` (totais,
+totais por UF, série/matriz área × ano, anos ativos e atributos fixos) e ao
+filtro de linhas do download (``rows``) com SQL sobre ``read_parquet``, no
+próprio processo e sem rede. O DuckDB lê só as colunas usadas na consulta,
+aplica os filtros de UF, categoria e área na varredura (estatísticas dos
+row groups) e agrega em várias threads, sem manter a tabela agregada em
+memória.
+
+    SIMEX_QUERY_BACKEND=duckdb   # padrão: pandas (cubo em memória, app.cube)
+    SIMEX_DUCKDB_THREADS=4       # padrão: núcleos da máquina
+
+O DuckDB é opcional (``pip install duckdb``) e só é importado com o backend
+ligado. Os tipos seguem o esquema do dataset (``ano`` inteiro, ``area_ha``
+em float32 quando o pandas também usa) e as colunas de texto com mojibake
+são corrigidas na saída, de modo que os resultados são os do cubo.
+
+Comparação com o cubo em memória: ``app.bench``.
+"""
+from __future__ import annotations
+
+import os, threading
+
+import numpy as np
+import pandas as pd
+
+_con = None
+_pid = None
+_lock = threading.Lock()
+
+
+def connect():
+    """Cursor (uma conexão por processo, um cursor por consulta: seguro entre threads)."""
+    global _con, _pid
+    with _lock:
+        if _con is None or _pid != os.getpid():   # conexões não sobrevivem ao fork
+            import duckdb
+            threads = os.environ.get("SIMEX_DUCKDB_THREADS")
+            _con = duckdb.connect(config={"threads": int(threads)} if threads else {})
+            _pid = os.getpid()
+        return _con.cursor()
+
+
+def _q(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _lit(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _marks(values) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _filled(values) -> bool:
+    return values is not None and len(values) > 0
+
+
+class DuckCube:
+    """Consultas do cubo em SQL sobre o parquet ``src``.
+
+    ``key``: coluna da tabela que identifica a área e ``mapping`` o id de
+    cada valor dela (texto); ``entity``: coluna da área obrigatória (linhas
+    sem ela ficam de fora, como no ``groupby``). ``entities``: ids na ordem
+    dos resultados (a de ``datasets.labels``). ``first``, ``dedup``: como no
+    cubo; ``repair``: ``{coluna: função}`` aplicada aos textos da saída.
+    """
+
+    def __init__(self, src: str, key: str, mapping: dict[str, int], entities: pd.Index,
+                 name: str, entity: str | None = None, value: str = "area_ha",
+                 first: tuple[str, ...] = (), dedup: tuple[str, ...] = (),
+                 repair: dict | None = None, float32: bool = True):
+        self.src, self.entity, self.value = src, name, value
+        self.entities = entities
+        self.first = tuple(first)
+        self._key, self._need = key, entity or key
+        self._raws: dict[int, list[str]] = {}
+        for raw, i in mapping.items():
+            self._raws.setdefault(int(i), []).append(raw)
+        self._repair = repair or {}
+        self._attrs: dict[str, pd.Series] = {}
+
+        scan = f"read_parquet({_lit(src)}, file_row_number = true)"
+        if dedup:   # primeira linha de cada chave, na ordem do arquivo (drop_duplicates)
+            part = ", ".join(f"CAST({_q(c)} AS FLOAT)" if c == value and float32 else _q(c) for c in dedup)
+            scan = (f"(SELECT * FROM {scan} QUALIFY row_number() OVER "
+                    f"(PARTITION BY {part} ORDER BY file_row_number) = 1)")
+        pairs = ", ".join(f"({_lit(r)}, {int(i)})" for r, i in mapping.items())
+        ids = f"(VALUES {pairs}) m(raw, id)" if pairs else "(SELECT NULL::VARCHAR raw, NULL::BIGINT id WHERE false) m"
+        cols = [f"m.id AS {_q(name)}", "CAST(p.ano AS SMALLINT) AS ano", "p.sigla_uf", "p.categoria",
+                f"CAST(p.{_q(value)} AS {'FLOAT' if float32 else 'DOUBLE'}) AS {_q(value)}",
+                *(f"p.{_q(c)}" for c in self.first), "p.file_row_number AS rn"]
+        self._table = (f"SELECT {', '.join(cols)} FROM {scan} p JOIN {ids} "
+                       f"ON CAST(p.{_q(key)} AS VARCHAR) = m.raw WHERE p.{_q(self._need)} IS NOT NULL")
+
+    @staticmethod
+    def distinct(src: str, col: str) -> list[str]:
+        """Valores distintos (texto, sem nulos) de ``col`` no parquet ``src``."""
+        sql = (f"SELECT DISTINCT CAST({_q(col)} AS VARCHAR) FROM read_parquet({_lit(src)}) "
+               f"WHERE {_q(col)} IS NOT NULL")
+        return [r[0] for r in connect().execute(sql).fetchall()]
+
+    # ─────────── execução ───────────
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        return connect().execute(f"WITH t AS ({self._table}) {sql}", list(params)).df()
+
+    def _where(self, y0, y1, cat=None, ufs=None, entities=None) -> tuple[str, list]:
+        w, p = ["ano BETWEEN ? AND ?"], [int(y0), int(y1)]
+        if cat:
+            w.append("categoria = ?"); p.append(str(cat))
+        if _filled(ufs):
+            w.append(f"sigla_uf IN ({_marks(ufs)})"); p += [str(u) for u in ufs]
+        if _filled(entities):
+            w.append(f"{_q(self.entity)} IN ({_marks(entities)})"); p += [int(i) for i in entities]
+        return " AND ".join(w), p
+
+    def _order(self, df: pd.DataFrame, *by: str) -> pd.DataFrame:
+        """Resultado na ordem das áreas (e de ``by``), com a área categórica."""
+        pos = self.entities.get_indexer(df[self.entity].to_numpy(np.int64))
+        df = df.assign(_pos=pos).sort_values(["_pos", *by], na_position="last", kind="stable")
+        df[self.entity] = pd.Categorical.from_codes(df["_pos"].to_numpy(), dtype=pd.CategoricalDtype(self.entities))
+        return df.drop(columns="_pos").reset_index(drop=True)
+
+    def _text(self, col: str, s: pd.Series) -> np.ndarray:
+        fix = self._repair.get(col, lambda v: v)
+        u = s.dropna().unique()
+        return s.map(dict(zip(u, map(fix, u)))).to_numpy(object)
+
+    # ─────────── consultas ───────────
+    def totals(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Como ``Cube.totals``."""
+        w, p = self._where(y0, y1, cat, ufs, entities)
+        E, V = _q(self.entity), _q(self.value)
+        first = "".join(f", first({_q(c)} ORDER BY rn) AS {_q(c)}" for c in self.first)
+        df = self._order(self._query(f"SELECT {E}, sum({V}) AS {V}{first} FROM t WHERE {w} GROUP BY {E}", p))
+        for col in self.first:
+            df[col] = self._text(col, df[col])
+        return df.astype({self.value: "float64"})
+
+    def by_uf(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Como ``Cube.by_uf``."""
+        w, p = self._where(y0, y1, cat, ufs, entities)
+        E, V = _q(self.entity), _q(self.value)
+        df = self._query(f"SELECT {E}, sigla_uf, sum({V}) AS {V} FROM t WHERE {w} GROUP BY ALL", p)
+        df = self._order(df, "sigla_uf")
+        uf = df["sigla_uf"].astype(object)
+        return df.assign(sigla_uf=uf.where(uf.notna(), np.nan)).astype({self.value: "float64"})
+
+    def series(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Como ``Cube.series``."""
+        w, p = self._where(y0, y1, cat, ufs, entities)
+        E, V = _q(self.entity), _q(self.value)
+        df = self._order(self._query(f"SELECT ano, {E}, sum({V}) AS {V} FROM t WHERE {w} GROUP BY ALL", p))
+        df = df.sort_values("ano", kind="stable").reset_index(drop=True)
+        return df[["ano", self.entity, self.value]].astype({"ano": "int64", self.value: "float64"})
+
+    def matrix(self, y0, y1, cat=None, ufs=None, entities=None, focus=(), years=None) -> np.ndarray:
+        """Como ``Cube.matrix``."""
+        years = np.arange(int(y0), int(y1) + 1) if years is None else np.asarray(years, dtype=np.int64)
+        ids = list(dict.fromkeys(int(i) for i in focus if isinstance(i, (int, np.integer))))
+        if not ids or not len(years):
+            return np.zeros((len(focus), len(years)))
+        w, p = self._where(y0, y1, cat, ufs, entities)
+        E, V = _q(self.entity), _q(self.value)
+        df = self._query(f"SELECT {E}, ano, sum({V}) AS {V} FROM t WHERE {w} "
+                         f"AND {E} IN ({_marks(ids)}) GROUP BY ALL", p + ids)
+        piv = df.pivot(index=self.entity, columns="ano", values=self.value)
+        return piv.reindex(index=focus, columns=years).fillna(0).to_numpy("float64")
+
+    def active_years(self, y0, y1, cat=None, ufs=None, entities=None) -> list[int]:
+        """Como ``Cube.active_years``."""
+        w, p = self._where(y0, y1, cat, ufs, entities)
+        return [int(r[0]) for r in connect().execute(
+            f"WITH t AS ({self._table}) SELECT DISTINCT ano FROM t WHERE {w} ORDER BY ano", p).fetchall()]
+
+    def attribute(self, col: str) -> pd.Series:
+        """Como ``Cube.attribute`` (calculado uma vez por coluna)."""
+        if col not in self._attrs:
+            E = _q(self.entity)
+            df = self._order(self._query(f"SELECT {E}, first({_q(col)} ORDER BY rn) AS v FROM t GROUP BY {E}"))
+            idx = self.entities[df[self.entity].cat.codes.to_numpy()]
+            self._attrs[col] = pd.Series(self._text(col, df["v"]), index=idx, name=col)
+        return self._attrs[col]
+
+    def by_attribute(self, col: str, y0, y1, cat=None, ufs=None, entities=None, uf: bool = False) -> pd.DataFrame:
+        """Como ``Cube.by_attribute``."""
+        w, p = self._where(y0, y1, cat, ufs, entities)
+        E, V, C = _q(self.entity), _q(self.value), _q(col)
+        keys = ["sigla_uf", col] if uf else [col]
+        k = ", ".join(f"t.{_q(c)}" if c == "sigla_uf" else f"a.{C}" for c in keys)
+        df = self._query(f", a AS (SELECT {E}, first({C} ORDER BY rn) AS {C} FROM t GROUP BY {E}) "
+                         f"SELECT {k}, sum(t.{V}) AS {V} FROM t JOIN a USING ({E}) WHERE {w} "
+                         f"AND {' AND '.join(c + ' IS NOT NULL' for c in k.split(', '))} GROUP BY ALL", p)
+        df[col] = self._text(col, df[col])
+        df = df.sort_values(keys, kind="stable").reset_index(drop=True)
+        return df.assign(**{c: df[c].astype(object) for c in keys}).astype({self.value: "float64"})
+
+    def rows(self, y0=None, y1=None, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Linhas do parquet (todas as colunas, texto ainda sem correção) que
+        passam no filtro, na ordem do arquivo e com o índice do ``read_parquet``."""
+        w, p = [], []
+        if y0 is not None:
+            w.append("CAST(ano AS SMALLINT) >= ?"); p.append(int(y0))
+        if y1 is not None:
+            w.append("CAST(ano AS SMALLINT) <= ?"); p.append(int(y1))
+        if cat:
+            w.append("categoria = ?"); p.append(str(cat))
+        if _filled(ufs):
+            w.append(f"sigla_uf IN ({_marks(ufs)})"); p += [str(u) for u in ufs]
+        if _filled(entities):
+            raws = [r for i in dict.fromkeys(entities) for r in self._raws.get(int(i), ())]
+            w.append(f"{_q(self._need)} IS NOT NULL")
+            w.append(f"CAST({_q(self._key)} AS VARCHAR) IN ({_marks(raws)})" if raws else "false")
+            p += raws
+        sql = (f"SELECT * FROM read_parquet({_lit(self.src)}, file_row_number = true)"
+               f"{' WHERE ' + ' AND '.join(w) if w else ''} ORDER BY file_row_number")
+        df = connect().execute(sql, p).df()
+        pos = df.pop("file_row_number").to_numpy(np.int64)
+        idx = [c for c in df.columns if str(c).startswith("__index_level_")]   # índice gravado pelo pandas
+        return df.drop(columns=idx).set_index(pd.Index(df[idx[0]].to_numpy() if len(idx) == 1 else pos))
+
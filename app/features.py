@@ -0,0 +1,149 @@
+# app/features.py
+"""
+Feições GeoJSON pré-serializadas para os mapas coropléticos.
+
+Cada área do GeoJSON vira, uma única vez por versão dos dados, um fragmento
+JSON em bytes (as feições da área, com o id inteiro dela no membro ``id`` e
+sem propriedades: o coroplético usa o ``featureidkey`` padrão). O mapa deixa de embutir a geometria na figura: o traço
+recebe a URL
+
+    /simex/_features/<dataset>/<versão>/<nível>/<ids>.geojson
+
+e a rota monta a ``FeatureCollection`` concatenando os fragmentos das áreas
+pedidas, sem converter geometria nenhuma. Os ids da URL são as posições das
+áreas no armazém (iguais em todos os workers para a mesma versão); como a versão
+está na URL, a resposta é imutável e fica no cache do navegador.
+
+O nível (``z4``, ``z6``, ``z8`` ou ``base``) é o da pirâmide de
+simplificação que corresponde ao zoom exibido no mapa (``geo.level`` sobre
+``map_zoom``): a visão da Amazônia inteira leva contornos grosseiros e as
+áreas aproximadas, os detalhados. Sem o arquivo do nível (``amaz.py
+piramide`` não rodou) a URL já aponta para ``base``.
+
+Por padrão os mapas recebem a mesma coleção em TopoJSON quantizado
+(``<ids>.topojson``, ver ``app.topology``): fronteiras compartilhadas uma
+única vez e coordenadas inteiras em deltas, de 5 a 35% do GeoJSON. O
+script ``DECODER``, incluído em cada dashboard, intercepta o download do
+Plotly e entrega o GeoJSON decodificado no navegador.
+
+    SIMEX_GEO_FORMAT=geojson   # volta a servir GeoJSON aos mapas
+"""
+from __future__ import annotations
+
+import hashlib, logging, os, threading
+from pathlib import Path
+
+import dash
+import flask
+import shapely
+
+from app import datasets, geo
+from app.topology import Topology
+
+log = logging.getLogger(__name__)
+
+ROUTE = "/simex/_features"
+FORMAT = "geojson" if os.environ.get("SIMEX_GEO_FORMAT", "").lower() == "geojson" else "topojson"
+_JS = Path(__file__).with_name("static") / "topojson.js"
+DECODER = f"{ROUTE}/topojson.js?v={hashlib.sha1(_JS.read_bytes()).hexdigest()[:8]}"
+_HEAD, _TAIL = b'{"type":"FeatureCollection","features":[', b"]}"
+
+
+class FeatureStore:
+    """Fragmentos JSON das feições de cada área, endereçados pela posição da área."""
+
+    def __init__(self, gdf, ids):
+        keep = (ids >= 0) & gdf.geometry.notna().to_numpy()
+        ids = ids[keep].tolist()
+        geoms = shapely.to_geojson(gdf.geometry.to_numpy()[keep])
+        self.ids = sorted(set(ids))   # posições iguais em todos os níveis da pirâmide
+        self.pos = {a: i for i, a in enumerate(self.ids)}
+        parts = [[] for _ in self.ids]
+        for a, g in zip(ids, geoms):
+            parts[self.pos[a]].append(f'{{"type":"Feature","id":{a},"properties":null,"geometry":{g}}}')
+        self._frags = [",".join(p).encode() for p in parts]
+        self.nbytes = sum(map(len, self._frags))
+
+    def positions(self, ids) -> list[int]:
+        """Posições (ordenadas, sem repetição) das áreas conhecidas de ``ids``."""
+        return sorted({self.pos[a] for a in map(int, ids) if a in self.pos})
+
+    def collection(self, pos) -> bytes:
+        """``FeatureCollection`` das áreas nas posições ``pos`` (inválidas são ignoradas)."""
+        frags = [self._frags[i] for i in pos if 0 <= i < len(self._frags)]
+        return _HEAD + b",".join(frags) + _TAIL
+
+
+_stores: dict[tuple[str, int | None, str], tuple[str, FeatureStore | Topology]] = {}
+_lock = threading.Lock()
+
+
+def _level_name(level: int | None) -> str:
+    return "base" if level is None else f"z{level}"
+
+
+def store(key: str, level: int | None = None, fmt: str = "geojson") -> FeatureStore | Topology:
+    """Armazém do dataset no nível ``level`` (``fmt``: geojson ou topojson),
+    refeito quando a versão dos dados muda. Nível sem arquivo na pirâmide:
+    limites originais, quantizados na grade deles (``geo.quantum(None)``)."""
+    level = datasets.geo_level(key, level)
+    version = datasets.version(key)
+    cached = _stores.get((key, level, fmt))
+    if cached is None or cached[0] != version:
+        with _lock:
+            cached = _stores.get((key, level, fmt))
+            if cached is None or cached[0] != version:
+                gdf = datasets.load_geojson(key, level)
+                ids = datasets.geo_ids(key, gdf)
+                s = Topology(gdf, ids, geo.quantum(level), key) if fmt == "topojson" else FeatureStore(gdf, ids)
+                log.info("feições %s/%s (%s): %d áreas, %.1f KB", key, _level_name(level), fmt, len(s.ids), s.nbytes / 1024)
+                _stores[(key, level, fmt)] = cached = (version, s)
+    return cached[1]
+
+
+def url(key: str, ids, zoom: float | None = None, fmt: str = FORMAT) -> str:
+    """URL das feições das áreas ``ids`` no nível do ``zoom`` (para ``geojson=`` do Plotly)."""
+    level = None if zoom is None else datasets.geo_level(key, geo.level(zoom))
+    pos = store(key, level, fmt).positions(ids)
+    return (f"{ROUTE}/{key}/{datasets.version(key)}/{_level_name(level)}/"
+            f"{'-'.join(map(str, pos)) or 'vazio'}.{fmt}")
+
+
+def map_zoom(relayout: dict | None, zoom: float) -> float:
+    """Zoom exibido no mapa: o do usuário (``relayoutData``) quando o callback
+    veio só do próprio mapa ou dos destaques, que não reenquadram; senão o da
+    visão do servidor (``zoom``), que a figura nova impõe."""
+    trig = set(dash.callback_context.triggered_prop_ids)
+    if (relayout and "mapbox.zoom" in relayout
+            and trig and trig <= {"choropleth-map.relayoutData", "selected-areas-store.data"}):
+        return relayout["mapbox.zoom"]
+    return zoom
+
+
+def register(server) -> None:
+    """Rotas Flask que servem as coleções de feições e o decodificador TopoJSON."""
+
+    levels = {_level_name(z): z for z in (None, *geo.LEVELS)}
+    mimetypes = {"geojson": "application/geo+json", "topojson": "application/json"}
+
+    @server.route(f"{ROUTE}/<key>/<version>/<level>/<ids>.<any(geojson, topojson):fmt>")
+    def simex_features(key, version, level, ids, fmt):
+        if key not in datasets.DATASETS or level not in levels:
+            flask.abort(404)
+        try:
+            idx = [] if ids == "vazio" else [int(i) for i in ids.split("-")]
+        except ValueError:
+            flask.abort(404)
+        resp = flask.Response(store(key, levels[level], fmt).collection(sorted(set(idx))), mimetype=mimetypes[fmt])
+        if version == datasets.version(key):   # versão atual: imutável
+            resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    @server.route(f"{ROUTE}/topojson.js")
+    def simex_topojson_js():
+        resp = flask.send_file(_JS, mimetype="text/javascript", max_age=0)
+        if flask.request.args.get("v") == DECODER.rsplit("=", 1)[1]:
+            resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return resp
@@ -0,0 +1,78 @@
+# app/fetch.py
+"""
+Download concorrente dos arquivos remotos (GeoJSON / parquet).
+
+Cada URL é baixada com timeout, até ``RETRIES`` tentativas e backoff
+exponencial; ``fetch_many`` dispara todas em paralelo num pool de threads,
+de modo que a partida a frio dura o tempo do arquivo mais lento e não a
+soma de todos.
+"""
+from __future__ import annotations
+
+import logging, os, time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+log = logging.getLogger(__name__)
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+TIMEOUT = float(os.environ.get("SIMEX_FETCH_TIMEOUT", 45))
+RETRIES = int(os.environ.get("SIMEX_FETCH_RETRIES", 3))
+BACKOFF = 1.0   # segundos; dobra a cada nova tentativa
+WORKERS = int(os.environ.get("SIMEX_FETCH_WORKERS", 12))
+
+
+def request(url: str, *, headers: dict | None = None, retries: int = RETRIES,
+            timeout: float = TIMEOUT, backoff: float = BACKOFF) -> requests.Response:
+    """GET com tentativas; levanta a última exceção se todas falharem.
+
+    Respostas 304 (requisições condicionais) são devolvidas normalmente.
+    """
+    t0 = time.perf_counter()
+    for attempt in range(1, retries + 1):
+        try:
+            r = requests.get(url, headers={**HEADERS, **(headers or {})}, timeout=timeout)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            code = getattr(e.response, "status_code", None)
+            if code is not None and code < 500 and code not in (408, 429):
+                raise   # 404 & cia.: repetir não adianta
+            if attempt == retries:
+                log.error("falha ao baixar %s após %d tentativas: %s", url, attempt, e)
+                raise
+            wait = backoff * 2 ** (attempt - 1)
+            log.warning("tentativa %d/%d para %s falhou (%s); nova tentativa em %.1fs",
+                        attempt, retries, url, e, wait)
+            time.sleep(wait)
+            continue
+        log.info("GET %s → %d (%.1f KB) em %.2fs, tentativa %d",
+                 url, r.status_code, len(r.content) / 1024, time.perf_counter() - t0, attempt)
+        return r
+
+
+def fetch(url: str, **kw) -> bytes:
+    """Conteúdo de ``url`` (ver ``request``)."""
+    return request(url, **kw).content
+
+
+def fetch_many(urls: dict, *, getter=fetch, workers: int = WORKERS, **kw) -> dict:
+    """Baixa ``{nome: url}`` em paralelo com ``getter`` (padrão: ``fetch``).
+
+    Devolve ``{nome: resultado}`` para os downloads bem-sucedidos e
+    ``{nome: Exception}`` para os que falharam — uma falha não cancela as demais.
+    """
+    if not urls:
+        return {}
+    t0 = time.perf_counter()
+    out: dict = {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as pool:
+        futs = {name: pool.submit(getter, url, **kw) for name, url in urls.items()}
+        for name, fut in futs.items():
+            try:
+                out[name] = fut.result()
+            except Exception as e:
+                out[name] = e
+    ok = sum(not isinstance(v, Exception) for v in out.values())
+    log.info("fetch: %d/%d arquivos em %.2fs", ok, len(urls), time.perf_counter() - t0)
+    return out
@@ -0,0 +1,242 @@
+# app/figure_cache.py
+"""
+Cache das respostas já serializadas dos callbacks de figuras, compartilhado
+entre os workers do gunicorn num SQLite local.
+
+Um acerto devolve os bytes JSON guardados direto do ``before_request`` do
+Flask: nem as figuras Plotly são montadas nem o JSON é codificado de novo
+(o mapa, que carrega a geometria, é de longe a resposta mais cara). A chave
+combina:
+
+- o dashboard e a versão do código (módulo do dashboard e módulos
+  compartilhados de ``app``; um deploy novo não serve figuras antigas);
+- a versão dos dados (``datasets.version``);
+- o estado do filtro enviado pelo navegador (entradas e ``State`` do
+  callback). Cliques só contam quando disparam o callback (``n_clicks``
+  vira apenas "clicado"; ``clickData`` antigo é ignorado), como nos
+  callbacks dos dashboards; do ``relayoutData`` do mapa só conta o nível
+  da pirâmide do zoom (``geo.level``).
+
+A origem das URLs dos tiles (``tiles.origin``), embutida nas figuras de
+mapa, não entra na chave: a resposta é gravada com um marcador no lugar
+dela, trocado pela origem da requisição a cada acerto. Figuras aquecidas
+em ``localhost`` servem qualquer host.
+
+Entradas de versões antigas dos dados são descartadas ao gravar e o total é
+limitado em bytes, saindo primeiro as menos usadas:
+
+    SIMEX_FIGURE_CACHE_MB=256                       # 0 desliga o cache
+    SIMEX_FIGURE_CACHE_PATH=/var/cache/simex/figures.sqlite
+"""
+from __future__ import annotations
+
+import hashlib, json, logging, os, sqlite3, sys, threading, time
+from pathlib import Path
+
+import flask
+
+from app import datasets, geo, http_cache, tiles
+
+log = logging.getLogger(__name__)
+
+MAX_BYTES = int(float(os.environ.get("SIMEX_FIGURE_CACHE_MB", 256)) * 2**20)
+PATH = Path(os.environ.get("SIMEX_FIGURE_CACHE_PATH") or http_cache.CACHE_DIR / "figures.sqlite")
+TOUCH = 60            # segundos entre atualizações de "último uso" de uma entrada
+CLICKS = ("n_clicks", "clickData", "selectedData")
+ORIGIN = b"@SIMEX_ORIGIN@"   # marcador da origem dos tiles nas respostas gravadas
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS figures (
+    key     TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    version TEXT NOT NULL,
+    body    BLOB NOT NULL,
+    size    INTEGER NOT NULL,
+    used    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS figures_used ON figures (used);
+"""
+
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+
+# ─────────── chave ───────────
+def _normalize(items: list, changed: set) -> list:
+    out = []
+    for it in items:
+        if isinstance(it, list):   # pattern-matching: lista de entradas
+            out.append(_normalize(it, changed))
+            continue
+        value = it.get("value")
+        if it.get("property") in CLICKS:
+            cid = it["id"] if isinstance(it["id"], str) else json.dumps(it["id"], sort_keys=True, separators=(",", ":"))
+            prop = f"{cid}.{it['property']}"
+            value = (bool(value) if it["property"] == "n_clicks" else value) if prop in changed else None
+        elif it.get("property") == "relayoutData":   # só o zoom muda a figura (URL das feições)
+            zoom = (value or {}).get("mapbox.zoom")
+            value = zoom is not None and geo.level(zoom)
+        out.append([it.get("id"), it.get("property"), value])
+    return out
+
+
+def request_key(dashboard: str, code: str, version: str, body: dict) -> str:
+    """Hash do callback + estado do filtro de uma requisição ``_dash-update-component``."""
+    changed = set(body.get("changedPropIds") or [])
+    state = {"output": body["output"], "changed": sorted(changed),
+             "inputs": _normalize(body.get("inputs", []), changed),
+             "state": _normalize(body.get("state", []), changed)}
+    raw = json.dumps([dashboard, code, version, state], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ─────────── armazenamento ───────────
+class FigureCache:
+    """Tabela SQLite (WAL) com limite em bytes; uma conexão por thread e processo."""
+
+    def __init__(self, path: Path = PATH, max_bytes: int = MAX_BYTES):
+        self.path, self.max_bytes = Path(path), max_bytes
+        self._local = threading.local()
+        self.hits = self.misses = self.errors = 0
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():   # conexões não sobrevivem ao fork
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            db = self._db()
+            row = db.execute("SELECT body, used FROM figures WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] < time.time() - TOUCH:
+                db.execute("UPDATE figures SET used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.warning("figure cache: leitura falhou (%s)", e)
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, dataset: str, version: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        try:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM figures WHERE dataset = ? AND version != ?", (dataset, version))
+                db.execute("INSERT OR REPLACE INTO figures VALUES (?, ?, ?, ?, ?, ?)",
+                           (key, dataset, version, body, len(body), time.time()))
+                self._prune(db)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.warning("figure cache: gravação falhou (%s)", e)
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM figures").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        drop, freed = [], 0
+        for key, size in db.execute("SELECT key, size FROM figures ORDER BY used"):
+            drop.append((key,)); freed += size
+            if freed >= excess:
+                break
+        db.executemany("DELETE FROM figures WHERE key = ?", drop)
+
+    def clear(self) -> None:
+        self._db().execute("DELETE FROM figures")
+
+    def stats(self) -> dict:
+        out = {"pid": os.getpid(), "path": str(self.path), "max_bytes": self.max_bytes,
+               "hits": self.hits, "misses": self.misses, "errors": self.errors}
+        total = self.hits + self.misses
+        out["hit_ratio"] = round(self.hits / total, 4) if total else None
+        try:
+            out["entries"], out["bytes"] = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM figures").fetchone()
+        except sqlite3.Error:
+            pass
+        return out
+
+
+CACHE = FigureCache()
+
+
+# ─────────── integração com o Flask ───────────
+def _code_version(module: str) -> str:
+    """Hash do módulo do dashboard e dos módulos compartilhados de ``app``."""
+    src = getattr(sys.modules.get(module), "__file__", None)
+    h = hashlib.sha1()
+    for f in ([Path(src)] if src else []) + sorted(Path(__file__).parent.glob("*.py")):
+        h.update(f.read_bytes())
+    return h.hexdigest()[:12]
+
+
+def install(app, dataset: str) -> None:
+    """Serve do cache os callbacks de figuras do dashboard ``app`` (Dash).
+
+    Só entram callbacks com alguma saída ``figure``; respostas diferentes
+    de 200 (ex.: ``PreventUpdate``) nunca são gravadas.
+    """
+    if not enabled():
+        return
+    server = app.server
+    routes = server.extensions.setdefault("simex_figure_cache", {})
+    if not routes:
+        server.before_request(_before)
+        server.after_request(_after)
+    routes[app.config.routes_pathname_prefix + "_dash-update-component"] = (
+        app.config.routes_pathname_prefix, _code_version(app.config.name), dataset)
+
+
+def _before():
+    req = flask.request
+    target = flask.current_app.extensions["simex_figure_cache"].get(req.path)
+    if target is None or req.method != "POST":
+        return None
+    body = req.get_json(silent=True) or {}
+    if ".figure" not in body.get("output", ""):
+        return None
+    dashboard, code, dataset = target
+    version = datasets.version(dataset)
+    key = request_key(dashboard, code, version, body)
+    hit = CACHE.get(key)
+    if hit is not None:
+        return flask.Response(hit.replace(ORIGIN, _origins()[1]), mimetype="application/json")
+    flask.g.figure_cache = (key, dataset, version)
+    return None
+
+
+def _origins() -> tuple[bytes, bytes]:
+    """Origem dos tiles como aparece no JSON do Dash: crua e com "/" escapado."""
+    raw = tiles.origin().encode()
+    return raw, raw.replace(b"/", rb"\u002f")
+
+
+def _after(response):
+    pending = flask.g.pop("figure_cache", None)
+    if pending is not None and response.status_code == 200 and not response.direct_passthrough:
+        body = response.get_data()
+        raw, escaped = _origins()
+        if raw:
+            body = body.replace(escaped, ORIGIN).replace(raw, ORIGIN)
+        CACHE.put(*pending, body)
+    return response
+
+
+def stats() -> dict:
+    return CACHE.stats()
@@ -0,0 +1,66 @@
+# app/figures.py
+"""
+Figuras montadas direto das matrizes do cubo, sem passar por DataFrames em
+formato longo.
+
+``line_figure`` recebe a matriz área × ano de ``Cube.matrix`` e gera a mesma
+figura que ``px.line(df, x="ano", y="area_ha", color=<entidade>)`` geraria a
+partir da tabela longa (um traço por área, cores da paleta do template,
+mesmo hovertemplate e títulos dos eixos).
+"""
+from __future__ import annotations
+
+import dash
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+def line_figure(names, years, values: np.ndarray, entity: str, labels: dict | None = None,
+                template: str = "plotly_white", title: str | None = None,
+                line_shape: str | None = None, **layout) -> go.Figure:
+    """Série anual: uma linha por área (``names[i]`` ↔ ``values[i]``)."""
+    labels = labels or {}
+    xl, yl, el = labels.get("ano", "ano"), labels.get("area_ha", "area_ha"), labels.get(entity, entity)
+    colors = pio.templates[template].layout.colorway or [None]
+    years = np.asarray(years)
+    line = {"dash": "solid", "shape": line_shape} if line_shape else {"dash": "solid"}
+    fig = go.Figure([
+        go.Scatter(x=years, y=values[i], name=str(n), legendgroup=str(n),
+                   mode="lines", line={"color": colors[i % len(colors)], **line},
+                   marker={"symbol": "circle"}, orientation="v", showlegend=True,
+                   xaxis="x", yaxis="y",
+                   hovertemplate=f"{el}={n}<br>{xl}=%{{x}}<br>{yl}=%{{y}}<extra></extra>")
+        for i, n in enumerate(names)
+    ])
+    fig.update_layout(template=template,
+                      xaxis={"anchor": "y", "domain": [0.0, 1.0], "title": {"text": xl}},
+                      yaxis={"anchor": "x", "domain": [0.0, 1.0], "title": {"text": yl}},
+                      legend={"title": {"text": el}, "tracegroupgap": 0})
+    if title is None:
+        fig.update_layout(margin={"t": 60})   # como no px: sem título, margem superior reduzida
+    else:
+        fig.update_layout(title={"text": title})
+    return fig.update_layout(**layout) if layout else fig
+
+
+def patch(fig: go.Figure, *paths: str) -> dash.Patch:
+    """``Patch`` que atribui só os ``paths`` de ``fig`` (ex.: ``"data.0.marker.color"``)."""
+    full, out = fig.to_plotly_json(), dash.Patch()
+    for path in paths:
+        keys = [int(k) if k.isdigit() else k for k in path.split(".")]
+        src, dst = full, out
+        for k in keys[:-1]:
+            src, dst = src[k], dst[k]
+        dst[keys[-1]] = src[keys[-1]]
+    return out
+
+
+def partial(fig: go.Figure, paths: dict[str, list[str]]):
+    """``fig`` inteira ou, se o callback foi disparado só por entradas de
+    ``paths`` (``"store.data"`` → caminhos que ela muda), um ``Patch`` com os
+    caminhos dessas entradas. Carga inicial e mudança de filtro: figura inteira."""
+    trig = set(dash.callback_context.triggered_prop_ids)
+    if not trig or not trig <= paths.keys():
+        return fig
+    return patch(fig, *dict.fromkeys(p for t in sorted(trig) for p in paths[t]))
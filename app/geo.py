@@ -0,0 +1,166 @@
+# app/geo.py
+"""
+Enquadramento do mapa: centróide, bbox e zoom ajustado de cada área.
+
+A tabela é montada uma vez por GeoJSON carregado (ver ``datasets.frames``):
+centróides calculados numa projeção métrica (SIRGAS 2000 / Brazil
+Polyconic, sem o aviso de centróide em graus) e ponderados pela área das
+feições de mesmo id, bbox de todas as feições da área e o zoom que faz a
+bbox caber no mapa. Centralizar o mapa vira uma consulta ao dicionário; uma
+seleção com várias áreas usa a união das bboxes.
+
+Pirâmide de simplificação: ``amaz.py piramide`` grava, para cada camada,
+versões simplificadas ``<arquivo>.z<N>.geojson`` com tolerância de um pixel
+no zoom ``N`` (``LEVELS``). A simplificação é de cobertura
+(``shapely.coverage_simplify``): cada aresta compartilhada entre duas áreas
+é simplificada uma única vez, sem abrir buracos nem sobreposições entre
+vizinhos. O mapa usa o nível do zoom atual (``level``) e o GeoJSON original
+nos zooms mais próximos.
+
+No TopoJSON (``app.topology``) as coordenadas de cada nível são quantizadas
+numa grade de ``QUANTUM[nível]`` pixels do zoom do nível (o GeoJSON original
+usa o zoom máximo do enquadramento, ``ZOOM[1]``).
+
+Seleção no mapa: ``Index`` guarda uma STRtree sobre as feições da camada e
+resolve a caixa ou o laço do ``selectedData`` do Plotly (``selection``) nos
+ids de todas as áreas que a seleção toca, inclusive as que não estão
+desenhadas no mapa.
+"""
+from __future__ import annotations
+
+import math
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+METRIC_CRS = "EPSG:5880"        # SIRGAS 2000 / Brazil Polyconic
+DEFAULT_VIEW = (-14, -55, 4)    # (lat, lon, zoom) da Amazônia Legal inteira
+MAP_SIZE = (600, 400)           # px (largura, altura) típicos do mapa nos dashboards
+PAD = 0.15                      # folga em volta da bbox
+ZOOM = (3.0, 12.0)              # limites do zoom ajustado
+TILE = 512                      # px do mundo no zoom 0 (Mapbox GL)
+LEVELS = (4, 6, 8)              # zooms da pirâmide; acima do último, GeoJSON original
+QUANTUM = {4: 0.5, 6: 0.5, 8: 0.5, None: 0.5}   # passo da grade do TopoJSON, em px do zoom do nível
+
+
+def _merc(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def _unmerc(y):
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+
+def fit_zoom(minx, miny, maxx, maxy):
+    """Maior zoom (Web Mercator) em que a bbox, com folga, cabe no mapa."""
+    w, h = MAP_SIZE
+    dx = np.maximum(np.asarray(maxx) - minx, 1e-6) / 360
+    dy = np.maximum(_merc(np.asarray(maxy)) - _merc(miny), 1e-8) / (2 * np.pi)
+    z = np.log2(np.minimum(w / (TILE * dx), h / (TILE * dy)) / (1 + PAD))
+    return np.round(np.clip(z, *ZOOM), 2)
+
+
+def _valid(gdf: gpd.GeoDataFrame, ids: np.ndarray):
+    """Feições com área conhecida (id >= 0) e geometria não vazia."""
+    keep = (ids >= 0) & (gdf.geometry.notna() & ~gdf.geometry.is_empty).to_numpy()
+    return gdf[keep], ids[keep]
+
+
+def frames(gdf: gpd.GeoDataFrame, ids: np.ndarray) -> dict:
+    """``{id: (lat, lon, minx, miny, maxx, maxy, zoom)}`` das feições de ``gdf``
+    (``ids``: id da área de cada feição)."""
+    gdf, ids = _valid(gdf, ids)
+    if gdf.empty:
+        return {}
+    b = gdf.geometry.bounds.set_axis(ids)
+    b = b.groupby(level=0).agg({"minx": "min", "miny": "min", "maxx": "max", "maxy": "max"})
+
+    m = gdf.geometry.to_crs(METRIC_CRS)
+    w = m.area.to_numpy()
+    w = np.where(w > 0, w, 1.0)   # linhas/pontos: média simples
+    c = m.centroid
+    acc = pd.DataFrame({"x": c.x.to_numpy() * w, "y": c.y.to_numpy() * w, "w": w},
+                       index=ids).groupby(level=0).sum()
+    cen = gpd.GeoSeries(gpd.points_from_xy(acc["x"] / acc["w"], acc["y"] / acc["w"]),
+                        index=acc.index, crs=METRIC_CRS).to_crs(gdf.crs or "EPSG:4326")
+    b["lat"], b["lon"] = cen.y.reindex(b.index), cen.x.reindex(b.index)
+    b["zoom"] = fit_zoom(b["minx"], b["miny"], b["maxx"], b["maxy"])
+    cols = ["lat", "lon", "minx", "miny", "maxx", "maxy", "zoom"]
+    return {int(i): tuple(float(v) for v in row) for i, row in zip(b.index, b[cols].to_numpy())}
+
+
+def view(table: dict, ids) -> tuple[float, float, float]:
+    """``(lat, lon, zoom)`` que enquadra as áreas ``ids``.
+
+    Uma área: centrada no centróide. Várias: centro da união das bboxes.
+    Nenhuma área conhecida: visão padrão.
+    """
+    rows = [table[i] for i in dict.fromkeys(ids or ()) if i in table]
+    if not rows:
+        return DEFAULT_VIEW
+    if len(rows) == 1 and not math.isnan(rows[0][0]):
+        return rows[0][0], rows[0][1], rows[0][6]
+    minx, miny = min(r[2] for r in rows), min(r[3] for r in rows)
+    maxx, maxy = max(r[4] for r in rows), max(r[5] for r in rows)
+    lat = float(_unmerc((_merc(miny) + _merc(maxy)) / 2))
+    return lat, (minx + maxx) / 2, float(fit_zoom(minx, miny, maxx, maxy))
+
+
+# ─────────── pirâmide de simplificação ───────────
+def pixel(zoom: float) -> float:
+    """Graus de longitude por pixel no ``zoom`` (Web Mercator)."""
+    return 360 / (TILE * 2 ** zoom)
+
+
+def quantum(level: int | None) -> float:
+    """Passo (graus) da grade de quantização do TopoJSON no nível ``level``."""
+    return pixel(ZOOM[1] if level is None else level) * QUANTUM[level]
+
+
+def level(zoom: float) -> int | None:
+    """Nível da pirâmide para o ``zoom`` do mapa (None: geometria original)."""
+    return next((z for z in LEVELS if z >= math.floor(zoom)), None)
+
+
+def simplify(gdf: gpd.GeoDataFrame, zoom: int) -> gpd.GeoDataFrame:
+    """Camada simplificada para o nível ``zoom`` (arestas compartilhadas juntas)."""
+    geoms = gdf.geometry.to_numpy().copy()
+    bad = ~shapely.is_valid(geoms)
+    geoms[bad] = shapely.make_valid(geoms[bad])   # cobertura exige polígonos válidos
+    out = gdf.copy()
+    out.geometry = gpd.GeoSeries(shapely.coverage_simplify(geoms, pixel(zoom)), index=gdf.index, crs=gdf.crs)
+    return out
+
+
+# ─────────── seleção no mapa ───────────
+class Index:
+    """Índice espacial (STRtree) das feições de uma camada, por id da área."""
+
+    def __init__(self, gdf: gpd.GeoDataFrame, ids: np.ndarray):
+        gdf, self.ids = _valid(gdf, ids)
+        geoms = gdf.geometry.to_numpy().copy()
+        bad = ~shapely.is_valid(geoms)
+        geoms[bad] = shapely.make_valid(geoms[bad])
+        self.tree = shapely.STRtree(geoms)
+
+    def select(self, shape) -> list[int]:
+        """Ids (sem repetição, na ordem da camada) das áreas que tocam ``shape``."""
+        if shape is None:
+            return []
+        hits = np.sort(self.tree.query(shape, predicate="intersects"))
+        return list(dict.fromkeys(self.ids[hits].tolist()))
+
+
+def selection(data: dict | None):
+    """Polígono da caixa ou do laço de um ``selectedData`` de mapa (None se não houver)."""
+    data = data or {}
+    box = (data.get("range") or {}).get("mapbox")
+    if box:
+        (x0, y0), (x1, y1) = box
+        return shapely.box(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+    lasso = (data.get("lassoPoints") or {}).get("mapbox")
+    if lasso and len(lasso) >= 3:
+        return shapely.make_valid(shapely.Polygon(lasso))
+    return None
@@ -0,0 +1,142 @@
+# app/http_cache.py
+"""
+Cache HTTP persistente em disco para as URLs dos datasets.
+
+Os arquivos ficam endereçados pelo conteúdo (``objects/<sha256>.<ext>``) e
+cada URL tem um registro em ``meta/`` com ETag, Last-Modified e o hash do
+blob. Na primeira leitura de cada processo a URL é revalidada com
+``If-None-Match`` / ``If-Modified-Since``: um 304 reaproveita o blob e nada é
+baixado de novo entre reinícios do gunicorn e deploys. Se a rede falhar, o
+blob já em cache é usado assim mesmo.
+
+    SIMEX_CACHE_DIR=/var/cache/simex   # padrão: $XDG_CACHE_HOME/simex
+    SIMEX_HTTP_CACHE=0                 # desliga o cache
+
+Pré-aquecimento (ex.: no build da imagem ou antes de subir o gunicorn):
+
+    python -m app cache prewarm [--all]
+    python -m app cache info
+    python -m app cache prune
+"""
+from __future__ import annotations
+
+import hashlib, json, logging, os, tempfile, threading, time
+from pathlib import Path
+
+import requests
+
+from app import fetch
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.environ.get("SIMEX_CACHE_DIR")
+                 or Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "simex")
+
+_fresh: dict[str, Path] = {}   # URLs já revalidadas neste processo
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.environ.get("SIMEX_HTTP_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def _meta_path(url: str) -> Path:
+    return CACHE_DIR / "meta" / (hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+
+def _blob_path(digest: str, url: str) -> Path:
+    return CACHE_DIR / "objects" / digest[:2] / (digest + Path(url).suffix)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)   # atômico: outros workers nunca veem arquivo pela metade
+
+
+def _read_meta(url: str) -> dict | None:
+    try:
+        meta = json.loads(_meta_path(url).read_text())
+    except (OSError, ValueError):
+        return None
+    return meta if _blob_path(meta["sha256"], url).exists() else None
+
+
+def _store(url: str, r: requests.Response) -> Path:
+    digest = hashlib.sha256(r.content).hexdigest()
+    blob = _blob_path(digest, url)
+    if not blob.exists():
+        _write_atomic(blob, r.content)
+    meta = {"url": url, "sha256": digest, "size": len(r.content),
+            "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+            "fetched_at": time.time()}
+    _write_atomic(_meta_path(url), json.dumps(meta).encode())
+    return blob
+
+
+def cached(url: str, **kw) -> Path:
+    """Caminho local do conteúdo de ``url``, revalidado uma vez por processo."""
+    if url in _fresh:
+        return _fresh[url]
+    meta = _read_meta(url)
+    cond = {}
+    if meta:
+        if meta.get("etag"): cond["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"): cond["If-Modified-Since"] = meta["last_modified"]
+    try:
+        r = fetch.request(url, headers=cond, **kw)
+    except requests.RequestException as e:
+        if not meta:
+            raise
+        log.warning("revalidação de %s falhou (%s); usando cópia em cache", url, e)
+        path = _blob_path(meta["sha256"], url)
+    else:
+        if r.status_code == 304 and meta:
+            log.info("cache: %s não modificado (304)", url)
+            path = _blob_path(meta["sha256"], url)
+        else:
+            path = _store(url, r)
+    with _lock:
+        _fresh[url] = path
+    return path
+
+
+def get(url: str, **kw) -> bytes:
+    return cached(url, **kw).read_bytes()
+
+
+# ───────────────────────── manutenção ─────────────────────────
+def _urls(all_: bool) -> dict:
+    from app import datasets
+    return {f"{key}/{kind}": datasets.remote_url(key, kind)
+            for key in datasets.DATASETS for kind in ("parquet", "geojson")
+            if all_ or not datasets.local_path(key, kind).exists()}
+
+
+def prewarm(all_: bool = False) -> int:
+    urls = _urls(all_)
+    res = fetch.fetch_many(urls, getter=cached)
+    for name, r in sorted(res.items()):
+        print(f"{'ERRO' if isinstance(r, Exception) else 'ok  '} {name}: {r}")
+    return sum(isinstance(r, Exception) for r in res.values())
+
+
+def info() -> None:
+    total = 0
+    for p in sorted((CACHE_DIR / "meta").glob("*.json")):
+        m = json.loads(p.read_text()); total += m["size"]
+        print(f"{m['size'] / 1024:10.1f} KB  {m['sha256'][:12]}  {m['etag'] or '-':>24}  {m['url']}")
+    print(f"{total / 1024:10.1f} KB  em {CACHE_DIR}")
+
+
+def prune() -> int:
+    """Remove blobs que nenhuma URL referencia mais."""
+    live = {json.loads(p.read_text())["sha256"] for p in (CACHE_DIR / "meta").glob("*.json")}
+    removed = 0
+    for blob in (CACHE_DIR / "objects").glob("*/*"):
+        if blob.name.split(".")[0] not in live:
+            blob.unlink(); removed += 1
+    print(f"{removed} blob(s) removido(s)")
+    return removed
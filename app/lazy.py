@@ -0,0 +1,184 @@
+# app/lazy.py
+"""
+Motor Polars (Arrow) para as consultas dos dashboards.
+
+``LazyCube`` guarda a tabela do dataset num ``polars.DataFrame`` (colunas
+Arrow: textos categóricos, ``ano`` Int16, ``area_ha`` Float32/64, nenhuma
+coluna de objetos Python) e responde às consultas de ``app.cube.Cube``
+montando um ``LazyFrame`` por consulta: filtro de ano, categoria, UF e
+área, agregação por área, ano, UF ou atributo (pizzas de ``grupo`` e
+``esfera``), executada pelo otimizador e pelo pool de threads do Polars
+(``POLARS_MAX_THREADS``; padrão: núcleos da máquina). Só o resultado, já
+pequeno, vira pandas. O download lê o parquet com os filtros aplicados na
+varredura (``rows``).
+
+O motor é escolhido por dashboard (ver ``datasets.backend``):
+
+    SIMEX_QUERY_BACKEND_IMOVEIS_RURAIS=polars
+
+O Polars é opcional (``pip install polars``); este módulo só é importado
+pelos datasets que o usam.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+
+def _filled(values) -> bool:
+    return values is not None and len(values) > 0
+
+
+def _objects(s: pl.Series) -> np.ndarray:
+    """Textos da coluna como objetos (NaN nos nulos), como no pandas."""
+    return np.array([np.nan if v is None else v for v in s.cast(pl.String).to_list()], dtype=object)
+
+
+class LazyCube:
+    """Consultas do cubo em ``LazyFrame`` sobre a tabela do parquet ``src``.
+
+    Mesmos parâmetros de ``app.duck.DuckCube``; as colunas de ``repair`` são
+    corrigidas na carga (antes do ``dedup``, como no pandas).
+    """
+
+    def __init__(self, src: str, key: str, mapping: dict[str, int], entities: pd.Index,
+                 name: str, entity: str | None = None, value: str = "area_ha",
+                 first: tuple[str, ...] = (), dedup: tuple[str, ...] = (),
+                 repair: dict | None = None, float32: bool = True):
+        self.src, self.entity, self.value = src, name, value
+        self.entities = entities
+        self.first = tuple(first)
+        self._key, self._need = key, entity or key
+        self._raws: dict[int, list[str]] = {}
+        for raw, i in mapping.items():
+            self._raws.setdefault(int(i), []).append(raw)
+        self._dtype = pd.CategoricalDtype(entities)
+        self._pos = pl.DataFrame({name: np.asarray(entities, dtype=np.int64),
+                                  "_pos": np.arange(len(entities), dtype=np.int64)})
+        self._attrs: dict[str, pl.DataFrame] = {}
+
+        lf = pl.scan_parquet(src).with_row_index("rn")
+        fixes = []
+        for col, fix in (repair or {}).items():
+            raws = self.distinct(src, col)
+            fixes.append(pl.col(col).cast(pl.String).replace(raws, [fix(r) for r in raws]))
+        lf = lf.with_columns(*fixes, pl.col(key).cast(pl.String).alias("_raw"), pl.col("ano").cast(pl.Int16),
+                             pl.col(value).cast(pl.Float32 if float32 else pl.Float64))
+        if dedup:   # primeira linha de cada chave (já corrigida), na ordem do arquivo
+            lf = lf.unique(subset=list(dedup), keep="first", maintain_order=True)
+        ids = pl.LazyFrame({"_raw": list(mapping), name: list(mapping.values())},
+                           schema={"_raw": pl.String, name: pl.Int64})
+        lf = lf.filter(pl.col(self._need).is_not_null()).join(ids, on="_raw", how="inner")
+        cat = [pl.col(c).cast(pl.String).cast(pl.Categorical) for c in ("sigla_uf", "categoria", *self.first)]
+        self.frame = lf.select(name, "ano", value, *cat, "rn").collect()
+        self.nbytes = self.frame.estimated_size()
+
+    @staticmethod
+    def distinct(src: str, col: str) -> list[str]:
+        """Valores distintos (texto, sem nulos) de ``col`` no parquet ``src``."""
+        s = pl.scan_parquet(src).select(pl.col(col).cast(pl.String)).drop_nulls().unique().collect()
+        return s[col].to_list()
+
+    # ─────────── execução ───────────
+    def _filter(self, y0, y1, cat=None, ufs=None, entities=None) -> pl.LazyFrame:
+        e = pl.col("ano").is_between(int(y0), int(y1))
+        if cat:
+            e &= pl.col("categoria") == str(cat)
+        if _filled(ufs):
+            e &= pl.col("sigla_uf").is_in([str(u) for u in ufs])
+        if _filled(entities):
+            e &= pl.col(self.entity).is_in([int(i) for i in entities])
+        return self.frame.lazy().filter(e)
+
+    def _sum(self) -> pl.Expr:
+        return pl.col(self.value).cast(pl.Float64).sum()
+
+    def _pandas(self, lf: pl.LazyFrame, *by) -> pd.DataFrame:
+        """Resultado na ordem das áreas (e de ``by``), em pandas com a área categórica."""
+        df = lf.join(self._pos.lazy(), on=self.entity).sort(
+            ["_pos", *(pl.col(c).cast(pl.String) for c in by)], nulls_last=True).collect()
+        out = {}
+        for c in df.columns:
+            if c == self.entity:
+                out[c] = pd.Categorical.from_codes(df["_pos"].to_numpy(), dtype=self._dtype)
+            elif c != "_pos":
+                out[c] = _objects(df[c]) if df[c].dtype in (pl.Categorical, pl.String) else df[c].to_numpy()
+        return pd.DataFrame(out)
+
+    def _attribute(self, col: str) -> pl.DataFrame:
+        if col not in self._attrs:
+            self._attrs[col] = (self.frame.lazy().group_by(self.entity)
+                                .agg(pl.col(col).sort_by("rn").first()).collect())
+        return self._attrs[col]
+
+    # ─────────── consultas ───────────
+    def totals(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Como ``Cube.totals``."""
+        first = [pl.col(c).sort_by("rn").first() for c in self.first]
+        return self._pandas(self._filter(y0, y1, cat, ufs, entities)
+                            .group_by(self.entity).agg(self._sum(), *first))
+
+    def by_uf(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Como ``Cube.by_uf``."""
+        return self._pandas(self._filter(y0, y1, cat, ufs, entities)
+                            .group_by(self.entity, "sigla_uf").agg(self._sum()), "sigla_uf")
+
+    def series(self, y0, y1, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Como ``Cube.series``."""
+        df = self._pandas(self._filter(y0, y1, cat, ufs, entities)
+                          .group_by("ano", self.entity).agg(self._sum()))
+        df = df.sort_values("ano", kind="stable").reset_index(drop=True)
+        return df[["ano", self.entity, self.value]].astype({"ano": "int64"})
+
+    def matrix(self, y0, y1, cat=None, ufs=None, entities=None, focus=(), years=None) -> np.ndarray:
+        """Como ``Cube.matrix``."""
+        years = np.arange(int(y0), int(y1) + 1) if years is None else np.asarray(years, dtype=np.int64)
+        ids = list(dict.fromkeys(int(i) for i in focus if isinstance(i, (int, np.integer))))
+        if not ids or not len(years):
+            return np.zeros((len(focus), len(years)))
+        df = (self._filter(y0, y1, cat, ufs, entities).filter(pl.col(self.entity).is_in(ids))
+              .group_by(self.entity, "ano").agg(self._sum()).collect())
+        piv = pd.DataFrame({c: df[c].to_numpy() for c in df.columns}).pivot(
+            index=self.entity, columns="ano", values=self.value)
+        return piv.reindex(index=list(focus), columns=years).fillna(0).to_numpy("float64")
+
+    def active_years(self, y0, y1, cat=None, ufs=None, entities=None) -> list[int]:
+        """Como ``Cube.active_years``."""
+        s = self._filter(y0, y1, cat, ufs, entities).select(pl.col("ano").unique().sort()).collect()
+        return [int(y) for y in s["ano"]]
+
+    def attribute(self, col: str) -> pd.Series:
+        """Como ``Cube.attribute``."""
+        df = self._pandas(self._attribute(col).lazy())
+        return pd.Series(df[col].to_numpy(), index=self.entities[df[self.entity].cat.codes.to_numpy()], name=col)
+
+    def by_attribute(self, col: str, y0, y1, cat=None, ufs=None, entities=None, uf: bool = False) -> pd.DataFrame:
+        """Como ``Cube.by_attribute``."""
+        keys = ["sigla_uf", col] if uf else [col]
+        lf = (self._filter(y0, y1, cat, ufs, entities).drop(col, strict=False)
+              .join(self._attribute(col).lazy(), on=self.entity)
+              .drop_nulls(keys).group_by(keys).agg(self._sum())
+              .sort([pl.col(c).cast(pl.String) for c in keys]).collect())
+        return pd.DataFrame({c: _objects(lf[c]) if c in keys else lf[c].to_numpy() for c in lf.columns})
+
+    def rows(self, y0=None, y1=None, cat=None, ufs=None, entities=None) -> pd.DataFrame:
+        """Linhas do parquet (todas as colunas, texto ainda sem correção) que
+        passam no filtro, na ordem do arquivo e com o índice do ``read_parquet``."""
+        e = pl.lit(True)
+        if y0 is not None:
+            e &= pl.col("ano").cast(pl.Int16) >= int(y0)
+        if y1 is not None:
+            e &= pl.col("ano").cast(pl.Int16) <= int(y1)
+        if cat:
+            e &= pl.col("categoria") == str(cat)
+        if _filled(ufs):
+            e &= pl.col("sigla_uf").is_in([str(u) for u in ufs])
+        if _filled(entities):
+            raws = [r for i in dict.fromkeys(entities) for r in self._raws.get(int(i), ())]
+            e &= pl.col(self._need).is_not_null() & pl.col(self._key).cast(pl.String).is_in(raws)
+        df = pl.scan_parquet(self.src).with_row_index("_rn").filter(e).collect()
+        pos = df["_rn"].to_numpy().astype(np.int64)
+        df = df.drop("_rn").to_pandas()
+        idx = [c for c in df.columns if str(c).startswith("__index_level_")]   # índice gravado pelo pandas
+        return df.drop(columns=idx).set_index(pd.Index(df[idx[0]].to_numpy() if len(idx) == 1 else pos))
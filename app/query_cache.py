@@ -0,0 +1,143 @@
+# app/query_cache.py
+"""
+Cache LRU dos agregados calculados pelos callbacks.
+
+A chave é o estado normalizado do filtro (``filter_key``): dataset,
+intervalo de anos, categoria, estados, áreas e destaques — listas ordenadas
+e sem repetição, de modo que a mesma visão (padrão "Todas", um estado, o
+botão de reset) cai sempre na mesma entrada, qualquer que seja a ordem dos
+cliques — mais o nome da função que calcula o agregado (ranking, série,
+pizzas: cada callback guarda só o que usa). O valor guardado são os DataFrames já agregados; quem lê não deve
+alterá-los.
+
+O cache é limitado pelo tamanho em bytes dos objetos guardados (os menos
+usados saem primeiro) e cada entrada expira após o TTL:
+
+    SIMEX_QUERY_CACHE_MB=64      # 0 desliga o cache
+    SIMEX_QUERY_CACHE_TTL=3600   # segundos
+
+Acertos, faltas, expirações e despejos ficam em ``stats()`` (por processo),
+servido em ``/simex/_stats``.
+"""
+from __future__ import annotations
+
+import os, sys, threading, time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_BYTES = int(float(os.environ.get("SIMEX_QUERY_CACHE_MB", 64)) * 2**20)
+TTL = float(os.environ.get("SIMEX_QUERY_CACHE_TTL", 3600))
+
+
+def _item(x):
+    # ids de área continuam inteiros; o resto vira texto
+    return int(x) if isinstance(x, (int, np.integer)) and not isinstance(x, bool) else str(x)
+
+
+def _items(v) -> tuple:
+    if v is None or (isinstance(v, str) and not v):
+        return ()
+    if isinstance(v, str):
+        return (v,)
+    return tuple(sorted({_item(x) for x in v}, key=lambda x: (isinstance(x, str), x)))
+
+
+def filter_key(dataset: str, y0, y1, cat=None, states=None, areas=None, highlights=None) -> tuple:
+    """``(dataset, ano inicial, ano final, categoria, estados, áreas, destaques)``."""
+    return (dataset, int(y0), int(y1), cat or None, _items(states), _items(areas), _items(highlights))
+
+
+def sizeof(obj) -> int:
+    """Bytes ocupados por ``obj`` (DataFrames e arrays contados a fundo)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(sizeof(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class QueryCache:
+    """LRU com limite em bytes e TTL; seguro entre threads."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES, ttl: float = TTL):
+        self.max_bytes, self.ttl = max_bytes, ttl
+        self._data: OrderedDict[tuple, tuple[float, int, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = self.hits = self.misses = self.expired = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key); self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value) -> None:
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._data))); self.evictions += 1
+
+    def _drop(self, key) -> None:
+        self.bytes -= self._data.pop(key)[1]
+
+    def invalidate(self, dataset: str | None = None) -> None:
+        """Descarta as entradas de ``dataset`` (ou todas)."""
+        with self._lock:
+            for key in [k for k in self._data if dataset is None or k[0] == dataset]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"pid": os.getpid(), "entries": len(self._data), "bytes": self.bytes,
+                    "max_bytes": self.max_bytes, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_ratio": round(self.hits / total, 4) if total else None,
+                    "expired": self.expired, "evictions": self.evictions}
+
+
+CACHE = QueryCache()
+_MISS = object()
+
+
+def cached(dataset: str, fn, y0, y1, cat=None, states=None, areas=None, highlights=None):
+    """Resultado de ``fn`` para o filtro, calculado só na primeira vez.
+
+    ``fn`` recebe o filtro já normalizado (listas ordenadas), então o valor
+    depende apenas da chave (filtro + nome de ``fn``).
+    """
+    key = filter_key(dataset, y0, y1, cat, states, areas, highlights)
+    args = (*key[1:4], *map(list, key[4:]))
+    if CACHE.max_bytes <= 0:
+        return fn(*args)
+    key += (fn.__name__,)
+    value = CACHE.get(key, _MISS)
+    if value is _MISS:
+        value = fn(*args)
+        CACHE.put(key, value)
+    return value
+
+
+def stats() -> dict:
+    return CACHE.stats()
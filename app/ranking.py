@@ -0,0 +1,76 @@
+# app/ranking.py
+"""
+Ranking das áreas por valor acumulado (top-K, bottom-K e posição).
+
+Trabalha direto sobre o vetor contíguo de valores: ``np.partition`` acha o
+K-ésimo valor em O(n) e só os K selecionados são ordenados, em vez de
+ordenar todas as áreas a cada clique; a posição (``rank_of``) sai de uma
+única ordenação estável. Empates são resolvidos pela ordem das linhas (a
+das categorias da área, vinda do cubo), de modo que top-K, bottom-K e
+``rank`` concordam entre si e são estáveis entre chamadas.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Posições dos ``k`` maiores valores, do maior para o menor."""
+    n = len(values)
+    k = max(min(k, n), 0)
+    if k == 0:
+        return np.arange(0)
+    if k < n:
+        kth = np.partition(values, n - k)[n - k]
+        above = np.flatnonzero(values > kth)
+        idx = np.concatenate([above, np.flatnonzero(values == kth)[:k - len(above)]])
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -values[idx]))]
+
+
+def rank_of(values: np.ndarray, idx) -> np.ndarray:
+    """Posição (1 = maior) das linhas ``idx``, com o mesmo desempate de ``top_k``."""
+    order = np.argsort(-values, kind="stable")   # empates na ordem das linhas
+    pos = np.empty(len(values), dtype=np.int64)
+    pos[order] = np.arange(1, len(values) + 1)
+    return pos[np.asarray(idx, dtype=np.intp)]
+
+
+class Ranking:
+    """Ranking das linhas de ``frame`` (uma por área) pela coluna ``value``."""
+
+    def __init__(self, frame: pd.DataFrame, entity: str, value: str = "area_ha"):
+        self.frame, self.entity = frame.reset_index(drop=True), entity
+        self.values = np.ascontiguousarray(self.frame[value].to_numpy("float64"))
+        self._pos = pd.Index(self.frame[entity])
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _pick(self, values: np.ndarray, k: int, within) -> pd.DataFrame:
+        if within is None or not len(within):
+            return self.frame.take(top_k(values, k))
+        idx = np.flatnonzero(self._pos.isin(list(within)))
+        return self.frame.take(idx[top_k(values[idx], k)])
+
+    def top(self, k: int = 10, within=None) -> pd.DataFrame:
+        """As ``k`` maiores áreas (só entre ``within``, se informado)."""
+        return self._pick(self.values, k, within)
+
+    def bottom(self, k: int = 10, within=None) -> pd.DataFrame:
+        """As ``k`` menores áreas (só entre ``within``, se informado)."""
+        return self._pick(-self.values, k, within)
+
+    def ranks(self, entities) -> np.ndarray:
+        """Posição de cada área (0 para áreas fora do ranking)."""
+        ix = self._pos.get_indexer(list(entities))
+        out = np.zeros(len(ix), dtype=np.int64)
+        out[ix >= 0] = rank_of(self.values, ix[ix >= 0])
+        return out
+
+    def rank(self, entity) -> int | None:
+        """Posição da área entre todas (não só no top-K); None se ausente."""
+        r = int(self.ranks([entity])[0])
+        return r or None
@@ -0,0 +1,90 @@
+# app/snapshot.py
+"""
+Snapshot dos datasets em Arrow IPC, mapeado em memória e compartilhado
+entre os workers do gunicorn.
+
+O master (``preload_app = True`` em ``gunicorn.conf.py``) carrega cada
+dataset uma vez e grava ``<SIMEX_SNAPSHOT_DIR>/<key>.<kind>.arrow``. Todos os
+processos leem esses arquivos com ``pyarrow.memory_map``: os buffers das
+colunas ficam no page cache do sistema e são os mesmos para todos os
+workers, então o RSS cresce com o tamanho dos dados e não com
+dados × workers. Colunas de texto viram ``string[pyarrow]`` (sem objetos
+Python por célula, que o refcount duplicaria página a página após o fork) e
+as geometrias são guardadas em WKB.
+
+    SIMEX_SNAPSHOT_DIR=/dev/shm/simex   # liga o snapshot (vazio = desligado)
+"""
+from __future__ import annotations
+
+import json, logging, os, tempfile
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+
+log = logging.getLogger(__name__)
+
+_STRINGS = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+
+def directory() -> Path | None:
+    d = os.environ.get("SIMEX_SNAPSHOT_DIR")
+    return Path(d) if d else None
+
+
+def enabled() -> bool:
+    return directory() is not None
+
+
+def path(key: str, kind: str) -> Path:
+    return directory() / f"{key}.{kind}.arrow"
+
+
+def write(key: str, kind: str, obj: pd.DataFrame, source: str = "") -> Path:
+    """Grava ``obj`` (DataFrame ou GeoDataFrame) como arquivo Arrow IPC.
+
+    ``source`` identifica a origem (ver ``datasets.fingerprint``); ``read`` o
+    compara para descartar snapshots de uma versão anterior dos dados.
+    """
+    meta = {"source": source}
+    if isinstance(obj, gpd.GeoDataFrame):
+        meta["crs"] = obj.crs.to_json() if obj.crs else ""
+        meta["geometry"] = obj.geometry.name
+        obj = pd.DataFrame(obj).assign(**{obj.geometry.name: obj.geometry.to_wkb()})
+    table = pa.Table.from_pandas(obj, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           b"simex": json.dumps(meta).encode()})
+    dst = path(key, kind)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=".tmp-")
+    os.close(fd)
+    with pa.OSFile(tmp, "wb") as f, pa.ipc.new_file(f, table.schema) as w:
+        w.write_table(table)
+    os.replace(tmp, dst)   # workers com o arquivo antigo mapeado continuam válidos
+    log.info("snapshot %s: %.1f KB", dst, dst.stat().st_size / 1024)
+    return dst
+
+
+def read(key: str, kind: str, source: str | None = None) -> pd.DataFrame | None:
+    """DataFrame cujos buffers apontam para o arquivo mapeado.
+
+    None se não houver snapshot ou se ele veio de outra ``source``.
+    """
+    src = path(key, kind)
+    if not src.exists():
+        return None
+    table = pa.ipc.open_file(pa.memory_map(str(src))).read_all()
+    meta = json.loads((table.schema.metadata or {}).get(b"simex", b"{}"))
+    if source is not None and meta.get("source") != source:
+        return None
+    geom = meta.get("geometry")
+    if geom:
+        wkb = table.column(geom).to_numpy(zero_copy_only=False)
+        table = table.drop_columns([geom])
+    df = table.to_pandas(types_mapper=_STRINGS.get, split_blocks=True)
+    if geom:
+        df = gpd.GeoDataFrame(df, geometry=gpd.GeoSeries.from_wkb(wkb, crs=meta["crs"] or None),
+                              crs=meta["crs"] or None)
+        df = df.rename_geometry(geom) if geom != "geometry" else df
+    return df
@@ -0,0 +1,64 @@
+// app/static/topojson.js
+//
+// Decodificador do TopoJSON quantizado servido em /simex/_features/…/<ids>.topojson
+// (ver app/topology.py). O Plotly baixa o `geojson` do coroplético por
+// XMLHttpRequest e lê `responseText`; para essas URLs a resposta é trocada
+// pela FeatureCollection equivalente, montada aqui a partir dos arcos
+// compartilhados (deltas inteiros × escala + translação).
+(function () {
+  "use strict";
+
+  var URL_TOPO = /\/simex\/_features\/.*\.topojson(\?|$)/;
+  var proto = XMLHttpRequest.prototype;
+  var text = Object.getOwnPropertyDescriptor(proto, "responseText").get;
+  var open = proto.open;
+
+  function decode(topo) {
+    var t = topo.transform, sx = t.scale[0], sy = t.scale[1], tx = t.translate[0], ty = t.translate[1];
+    var arcs = topo.arcs.map(function (arc) {
+      var x = 0, y = 0;
+      return arc.map(function (p) {
+        x += p[0]; y += p[1];
+        return [x * sx + tx, y * sy + ty];
+      });
+    });
+    function ring(refs) {
+      var pts = [];
+      refs.forEach(function (i, k) {
+        var a = i < 0 ? arcs[~i].slice().reverse() : arcs[i];
+        Array.prototype.push.apply(pts, k ? a.slice(1) : a);   // junção repetida só uma vez
+      });
+      return pts;
+    }
+    var features = [];
+    Object.keys(topo.objects).forEach(function (name) {
+      topo.objects[name].geometries.forEach(function (g) {
+        features.push({
+          type: "Feature",
+          id: g.id,
+          properties: g.properties || null,
+          geometry: {type: "MultiPolygon", coordinates: g.arcs.map(function (poly) { return poly.map(ring); })}
+        });
+      });
+    });
+    return {type: "FeatureCollection", features: features};
+  }
+
+  proto.open = function (method, url) {
+    if (URL_TOPO.test(String(url))) {
+      var xhr = this, decoded;
+      Object.defineProperty(xhr, "responseText", {
+        configurable: true,
+        get: function () {
+          var raw = text.call(xhr);
+          if (xhr.readyState !== 4 || xhr.status !== 200) return raw;
+          if (decoded === undefined) decoded = JSON.stringify(decode(JSON.parse(raw)));
+          return decoded;
+        }
+      });
+    }
+    return open.apply(this, arguments);
+  };
+
+  window.simexTopojson = {decode: decode};
+})();
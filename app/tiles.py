@@ -0,0 +1,281 @@
+# app/tiles.py
+"""
+Tiles vetoriais (Mapbox Vector Tile) das camadas de limites.
+
+A rota
+
+    /simex/_tiles/<dataset>/<versão>/<z>/<x>/<y>.mvt
+
+recorta as feições do dataset no tile ``z/x/y`` (esquema XYZ do Web
+Mercator), usando o nível da pirâmide de simplificação que corresponde ao
+zoom (``geo.level``), e devolve o tile codificado em protobuf (especificação
+MVT 2.1, codificador próprio: sem dependências além do shapely). Cada área
+vira uma feição cujo id é o id inteiro da área (``datasets.AREA_ID``), sem
+propriedades.
+
+Os tiles são pré-cortados até o zoom ``ZCUT`` com ``python -m app tiles
+build`` ou gravados em disco na primeira vez que são pedidos. Só vão para o
+disco tiles com conteúdo, de zoom até ``ZCUT`` e pedidos com a versão atual
+na URL; os mais profundos (em número sem limite) são recortados a cada
+pedido e ficam no cache do navegador. Tiles fora do retângulo da camada
+respondem 404. Como a versão dos dados está na URL, a resposta é imutável:
+o navegador guarda e reaproveita a geometria entre interações e entre
+usuários do mesmo proxy.
+
+Os mapas dos dashboards usam os tiles como camada de contorno de todas as
+áreas do dataset (``layer``); o coroplético continua recebendo só valores
+por área e a URL do GeoJSON (o Plotly não colore feições de tiles por
+valor).
+
+    SIMEX_TILE_DIR=/var/cache/simex/tiles   # padrão: <SIMEX_CACHE_DIR>/tiles
+    SIMEX_TILE_ZMAX=8                       # último zoom pré-cortado/gravado
+    SIMEX_PUBLIC_URL=https://simex.org.br   # origem das URLs dos tiles
+
+O Mapbox GL busca os tiles num web worker, onde URLs relativas não
+funcionam: a URL leva a origem (``SIMEX_PUBLIC_URL`` ou, sem ela, o host da
+requisição). O cache de figuras grava as respostas sem a origem e a repõe
+a cada acerto, então o aquecimento serve qualquer host.
+"""
+from __future__ import annotations
+
+import logging, os, shutil, threading
+from pathlib import Path
+
+import flask
+import numpy as np
+import shapely
+
+from app import datasets, geo, http_cache
+
+log = logging.getLogger(__name__)
+
+ROUTE = "/simex/_tiles"
+TILE_DIR = Path(os.environ.get("SIMEX_TILE_DIR") or http_cache.CACHE_DIR / "tiles")
+EXTENT = 4096        # coordenadas inteiras por lado do tile
+BUFFER = 64          # folga do recorte (evita costuras nas bordas)
+ZMAX = 22
+ZCUT = int(os.environ.get("SIMEX_TILE_ZMAX", 8))   # último zoom gravado em disco
+
+
+# ─────────── codificação protobuf (vector_tile.proto 2.1) ───────────
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _bytes(field: int, payload: bytes) -> bytes:
+    return _varint(field << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _uint(field: int, v: int) -> bytes:
+    return _varint(field << 3) + _varint(v)
+
+
+def _packed(field: int, values) -> bytes:
+    return _bytes(field, b"".join(map(_varint, values)))
+
+
+def _rings(polys):
+    """Anéis de ``polys`` na orientação do MVT (externo com área positiva, y para baixo)."""
+    for p in polys:
+        rings = [np.asarray(p.exterior.coords, dtype=np.int64)[:-1]]
+        rings += [np.asarray(r.coords, dtype=np.int64)[:-1] for r in p.interiors]
+        for i, r in enumerate(rings):
+            if len(r) < 3:
+                if i == 0:
+                    break   # externo degenerado: descarta o polígono
+                continue
+            x, y = r[:, 0], r[:, 1]
+            area = np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)
+            if area == 0:
+                if i == 0:
+                    break
+                continue
+            yield r if (area > 0) == (i == 0) else r[::-1]
+
+
+def _geometry(polys) -> list[int]:
+    """Comandos MoveTo/LineTo/ClosePath dos polígonos (deltas em zigzag)."""
+    cmds, cur = [], np.zeros(2, dtype=np.int64)
+    for r in _rings(polys):
+        d = np.diff(r, axis=0, prepend=cur[None])
+        cur = r[-1]
+        z = ((d << 1) ^ (d >> 63)).ravel().tolist()
+        cmds += [9, *z[:2], 2 | (len(r) - 1) << 3, *z[2:], 15]
+    return cmds
+
+
+def _layer(name: str, feats: list[tuple[int, list[int]]]) -> bytes:
+    body = [_uint(15, 2), _bytes(1, name.encode())]
+    for fid, geom in feats:
+        body.append(_bytes(2, _uint(1, fid) + _uint(3, 3) + _packed(4, geom)))
+    body.append(_uint(5, EXTENT))
+    return _bytes(3, b"".join(body))
+
+
+# ─────────── recorte ───────────
+def bounds(z: int, x: int, y: int, buffer: float = 0) -> tuple[float, float, float, float]:
+    """(oeste, sul, leste, norte) do tile em graus, com ``buffer`` em unidades do tile."""
+    n, f = 2 ** z, buffer / EXTENT
+    lon = lambda t: t / n * 360 - 180
+    lat = lambda t: float(geo._unmerc(np.pi * (1 - 2 * t / n)))
+    return lon(x - f), lat(y + 1 + f), lon(x + 1 + f), lat(y - f)
+
+
+class TileSource:
+    """Geometrias de um nível da pirâmide com índice espacial (STRtree)."""
+
+    def __init__(self, gdf, ids, name: str):
+        keep = (ids >= 0) & (gdf.geometry.notna() & ~gdf.geometry.is_empty).to_numpy()
+        self.name, self.fid = name, ids[keep]
+        geoms = gdf.geometry.to_numpy()[keep]
+        bad = ~shapely.is_valid(geoms)
+        geoms[bad] = shapely.make_valid(geoms[bad])
+        self.geoms, self.tree = geoms, shapely.STRtree(geoms)
+        self.bbox = shapely.total_bounds(geoms) if len(geoms) else None   # camada sem geometria
+
+    def inside(self, z: int, x: int, y: int) -> bool:
+        """O tile (com a folga do recorte) toca o retângulo envolvente da camada?"""
+        if self.bbox is None:
+            return False
+        w, s, e, n = bounds(z, x, y, BUFFER)
+        x0, y0, x1, y1 = self.bbox
+        return w <= x1 and e >= x0 and s <= y1 and n >= y0
+
+    def covers(self, z: int, x: int, y: int) -> bool:
+        return len(self.tree.query(shapely.box(*bounds(z, x, y)))) > 0
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """Tile ``z/x/y`` codificado (bytes vazios se nenhuma área o toca)."""
+        clip = bounds(z, x, y, BUFFER)
+        hits = self.tree.query(shapely.box(*clip))
+        if not len(hits):
+            return b""
+        w, s, e, n = bounds(z, x, y)
+        my0, my1 = geo._merc(s), geo._merc(n)
+
+        def to_tile(c):
+            tx = (c[:, 0] - w) / (e - w) * EXTENT
+            ty = (my1 - geo._merc(c[:, 1])) / (my1 - my0) * EXTENT
+            return np.column_stack([tx, ty])
+
+        g = shapely.clip_by_rect(self.geoms[hits], *clip)
+        g = shapely.set_precision(shapely.transform(g, to_tile), 1.0)
+        groups: dict[int, list] = {}
+        for fid, geom in zip(self.fid[hits], g):
+            if not geom.is_empty:
+                groups.setdefault(int(fid), []).append(geom)
+        feats = []
+        for fid, gs in sorted(groups.items()):
+            geom = gs[0] if len(gs) == 1 else shapely.union_all(gs, grid_size=1.0)   # feições da mesma área
+            polys = [p for p in shapely.get_parts(geom) if p.geom_type == "Polygon" and not p.is_empty]
+            if cmds := _geometry(polys):
+                feats.append((fid, cmds))
+        return _layer(self.name, feats) if feats else b""
+
+
+_sources: dict[tuple[str, int | None], tuple[str, TileSource]] = {}
+_lock = threading.Lock()
+
+
+def source(key: str, level: int | None = None) -> TileSource:
+    """Fonte do dataset no nível ``level``, refeita quando a versão dos dados muda."""
+    version = datasets.version(key)
+    cached = _sources.get((key, level))
+    if cached is None or cached[0] != version:
+        with _lock:
+            cached = _sources.get((key, level))
+            if cached is None or cached[0] != version:
+                gdf = datasets.load_geojson(key, level)
+                src = TileSource(gdf, datasets.geo_ids(key, gdf), key)
+                _sources[(key, level)] = cached = (version, src)
+    return cached[1]
+
+
+def tile(key: str, z: int, x: int, y: int, persist: bool = True) -> bytes:
+    """Tile do dataset, lido do disco ou recortado; com ``persist`` o recorte
+    com conteúdo é gravado (tiles vazios não ocupam disco)."""
+    path = TILE_DIR / key / datasets.version(key) / str(z) / str(x) / f"{y}.mvt"
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+    data = source(key, geo.level(z)).tile(z, x, y)
+    if persist and data:
+        try:
+            http_cache._write_atomic(path, data)
+        except OSError as e:   # disco cheio/somente leitura: serve assim mesmo
+            log.warning("tile %s/%d/%d/%d não gravado: %s", key, z, x, y, e)
+    return data
+
+
+def build(keys=(), zmax: int = ZCUT) -> dict:
+    """Pré-corta os tiles de zoom 0..``zmax`` que tocam alguma área; remove versões antigas."""
+    out = {}
+    for key in keys or datasets.DATASETS:
+        version, n = datasets.version(key), 0
+        for z in range(zmax + 1):
+            src = source(key, geo.level(z))
+            if not len(src.geoms):
+                break
+            w, s, e, nn = shapely.total_bounds(src.geoms)
+            t = lambda lat: int((1 - geo._merc(lat) / np.pi) / 2 * 2 ** z)
+            xs = range(max(int((w + 180) / 360 * 2 ** z), 0), min(int((e + 180) / 360 * 2 ** z), 2 ** z - 1) + 1)
+            ys = range(max(t(nn), 0), min(t(s), 2 ** z - 1) + 1)
+            for x in xs:
+                for y in ys:
+                    if src.covers(z, x, y):
+                        tile(key, z, x, y)
+                        n += 1
+        for old in (TILE_DIR / key).glob("*"):
+            if old.name != version:
+                shutil.rmtree(old, ignore_errors=True)
+        out[key] = n
+        log.info("tiles %s: %d tiles (z0–z%d)", key, n, zmax)
+    return out
+
+
+def clear() -> None:
+    shutil.rmtree(TILE_DIR, ignore_errors=True)
+
+
+# ─────────── mapas ───────────
+def origin() -> str:
+    """Origem usada nas URLs dos tiles (o worker do Mapbox GL exige URL absoluta)."""
+    url = os.environ.get("SIMEX_PUBLIC_URL") or (flask.request.host_url if flask.has_request_context() else "")
+    return url.rstrip("/")
+
+
+def url(key: str) -> str:
+    """Modelo ``{z}/{x}/{y}`` da URL dos tiles do dataset."""
+    return f"{origin()}{ROUTE}/{key}/{datasets.version(key)}/{{z}}/{{x}}/{{y}}.mvt"
+
+
+def layer(key: str, **style) -> dict:
+    """Camada ``mapbox.layers`` com o contorno de todas as áreas do dataset, sob o coroplético."""
+    return {"sourcetype": "vector", "source": [url(key)], "sourcelayer": key,
+            "type": "line", "color": "#808080", "opacity": 0.5, "line": {"width": 0.6},
+            "below": "traces", **style}
+
+
+def register(server) -> None:
+    """Rota Flask que serve os tiles."""
+
+    @server.route(f"{ROUTE}/<key>/<version>/<int:z>/<int:x>/<int:y>.mvt")
+    def simex_tiles(key, version, z, x, y):
+        if key not in datasets.DATASETS or z > ZMAX or not (x < 2 ** z and y < 2 ** z):
+            flask.abort(404)
+        if not source(key, geo.level(z)).inside(z, x, y):
+            flask.abort(404)
+        current = version == datasets.version(key)
+        data = tile(key, z, x, y, persist=current and z <= ZCUT)   # versão antiga ou zoom profundo: não grava
+        resp = flask.Response(data, mimetype="application/vnd.mapbox-vector-tile")
+        if current:   # versão atual: imutável
+            resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            resp.headers["Cache-Control"] = "no-cache"
+        return resp
@@ -0,0 +1,154 @@
+# app/topology.py
+"""
+Topologia quantizada (TopoJSON) das camadas de limites.
+
+As coordenadas são quantizadas numa grade de passo ``quantum`` (graus) e
+os anéis dos polígonos são cortados nas junções (pontos em que os vizinhos
+mudam de um anel para outro): cada trecho de fronteira compartilhado entre
+duas áreas vira um único arco, referenciado pelas duas (a segunda com o
+índice invertido, ``~i``). Os arcos são gravados com deltas inteiros entre
+pontos consecutivos, como no TopoJSON.
+
+``Topology`` guarda um fragmento JSON pré-serializado por arco e a lista de
+arcos de cada área; ``collection(pos)`` monta o TopoJSON só com as áreas
+pedidas (cada geometria com o id inteiro da área no membro ``id``) e os
+arcos que elas usam (renumerados). O navegador converte de
+volta para GeoJSON com ``app/static/topojson.js``.
+"""
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import shapely
+
+_M = np.int64(1) << 31   # chave de um ponto quantizado: x * _M + y
+
+
+def _rings(geoms):
+    """Coordenadas dos anéis (sem o ponto de fechamento) e o anel de cada ponto;
+    o polígono de cada anel e se ele é externo; a geometria de cada polígono."""
+    polys, geom_of = shapely.get_parts(geoms, return_index=True)
+    keep = shapely.get_type_id(polys) == 3
+    polys, geom_of = polys[keep], geom_of[keep]
+    ext = shapely.get_exterior_ring(polys)
+    n_int = shapely.get_num_interior_rings(polys)
+    rings = [ext]
+    ring_poly = [np.arange(len(polys))]
+    outer = [np.ones(len(polys), bool)]
+    for i in range(int(n_int.max(initial=0))):
+        has = np.flatnonzero(n_int > i)
+        rings.append(shapely.get_interior_ring(polys[has], i))
+        ring_poly.append(has)
+        outer.append(np.zeros(len(has), bool))
+    rings, ring_poly, outer = np.concatenate(rings), np.concatenate(ring_poly), np.concatenate(outer)
+    coords, ring_of = shapely.get_coordinates(rings, return_index=True)
+    last = np.r_[ring_of[1:] != ring_of[:-1], True]   # ponto de fechamento de cada anel
+    return coords[~last], ring_of[~last], ring_poly, outer, geom_of
+
+
+class Topology:
+    """Arcos compartilhados e anéis de cada área, endereçados pela posição da área."""
+
+    def __init__(self, gdf, ids, quantum: float, name: str = "areas"):
+        keep = (ids >= 0) & (gdf.geometry.notna() & ~gdf.geometry.is_empty).to_numpy()
+        ids, geoms = ids[keep], gdf.geometry.to_numpy()[keep]
+        self.name, self.quantum = name, quantum
+        self.ids = sorted(set(ids.tolist()))   # mesmas posições de features.FeatureStore
+        self.pos = pos = {a: i for i, a in enumerate(self.ids)}
+        x0, y0 = shapely.total_bounds(geoms)[:2] if len(geoms) else (0.0, 0.0)
+        self.translate = (float(x0), float(y0))
+        if not len(geoms):   # camada sem geometria (GeoJSON ausente): topologia vazia
+            self.areas, self._arcs, self.nbytes = [[] for _ in self.ids], [], 0
+            return
+
+        coords, ring_of, ring_poly, outer, geom_of = _rings(geoms)
+        q = np.round((coords - self.translate) / quantum).astype(np.int64)
+        k = q[:, 0] * _M + q[:, 1]
+
+        # pontos repetidos em sequência (após a quantização) saem do anel
+        same = np.r_[False, (k[1:] == k[:-1]) & (ring_of[1:] == ring_of[:-1])]
+        k, ring_of = k[~same], ring_of[~same]
+        first = np.flatnonzero(np.r_[True, ring_of[1:] != ring_of[:-1]])
+        lastp = np.r_[first[1:], len(k)] - 1
+        wrap = np.zeros(len(k), bool)
+        wrap[lastp[(k[lastp] == k[first]) & (lastp > first)]] = True   # último ponto igual ao primeiro
+        k, ring_of = k[~wrap], ring_of[~wrap]
+
+        # vizinhos (cíclicos) de cada ponto no seu anel
+        first = np.flatnonzero(np.r_[True, ring_of[1:] != ring_of[:-1]])
+        size = np.diff(np.r_[first, len(k)])
+        lastp = first + size - 1
+        prev, nxt = np.roll(k, 1), np.roll(k, -1)
+        prev[first], nxt[lastp] = k[lastp], k[first]
+
+        # junção: o mesmo ponto com pares de vizinhos diferentes em algum anel
+        pairs = np.unique(np.column_stack([k, np.minimum(prev, nxt), np.maximum(prev, nxt)]), axis=0)
+        kk, cnt = np.unique(pairs[:, 0], return_counts=True)
+        junction = np.isin(k, kk[cnt > 1])
+
+        arcs: dict[bytes, int] = {}
+        seqs: list[np.ndarray] = []
+
+        def arc(seq: np.ndarray) -> int:
+            b = seq.tobytes()
+            if b in arcs:
+                return arcs[b]
+            r = seq[::-1].tobytes()
+            if r in arcs:
+                return ~arcs[r]
+            arcs[b] = len(seqs)
+            seqs.append(seq)
+            return arcs[b]
+
+        ring_arcs: dict[int, list[int]] = {}
+        for r, f, n in zip(ring_of[first], first, size):
+            if n < 3:
+                continue
+            ks, js = k[f:f + n], np.flatnonzero(junction[f:f + n])
+            if not len(js):   # anel sem junções: um arco fechado, em forma canônica
+                ks = np.roll(ks, -int(np.argmin(ks)))
+                if ks[1] < ks[-1]:
+                    ring_arcs[r] = [arc(np.r_[ks, ks[:1]])]
+                else:
+                    ring_arcs[r] = [~arc(np.r_[ks[:1], ks[:0:-1], ks[:1]])]
+                continue
+            ks = np.roll(ks, -int(js[0]))
+            js = np.r_[js - js[0], n]
+            ks = np.r_[ks, ks[:1]]
+            ring_arcs[r] = [arc(ks[a:b + 1]) for a, b in zip(js[:-1], js[1:])]
+
+        # áreas: polígonos (externo + furos) com as referências aos arcos
+        polys: dict[int, list[list[int]]] = {}
+        for r, p in enumerate(ring_poly):
+            if r in ring_arcs and (outer[r] or p in polys):
+                polys.setdefault(p, []).append(ring_arcs[r])
+        self.areas: list[list] = [[] for _ in self.ids]
+        for p, rings in polys.items():
+            self.areas[pos[int(ids[geom_of[p]])]].append(rings)
+
+        self._arcs = []
+        for seq in seqs:
+            xy = np.column_stack([seq // _M, seq % _M])
+            xy[1:] = np.diff(xy, axis=0)
+            self._arcs.append(json.dumps(xy.tolist(), separators=(",", ":")).encode())
+        self.nbytes = sum(map(len, self._arcs))
+
+    def positions(self, ids) -> list[int]:
+        """Posições (ordenadas, sem repetição) das áreas conhecidas de ``ids``."""
+        return sorted({self.pos[a] for a in map(int, ids) if a in self.pos})
+
+    def collection(self, pos) -> bytes:
+        """TopoJSON das áreas nas posições ``pos`` (inválidas são ignoradas)."""
+        pos = [i for i in pos if 0 <= i < len(self.areas)]
+        used = sorted({a if a >= 0 else ~a for i in pos for poly in self.areas[i] for ring in poly for a in ring})
+        new = {a: j for j, a in enumerate(used)}
+        remap = lambda a: new[a] if a >= 0 else ~new[~a]
+        geoms = [{"type": "MultiPolygon", "id": self.ids[i],
+                  "arcs": [[[remap(a) for a in ring] for ring in poly] for poly in self.areas[i]]}
+                 for i in pos if self.areas[i]]
+        head = {"type": "Topology",
+                "transform": {"scale": [self.quantum, self.quantum], "translate": list(self.translate)},
+                "objects": {self.name: {"type": "GeometryCollection", "geometries": geoms}}}
+        head = json.dumps(head, ensure_ascii=False, separators=(",", ":")).encode()
+        return head[:-1] + b',"arcs":[' + b",".join(self._arcs[a] for a in used) + b"]}"
@@ -0,0 +1,116 @@
+# app/warmup.py
+"""
+Aquecimento das visões padrão de cada dashboard na subida do servidor.
+
+Cada dashboard recebe, pelo cliente de testes do Flask, as mesmas
+requisições que o navegador faz ao abrir a página: o layout e a chamada
+inicial dos callbacks que leem o filtro (``filter-store.data``: figuras e
+opções da lista de áreas) com anos padrão, todas as categorias e nenhum
+estado; em seguida, o mesmo filtro com cada estado escolhido no modal. Um
+callback que falha é registrado no log e pulado. Tudo passa pelo
+pipeline normal: os agregados ficam no cache do processo (``query_cache``) e
+as respostas serializadas no cache de figuras (``figure_cache``), de modo que
+o primeiro usuário após um deploy já encontra as visões prontas.
+
+Com ``preload_app`` o aquecimento roda no master, antes do fork: os workers
+nascem com o cache de agregados preenchido.
+
+    SIMEX_WARMUP=1         # visão padrão + uma visão por estado
+    SIMEX_WARMUP=default   # só a visão padrão
+"""
+from __future__ import annotations
+
+import logging, os, time
+
+log = logging.getLogger(__name__)
+
+FILTER = "filter-store.data"            # [ano inicial, ano final, categoria, estados]
+STATES = "state-dropdown-modal.options"  # estados oferecidos no modal
+
+
+def mode() -> str | None:
+    v = os.environ.get("SIMEX_WARMUP", "").lower()
+    if v in ("", "0", "false", "no", "off"):
+        return None
+    return "default" if v == "default" else "states"
+
+
+def _props(node, acc: dict) -> dict:
+    """``{"id.prop": valor}`` de todos os componentes do layout."""
+    if isinstance(node, dict):
+        props = node.get("props", {})
+        if isinstance(props.get("id"), str):
+            acc.update({f"{props['id']}.{p}": v for p, v in props.items()})
+        for v in node.values():
+            _props(v, acc)
+    elif isinstance(node, list):
+        for v in node:
+            _props(v, acc)
+    return acc
+
+
+def _fire(client, prefix: str, dep: dict, state: dict, changed: list) -> dict:
+    """Chama o callback ``dep`` como o navegador e devolve ``{"id.prop": valor}``."""
+    fill = lambda items: [dict(i, value=state.get(f"{i['id']}.{i['property']}")) for i in items]
+    outs = [dict(zip(("id", "property"), o.rsplit(".", 1))) for o in dep["output"].strip(".").split("...")]
+    r = client.post(prefix + "_dash-update-component", json={
+        "output": dep["output"], "outputs": outs if dep["output"].startswith("..") else outs[0],
+        "inputs": fill(dep["inputs"]), "state": fill(dep["state"]), "changedPropIds": changed})
+    if r.status_code == 204:
+        return {}
+    if r.status_code != 200:
+        raise RuntimeError(f"{prefix}: callback {dep['output']} respondeu {r.status_code}")
+    return {f"{cid}.{p}": v for cid, pv in r.get_json()["response"].items() for p, v in pv.items()}
+
+
+def _try(client, prefix: str, dep: dict, state: dict, changed: list, failed: list) -> dict:
+    """``_fire`` que registra a falha em ``failed`` e segue com o próximo callback."""
+    try:
+        return _fire(client, prefix, dep, state, changed)
+    except Exception as e:
+        log.warning("warm-up %s: callback %s falhou (%s); pulado", prefix, dep["output"], e)
+        failed.append(dep["output"])
+        return {}
+
+
+def warm(client, prefix: str, states: bool = True) -> dict:
+    """Aquece um dashboard; devolve os tempos (s) de cada etapa e os callbacks que falharam."""
+    t0 = time.perf_counter()
+    state = _props(client.get(prefix + "_dash-layout").get_json(), {})
+    deps = [d for d in client.get(prefix + "_dash-dependencies").get_json()
+            if not d.get("clientside_function") and not d.get("prevent_initial_call")
+            and any(f"{i['id']}.{i['property']}" == FILTER for i in d["inputs"])]
+    t1 = time.perf_counter()
+    failed: list[str] = []
+    for dep in deps:   # chamada inicial: nada disparou o callback
+        state.update(_try(client, prefix, dep, state, [], failed))
+    t2 = time.perf_counter()
+    ufs = [o["value"] for o in state.get(STATES) or []] if states and state.get(FILTER) else []
+    for uf in ufs:   # o que update_filter grava ao escolher só ``uf`` no modal
+        filtro = [*state[FILTER][:3], [uf]]
+        for dep in deps:
+            _try(client, prefix, dep, {**state, FILTER: filtro}, [FILTER], failed)
+    t3 = time.perf_counter()
+    return {"layout": t1 - t0, "default": t2 - t1, "states": t3 - t2, "n_states": len(ufs),
+            "callbacks": len(deps), "failed": failed}
+
+
+def run(server, apps) -> dict:
+    """Aquece os dashboards ``apps`` (Dash) registrados em ``server``."""
+    m = mode()
+    if m is None:
+        return {}
+    client, out = server.test_client(), {}
+    t = time.perf_counter()
+    for app in apps:
+        prefix = app.config.routes_pathname_prefix
+        try:
+            out[prefix] = tm = warm(client, prefix, states=m == "states")
+        except Exception as e:   # aquecimento nunca impede a subida
+            log.warning("warm-up %s falhou: %s", prefix, e)
+            continue
+        log.info("warm-up %s: %d callbacks, layout %.2fs, visão padrão %.2fs, %d estados %.2fs, %d falhas",
+                 prefix, tm["callbacks"], tm["layout"], tm["default"], tm["n_states"], tm["states"],
+                 len(tm["failed"]))
+    log.info("warm-up concluído em %.2fs", time.perf_counter() - t)
+    return out
@@ -0,0 +1,14 @@
+# gunicorn.conf.py
+# O master importa app:server (preload) e carrega todos os datasets uma única
+# vez, gravando o snapshot Arrow em SIMEX_SNAPSHOT_DIR; os workers herdam os
+# dados já carregados e leem os mesmos arquivos mapeados em memória. As visões
+# padrão (e por estado) são aquecidas no master, antes do fork (app/warmup.py).
+# A pirâmide de simplificação dos mapas é gerada antes, pelo Procfile
+# (python amaz.py piramide).
+import os, tempfile
+
+preload_app = True
+
+os.environ.setdefault("SIMEX_PRELOAD", "1")
+os.environ.setdefault("SIMEX_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "simex-snapshot"))
+os.environ.setdefault("SIMEX_WARMUP", "1")
@@ -0,0 +1,47 @@
+# tests/conftest.py
+"""
+Ambiente isolado dos testes: caches (HTTP, figuras, tiles) num diretório
+temporário e uma cópia da árvore ``datasets/`` como é distribuída (tabelas
+de todos os dashboards, limites só dos municípios), mais a pirâmide de
+simplificação dos municípios gerada como no deploy (``amaz.py piramide``).
+Precisa vir antes de qualquer ``import app``, que lê as variáveis na
+importação.
+"""
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+TMP = Path(tempfile.mkdtemp(prefix="simex-tests-"))
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+
+DATA = TMP / "datasets"
+for sub in ("csv", "geojson"):
+    (DATA / sub).mkdir(parents=True)
+for f in (ROOT / "datasets" / "csv").glob("*.parquet"):
+    (DATA / "csv" / f.name).symlink_to(f)
+(DATA / "geojson" / "limite_municipios_amz_legal.geojson").symlink_to(
+    ROOT / "datasets" / "geojson" / "limite_municipios_amz_legal.geojson")
+
+os.environ.update(SIMEX_DATA_DIR=str(DATA), SIMEX_CACHE_DIR=str(TMP / "cache"),
+                  SIMEX_FIGURE_CACHE_MB="0", SIMEX_REMOTE="0", SIMEX_WARMUP="0")
+os.environ.pop("SIMEX_PRELOAD", None)
+subprocess.run([sys.executable, "amaz.py", "piramide", "municipios"], cwd=ROOT, check=True,
+               stdout=subprocess.DEVNULL)
+
+
+@pytest.fixture(scope="session")
+def server():
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture()
+def client(server):
+    return server.test_client()
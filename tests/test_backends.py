@@ -0,0 +1,59 @@
+# tests/test_backends.py
+"""Backends de consulta × cubo pandas nos parquets distribuídos, com filtros aleatórios."""
+import random
+
+import pytest
+
+from app import datasets
+from app.bench import _same
+
+ENGINES = ["duckdb", "polars"]
+N = 25   # filtros por dataset
+
+
+def _filters(rnd, df, ids):
+    ufs, cats = list(df["sigla_uf"].cat.categories), list(df["categoria"].cat.categories)
+    for t in range(N):
+        yield dict(y0=rnd.choice([2008, 2010, 2015]), y1=rnd.choice([2018, 2023]),
+                   cat=rnd.choice([None, *cats]), ufs=rnd.sample(ufs, rnd.randint(0, 3)),
+                   entities=rnd.sample(ids, rnd.randint(1, 5)) if t % 2 else None)
+
+
+@pytest.mark.parametrize("key", list(datasets.DATASETS))
+@pytest.mark.parametrize("engine", ENGINES)
+def test_mesmos_resultados(engine, key, monkeypatch):
+    pytest.importorskip(engine)
+    df = datasets.load_parquet(key)
+    ref = datasets._pandas_cube(key, df)
+    c = datasets.new_cube(key, engine, datasets._parquet_file(key))
+    ids, rnd = list(datasets.labels(key).index), random.Random(key)
+    for f in _filters(rnd, df, ids):
+        args = (f["y0"], f["y1"], f["cat"], f["ufs"], f["entities"])
+        for q in ("totals", "by_uf", "series", "active_years"):
+            assert _same(getattr(ref, q)(*args), getattr(c, q)(*args)), (q, f)
+        focus = rnd.sample(ids, 4)
+        assert _same(ref.matrix(*args, focus=focus), c.matrix(*args, focus=focus)), ("matrix", f)
+        for col in ref.first:
+            for uf in (False, True):
+                a, b = ref.by_attribute(col, *args, uf=uf), c.by_attribute(col, *args, uf=uf)
+                assert _same(a, b) and a.dtypes.equals(b.dtypes), ("by_attribute", col, uf, f)
+    for col in ref.first:
+        assert ref.attribute(col).equals(c.attribute(col)), col
+
+    # exportação CSV: mesmas linhas, tipos e texto
+    rows = [datasets.filtered(key, f["y0"], f["y1"], f["cat"], f["ufs"], f["entities"])
+            for f in _filters(random.Random(key), df, ids)]
+    monkeypatch.setitem(datasets._cubes, key, c)
+    for f, a in zip(_filters(random.Random(key), df, ids), rows):
+        b = datasets.filtered(key, f["y0"], f["y1"], f["cat"], f["ufs"], f["entities"])
+        assert a.dtypes.equals(b.dtypes), f
+        assert datasets.to_ascii(key, a).to_csv(sep=";") == datasets.to_ascii(key, b).to_csv(sep=";"), f
+
+
+def test_backend_por_dashboard(monkeypatch):
+    pytest.importorskip("polars")
+    from app.lazy import LazyCube
+    monkeypatch.setenv("SIMEX_QUERY_BACKEND_TI", "polars")
+    monkeypatch.setattr(datasets, "_cubes", {})
+    assert isinstance(datasets.cube("ti"), LazyCube)
+    assert isinstance(datasets.cube("uc"), datasets.Cube)
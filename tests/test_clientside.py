@@ -0,0 +1,62 @@
+# tests/test_clientside.py
+"""Callbacks do navegador (``app.clientside``) executados no Node."""
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from app import clientside
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node ausente")
+
+NO = "no_update"
+RESET = "reset-button-top.n_clicks"
+
+
+def _run(fn: str, calls: list) -> list:
+    """Resultado de ``fn`` para cada ``(disparos, args)`` de ``calls``."""
+    js = f"""
+const fn = {fn};
+const calls = {json.dumps(calls)};
+const out = calls.map(([trig, args]) => {{
+    window.dash_clientside = {{no_update: "{NO}",
+                               callback_context: {{triggered: trig.map(p => ({{prop_id: p}}))}}}};
+    return fn(...args);
+}});
+console.log(JSON.stringify(out));
+"""
+    r = subprocess.run(["node", "-e", "globalThis.window = globalThis;" + js],
+                       capture_output=True, text=True, check=True)
+    return json.loads(r.stdout)
+
+
+def _bar(**point):
+    return {"points": [point]}
+
+
+def test_destaques():
+    bar = "bar-graph-yearly.clickData"
+    assert _run(clientside.HIGHLIGHTS, [
+        [[bar], [_bar(customdata=5), None, None]],           # liga
+        [[bar], [_bar(customdata=5), None, [3, 5]]],         # desliga
+        [[bar], [_bar(customdata=[7, "Nome (PA)"]), None, [3]]],
+        [[RESET], [_bar(customdata=5), 1, [3, 5]]],          # reset limpa tudo
+        [[bar], [_bar(x=10), None, [3]]],                    # ponto sem área: ignorado
+        [[bar], [{"points": []}, None, [3]]],
+        [[bar], [None, None, [3]]],
+    ]) == [[5], [3], [3, 7], [], NO, NO, NO]
+
+
+@pytest.mark.parametrize("modal", [True, False])
+def test_areas(modal):
+    click, lista = "choropleth-map.clickData", "area-dropdown.value"
+    listed = [["A", "B"], None] if modal else [NO, None]
+    assert _run(clientside.areas(modal), [
+        [[click], [_bar(location=9), None, None, []]],            # liga
+        [[click], [_bar(location=9), None, None, [4, 9]]],        # desliga
+        [[click], [_bar(z=1.5), None, None, [4]]],                # ponto sem área: ignorado
+        [[RESET], [_bar(location=9), ["A"], 1, [4, 9]]],          # reset limpa áreas e lista
+        [[lista], [None, ["A", "B"], None, [4]]],
+        [[lista], [None, [], None, [4]]],
+    ]) == [[[9], NO], [[4], NO], [NO, NO], [[], None], listed, [NO, None]]
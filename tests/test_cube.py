@@ -0,0 +1,77 @@
+# tests/test_cube.py
+"""Consultas do cubo × ``groupby`` do pandas na tabela filtrada."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import datasets
+from app.bench import _same
+from app.cube import Cube
+
+ID = datasets.AREA_ID
+
+
+def _frame(key):
+    """Tabela do dataset com a coluna de ids, como a que alimenta o cubo
+    (``area_ha`` em float64, a precisão das somas do cubo)."""
+    spec, df = datasets.DATASETS[key], datasets.load_parquet(key)
+    if spec.get("dedup"):
+        df = df.drop_duplicates(subset=list(spec["dedup"]))
+    ids = datasets.labels(key).index
+    return df.assign(**{ID: pd.Categorical.from_codes(ids.get_indexer(datasets._row_ids(key, df)), categories=ids),
+                        "area_ha": df["area_ha"].astype("float64")})
+
+
+def _filters(df):
+    ufs, cats = list(df["sigla_uf"].cat.categories), list(df["categoria"].cat.categories)
+    ids = list(df[ID].cat.categories)
+    return [(2008, 2023, None, [], None),          # sem filtro
+            (2019, 2019, None, [], None),          # um ano só
+            (2016, 2023, cats[0], [], None),
+            (2010, 2020, cats[-1], ufs[:2], None),
+            (2012, 2023, None, ufs[-1:], ids[::7]),
+            (2015, 2015, cats[0], ufs[:1], ids[:40])]
+
+
+def _sub(df, y0, y1, cat, ufs, entities):
+    m = df["ano"].between(y0, y1)
+    if cat:
+        m &= df["categoria"] == cat
+    if ufs:
+        m &= df["sigla_uf"].isin(ufs)
+    if entities:
+        m &= df[ID].isin(entities)
+    return df[m]
+
+
+@pytest.mark.parametrize("key", list(datasets.DATASETS))
+def test_cubo_igual_ao_groupby(key):
+    df = _frame(key)
+    first = datasets.DATASETS[key].get("first", ())
+    cube = Cube(df, ID, first=first)
+    attrs = df.drop_duplicates(ID).set_index(ID)
+    for f in _filters(df):
+        sub = _sub(df, *f)
+        totals = sub.groupby(ID, observed=True)["area_ha"].sum().reset_index()
+        for col in first:
+            totals[col] = totals[ID].map(sub.drop_duplicates(ID).set_index(ID)[col]).to_numpy(object)
+        assert _same(cube.totals(*f), totals), ("totals", f)
+
+        by_uf = (sub.dropna(subset=[ID])   # linhas sem UF entram, sem área não
+                 .groupby([ID, "sigla_uf"], observed=True, dropna=False)["area_ha"].sum().reset_index())
+        assert _same(cube.by_uf(*f), by_uf), ("by_uf", f)
+
+        series = sub.groupby(["ano", ID], observed=True)["area_ha"].sum().reset_index()
+        assert _same(cube.series(*f), series), ("series", f)
+
+        focus = [*series[ID].drop_duplicates()[:5], -1]   # -1: área desconhecida
+        years = np.arange(f[0], f[1] + 1)
+        matrix = series.pivot_table(index=ID, columns="ano", values="area_ha", aggfunc="sum", observed=True)
+        assert _same(cube.matrix(*f, focus=focus),
+                     matrix.reindex(index=focus, columns=years, fill_value=0).fillna(0).to_numpy()), ("matrix", f)
+
+        for col in first:
+            s = sub.assign(**{col: sub[ID].map(attrs[col]).astype(object), "sigla_uf": sub["sigla_uf"].astype(object)})
+            assert _same(cube.by_attribute(col, *f), s.groupby(col)["area_ha"].sum().reset_index()), (col, f)
+            assert _same(cube.by_attribute(col, *f, uf=True),
+                         s.groupby(["sigla_uf", col])["area_ha"].sum().reset_index()), (col, "uf", f)
@@ -0,0 +1,87 @@
+# tests/test_datasets.py
+import logging
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import datasets
+
+
+def _mojibake(s: str, layers: int = 1) -> str:
+    """UTF-8 lido como CP1252 (bytes que ele não define ficam como Latin-1)."""
+    for _ in range(layers):
+        s = "".join(bytes((b,)).decode("cp1252", errors="ignore") or chr(b) for b in s.encode("utf-8"))
+    return s
+
+
+@pytest.mark.parametrize("text", ["São Félix do Xingu", "IRMÃ DOROTHY", "Pará", "Ñ ç ü — “x”"])
+def test_fix_text(text):
+    assert datasets.fix_text(text) == text                      # já correto
+    assert datasets.fix_text(_mojibake(text)) == text           # uma camada
+    assert datasets.fix_text(_mojibake(text, 2)) == text        # duas camadas
+    assert datasets.fix_text(_mojibake(text, 3)) == text
+
+
+@pytest.mark.parametrize("text", ["", "Altamira", "ACRE - AC", "ÃE", "Ã©rico é"])
+def test_fix_text_sem_mojibake(text):
+    assert datasets.fix_text(text) == text
+
+
+def test_versao_sem_geojson_nao_procura_de_novo(monkeypatch, caplog):
+    v = datasets.version("uc")   # uc não tem limites na árvore distribuída
+    assert datasets.load_geojson("uc").empty
+
+    def resolve(*a):
+        raise AssertionError("origem procurada de novo")
+
+    monkeypatch.setattr(datasets, "resolve", resolve)
+    monkeypatch.setattr(datasets, "local_path", resolve)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.datasets"):
+        assert all(datasets.version("uc") == v for _ in range(5))
+        assert datasets.load_geojson("uc", 6) is datasets.load_geojson("uc")
+    assert not caplog.records
+
+
+def test_versao_muda_com_a_origem(monkeypatch):
+    v = datasets.version("municipios")
+    assert datasets.version("municipios") == v
+    monkeypatch.setitem(datasets._versions, ("municipios", "geojson"), "outra")
+    assert datasets.version("municipios") != v
+
+
+def test_filtered_igual_as_mascaras():
+    key = "municipios"
+    df, rnd = datasets.load_parquet(key), random.Random(0)
+    ids = datasets._row_ids(key, df)
+    ufs, cats, areas = list(df["sigla_uf"].cat.categories), list(df["categoria"].cat.categories), sorted(set(ids))
+    for t in range(30):
+        y0, y1 = rnd.choice([None, 2010, 2016]), rnd.choice([None, 2019, 2023])
+        cat, sel = rnd.choice([None, *cats]), rnd.sample(ufs, rnd.randint(0, 3))
+        ar = rnd.sample(areas, rnd.randint(1, 20)) if t % 2 else None
+        m = np.ones(len(df), bool)
+        if y0 is not None: m &= (df["ano"] >= y0).to_numpy()
+        if y1 is not None: m &= (df["ano"] <= y1).to_numpy()
+        if cat: m &= (df["categoria"] == cat).to_numpy()
+        if sel: m &= df["sigla_uf"].isin(sel).to_numpy()
+        if ar: m &= np.isin(ids, ar)
+        assert datasets.filtered(key, y0, y1, cat, sel, ar).equals(df[m])
+
+
+@pytest.mark.parametrize("key", list(datasets.DATASETS))
+def test_ids_unicos_por_nome_e_uf(key):
+    df = datasets.load_parquet(key)
+    t = pd.DataFrame({"name": df[datasets.DATASETS[key]["entity"]].astype(str),
+                      "uf": df["sigla_uf"].astype(str), "id": datasets._row_ids(key, df)})
+    t = t[t["id"] >= 0]
+    assert (t.groupby(["name", "uf"])["id"].nunique() == 1).all()
+    assert (t.groupby("id")["name"].nunique() == 1).all()   # nomes diferentes, ids diferentes
+
+
+def test_colisao_de_crc32(monkeypatch):
+    assert datasets._name_ids(["a", "b"]) == {n: datasets.name_id(n) for n in "ab"}
+    monkeypatch.setattr(datasets, "name_id", lambda name: 7)
+    with pytest.raises(datasets.DatasetError, match="colisão"):
+        datasets._name_ids(["a", "b"])
@@ -0,0 +1,23 @@
+# tests/test_download.py
+import pytest
+
+PREFIXES = ["/simex/assentamentos/", "/simex/imoveis_rurais/", "/simex/municipios/",
+            "/simex/terra_dest/", "/simex/terras_indigenas/", "/simex/uc/"]
+
+
+@pytest.mark.parametrize("prefix", PREFIXES)
+def test_download_csv(client, prefix, capsys):
+    dep = next(d for d in client.get(prefix + "_dash-dependencies").get_json()
+               if d["output"] == "download-dataframe-csv.data")
+    # por id (separador, acentos) ou, nos demais, por propriedade (botão, checklist de estados)
+    value = {"decimal-separator": ";", "remove-accents": True, "n_clicks": 1, "value": ["PA"]}
+    fill = lambda items: [dict(i, value=value.get(i["id"], value.get(i["property"]))) for i in items]
+    r = client.post(prefix + "_dash-update-component", json={
+        "output": dep["output"], "outputs": {"id": "download-dataframe-csv", "property": "data"},
+        "inputs": fill(dep["inputs"]), "state": fill(dep["state"]), "changedPropIds": [dep["inputs"][0]["id"] + ".n_clicks"]})
+    assert r.status_code == 200
+    csv = r.get_json()["response"]["download-dataframe-csv"]["data"]["content"]
+    head, *rows = csv.splitlines()
+    uf = head.split(";").index("sigla_uf")
+    assert rows and {r.split(";")[uf] for r in rows} == {"PA"}
+    assert capsys.readouterr().out == ""   # sem print de depuração
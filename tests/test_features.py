@@ -0,0 +1,58 @@
+# tests/test_features.py
+import copy
+import logging
+
+from app import datasets, features
+
+MAP = {"output": "choropleth-map.figure", "outputs": {"id": "choropleth-map", "property": "figure"},
+       "inputs": [{"id": "filter-store", "property": "data", "value": [2016, 2023, None, None]},
+                  {"id": "selected-area", "property": "data", "value": []},
+                  {"id": "selected-areas-store", "property": "data", "value": []},
+                  {"id": "choropleth-map", "property": "relayoutData", "value": None}],
+       "changedPropIds": []}
+URL = "/simex/municipios/_dash-update-component"
+
+
+def _zoom(zoom):
+    """Requisição do mapa depois que o usuário deixou o zoom em ``zoom``."""
+    body = copy.deepcopy(MAP)
+    body["inputs"][3]["value"] = {"mapbox.center": {"lon": -55.0, "lat": -5.0}, "mapbox.zoom": zoom}
+    body["changedPropIds"] = ["choropleth-map.relayoutData"]
+    return body
+
+
+def test_zoom_do_usuario_troca_o_nivel(client):
+    fig = client.post(URL, json=MAP).get_json()["response"]["choropleth-map"]["figure"]
+    assert fig["layout"]["mapbox"]["zoom"] < 5 and "/z4/" in fig["data"][0]["geojson"]
+
+    # zoom 4 → 9: só a URL das feições muda, agora no nível base
+    patch = client.post(URL, json=_zoom(9.2)).get_json()["response"]["choropleth-map"]["figure"]
+    [op] = patch["operations"]
+    assert op["location"] == ["data", 0, "geojson"]
+    assert op["params"]["value"] == fig["data"][0]["geojson"].replace("/z4/", "/base/")
+
+    patch = client.post(URL, json=_zoom(6.5)).get_json()["response"]["choropleth-map"]["figure"]
+    assert "/z6/" in patch["operations"][0]["params"]["value"]
+
+
+def test_zoom_do_usuario_ignorado_ao_reenquadrar(client):
+    # filtro novo: a figura inteira volta à visão do servidor, e as feições também
+    body = _zoom(9.2)
+    body["changedPropIds"] = ["filter-store.data"]
+    fig = client.post(URL, json=body).get_json()["response"]["choropleth-map"]["figure"]
+    assert "/z4/" in fig["data"][0]["geojson"]
+
+
+def test_piramide_ausente(monkeypatch, caplog, tmp_path):
+    local_path = datasets.local_path
+    monkeypatch.setattr(datasets, "local_path",
+                        lambda key, kind: tmp_path / kind if kind.startswith("geojson.z") else local_path(key, kind))
+    monkeypatch.setattr(datasets, "_cache", {k: v for k, v in datasets._cache.items() if not k[1].startswith("geojson.z")})
+    monkeypatch.setattr(datasets, "_missing", set())
+    monkeypatch.setattr(datasets, "_coarse", set())
+
+    with caplog.at_level(logging.WARNING, "app.datasets"):
+        for z in (4, 6, 8):
+            assert datasets.load_geojson("municipios", z) is datasets.load_geojson("municipios")
+    assert sum("amaz.py piramide municipios" in r.getMessage() for r in caplog.records) == 1
+    assert "/base/" in features.url("municipios", [1], 4.0)
@@ -0,0 +1,78 @@
+# tests/test_figure_cache.py
+import dash
+import flask
+import pytest
+from dash import Input, Output, dcc, html
+
+from app import datasets, figure_cache, tiles
+
+
+@pytest.fixture()
+def app(monkeypatch, tmp_path):
+    """Dashboard mínimo com um mapa (camada de tiles) servido pelo cache de figuras."""
+    monkeypatch.setattr(figure_cache, "MAX_BYTES", 2**20)
+    monkeypatch.setattr(figure_cache, "CACHE", figure_cache.FigureCache(tmp_path / "figures.sqlite", 2**20))
+    app = dash.Dash(__name__, server=flask.Flask(__name__), url_base_pathname="/t/")
+    app.layout = html.Div([dcc.Store(id="filtro", data=1), dcc.Graph(id="mapa")])
+    app.calls = []
+
+    @app.callback(Output("mapa", "figure"), Input("filtro", "data"), Input("mapa", "clickData"))
+    def mapa(filtro, click):
+        app.calls.append(filtro)
+        return {"data": [], "layout": {"mapbox": {"layers": [tiles.layer("municipios")]}}}
+
+    figure_cache.install(app, "municipios")
+    return app
+
+
+def _body(filtro=1, click=None, changed=("filtro.data",), relayout=None):
+    inputs = [{"id": "filtro", "property": "data", "value": filtro},
+              {"id": "mapa", "property": "clickData", "value": click}]
+    if relayout is not None:
+        inputs.append({"id": "mapa", "property": "relayoutData", "value": relayout})
+    return {"output": "mapa.figure", "outputs": {"id": "mapa", "property": "figure"},
+            "inputs": inputs, "changedPropIds": list(changed)}
+
+
+def _post(app, body, base_url="http://localhost"):
+    r = app.server.test_client().post("/t/_dash-update-component", json=body, base_url=base_url)
+    assert r.status_code == 200
+    return r.get_data()
+
+
+def test_acerto_com_as_mesmas_entradas(app):
+    first = _post(app, _body())
+    assert _post(app, _body()) == first
+    assert app.calls == [1] and figure_cache.CACHE.hits == 1
+    _post(app, _body(filtro=2))
+    assert app.calls == [1, 2]
+
+
+def test_versao_nova_dos_dados(app, monkeypatch):
+    _post(app, _body())
+    monkeypatch.setattr(datasets, "version", lambda key: "outra")
+    _post(app, _body())
+    assert app.calls == [1, 1] and figure_cache.CACHE.hits == 0
+
+
+def test_clique_antigo_nao_muda_a_chave():
+    key = lambda body: figure_cache.request_key("t", "c", "v", body)
+    click = {"points": [{"location": 3}]}
+    assert key(_body(click=click)) == key(_body())
+    assert key(_body(click=click, changed=["mapa.clickData"])) != key(_body(changed=["mapa.clickData"]))
+
+
+def test_relayout_conta_so_o_nivel():
+    key = lambda zoom: figure_cache.request_key("t", "c", "v", _body(relayout={"mapbox.zoom": zoom}))
+    assert key(9.2) == key(11.5) and key(4.1) == key(4.9)
+    assert key(4.9) != key(5.1) != key(9.2)
+
+
+def test_origem_fora_da_chave(app):
+    local = _post(app, _body())
+    other = _post(app, _body(), base_url="http://example.org")
+    assert app.calls == [1] and figure_cache.CACHE.hits == 1
+    url = lambda origin: tiles.url("municipios").replace(tiles.origin(), origin).replace("/", "\\u002f")
+    with app.server.test_request_context():
+        assert url("http://localhost").encode() in local
+        assert url("http://example.org").encode() in other and b"localhost" not in other
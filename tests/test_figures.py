@@ -0,0 +1,43 @@
+# tests/test_figures.py
+"""``Patch`` das figuras (``figures.partial``) × figura inteira recalculada."""
+import copy
+
+import pytest
+
+from app import warmup
+
+PREFIXES = ["/simex/assentamentos/", "/simex/imoveis_rurais/", "/simex/municipios/",
+            "/simex/terra_dest/", "/simex/terras_indigenas/", "/simex/uc/"]
+STORES = ["selected-areas-store.data", "selected-area.data"]   # cliques que viram Patch
+
+
+def _apply(fig: dict, patch: dict) -> dict:
+    out = copy.deepcopy(fig)
+    for op in patch["operations"]:
+        assert op["operation"] == "Assign", op
+        *path, last = op["location"]
+        node = out
+        for k in path:
+            node = node[k]
+        node[last] = op["params"]["value"]
+    return out
+
+
+@pytest.mark.parametrize("prefix", PREFIXES)
+def test_patch_igual_a_figura_inteira(client, prefix):
+    state = warmup._props(client.get(prefix + "_dash-layout").get_json(), {})
+    deps = [d for d in client.get(prefix + "_dash-dependencies").get_json()
+            if d["output"].endswith(".figure") and {i["id"] + ".data" for i in d["inputs"]} & set(STORES)]
+    assert deps
+    areas = warmup._fire(client, prefix, next(d for d in deps if d["output"] == "choropleth-map.figure"),
+                         state, [])["choropleth-map.figure"]["data"][0]["locations"][:2]
+    for store in STORES:
+        new = dict(state, **{store: areas})
+        for dep in deps:
+            if store not in {f"{i['id']}.{i['property']}" for i in dep["inputs"]}:
+                continue
+            out = dep["output"]
+            before = warmup._fire(client, prefix, dep, state, [])[out]
+            patch = warmup._fire(client, prefix, dep, new, [store])[out]
+            assert "operations" in patch, (out, store)
+            assert _apply(before, patch) == warmup._fire(client, prefix, dep, new, [])[out], (out, store)
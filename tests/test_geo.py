@@ -0,0 +1,57 @@
+# tests/test_geo.py
+"""Seleção por caixa/laço no mapa × ``intersects`` feição a feição."""
+import random
+
+import pytest
+import shapely
+
+from app import datasets, geo
+
+KEY = "municipios"
+
+
+@pytest.fixture(scope="module")
+def layer():
+    gdf = datasets.load_geojson(KEY)
+    ids = datasets.geo_ids(KEY, gdf)
+    keep = (ids >= 0) & (gdf.geometry.notna() & ~gdf.geometry.is_empty).to_numpy()
+    return shapely.make_valid(gdf.geometry.to_numpy()[keep]), ids[keep], gdf.total_bounds
+
+
+def _brute(layer, shape):
+    geoms, ids, _ = layer
+    return list(dict.fromkeys(ids[shapely.intersects(geoms, shape)].tolist()))
+
+
+def _point(rnd, bounds):
+    x0, y0, x1, y1 = bounds
+    return [rnd.uniform(x0, x1), rnd.uniform(y0, y1)]
+
+
+def test_caixa(layer):
+    rnd, idx = random.Random(1), datasets.index(KEY)
+    for _ in range(30):
+        a, b = _point(rnd, layer[2]), _point(rnd, layer[2])
+        shape = geo.selection({"range": {"mapbox": [a, b]}})   # cantos em qualquer ordem
+        assert idx.select(shape) == _brute(layer, shape)
+
+
+def test_laco(layer):
+    rnd, idx = random.Random(2), datasets.index(KEY)
+    for n in range(3, 23):
+        pts = [_point(rnd, layer[2]) for _ in range(n)]   # laços aleatórios se cruzam
+        shape = geo.selection({"lassoPoints": {"mapbox": pts}})
+        assert shape.is_valid and idx.select(shape) == _brute(layer, shape)
+
+
+def test_sem_selecao():
+    assert geo.selection(None) is None and geo.selection({"points": []}) is None
+    assert geo.selection({"lassoPoints": {"mapbox": [[0, 0], [1, 1]]}}) is None
+    assert datasets.select(KEY, None) == [] and datasets.select(KEY, {"range": {"mapbox": [[0, 0], [1, 1]]}}) == []
+
+
+def test_select_so_areas_do_cubo(layer):
+    shape_data = {"range": {"mapbox": [[-56, -8], [-50, -2]]}}
+    entities = datasets.cube(KEY).entities
+    expected = [i for i in _brute(layer, geo.selection(shape_data)) if i in entities]
+    assert expected and datasets.select(KEY, shape_data) == expected
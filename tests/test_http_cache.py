@@ -0,0 +1,95 @@
+# tests/test_http_cache.py
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app import http_cache
+
+
+class Origin(BaseHTTPRequestHandler):
+    """Origem com ETag/Last-Modified que responde 304 às revalidações."""
+    body, etag, modified, seen = b"", "", "", []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == cls.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", cls.etag)
+        self.send_header("Last-Modified", cls.modified)
+        self.send_header("Content-Length", str(len(cls.body)))
+        self.end_headers()
+        self.wfile.write(cls.body)
+
+    def log_message(self, *a):
+        pass
+
+
+def publish(body: bytes, modified: str):
+    Origin.body, Origin.etag, Origin.modified = body, f'"{hashlib.md5(body).hexdigest()}"', modified
+
+
+@pytest.fixture()
+def origin(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(http_cache, "_fresh", {})
+    Origin.seen = []
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv, f"http://127.0.0.1:{srv.server_port}/simex.parquet"
+    srv.shutdown()
+    srv.server_close()
+
+
+def restart():
+    """Novo processo: nenhuma URL revalidada ainda."""
+    http_cache._fresh.clear()
+
+
+def test_revalidacao(origin):
+    srv, url = origin
+    publish(b"v1" * 1000, "Mon, 01 Jan 2024 00:00:00 GMT")
+
+    # primeiro download: blob endereçado pelo conteúdo + registro com os validadores
+    restart()
+    blob = http_cache.cached(url)
+    meta = http_cache._read_meta(url)
+    assert blob.read_bytes() == Origin.body and blob.suffix == ".parquet"
+    assert meta["sha256"] == hashlib.sha256(Origin.body).hexdigest() and meta["etag"] == Origin.etag
+    assert meta["last_modified"] == Origin.modified and meta["size"] == len(Origin.body)
+    assert http_cache.cached(url) == blob and len(Origin.seen) == 1   # revalida uma vez por processo
+
+    # 304: reaproveita o blob
+    restart()
+    before = blob.stat().st_mtime_ns
+    assert http_cache.cached(url) == blob and blob.stat().st_mtime_ns == before
+    assert Origin.seen[-1]["If-None-Match"] == Origin.etag
+    assert Origin.seen[-1]["If-Modified-Since"] == Origin.modified
+
+    # 200 com conteúdo novo: substitui
+    publish(b"v2" * 1000, "Tue, 02 Jan 2024 00:00:00 GMT")
+    restart()
+    new = http_cache.cached(url)
+    assert new != blob and new.read_bytes() == b"v2" * 1000
+    assert http_cache._read_meta(url)["etag"] == Origin.etag
+
+    # rede fora do ar: usa a cópia em cache
+    srv.shutdown()
+    srv.server_close()
+    restart()
+    assert http_cache.cached(url, retries=1, timeout=2) == new
+
+
+def test_sem_rede_e_sem_copia(origin):
+    srv, url = origin
+    srv.shutdown()
+    srv.server_close()
+    restart()
+    with pytest.raises(requests.RequestException):
+        http_cache.cached(url, retries=1, timeout=2)
@@ -0,0 +1,58 @@
+# tests/test_query_cache.py
+import importlib
+import types
+
+import numpy as np
+import pytest
+
+from app import query_cache
+
+
+@pytest.fixture()
+def qc(monkeypatch):
+    """``query_cache`` recarregado com limite de ~10 KB e TTL de 60 s."""
+    monkeypatch.setenv("SIMEX_QUERY_CACHE_MB", str(10240 / 2**20))
+    monkeypatch.setenv("SIMEX_QUERY_CACHE_TTL", "60")
+    yield importlib.reload(query_cache)
+    monkeypatch.undo()
+    importlib.reload(query_cache)
+
+
+def test_lru_por_bytes(qc):
+    c = qc.CACHE
+    assert c.max_bytes == 10240
+    a, b, d = (np.zeros(512) for _ in range(3))   # 4 KB cada: cabem dois
+    c.put("a", a); c.put("b", b)
+    assert c.get("a") is a                          # "a" passa a ser o mais recente
+    c.put("d", d)
+    assert c.get("b") is None and c.get("a") is a and c.get("d") is d
+    assert c.evictions == 1 and c.bytes == 8192
+    c.put("grande", np.zeros(2048))                 # maior que o limite: não entra
+    assert c.get("grande") is None and c.get("a") is a
+
+
+def test_ttl(qc, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(qc, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    qc.CACHE.put("k", 1)
+    now[0] += 59
+    assert qc.CACHE.get("k") == 1
+    now[0] += 2
+    assert qc.CACHE.get("k") is None and qc.CACHE.expired == 1
+
+
+def test_chave_do_filtro(qc):
+    calls = []
+
+    def ranking(*args):
+        calls.append(("ranking", args)); return len(calls)
+
+    def serie(*args):
+        calls.append(("serie", args)); return len(calls)
+
+    first = qc.cached("ti", ranking, 2016, 2023, None, ["PA", "AM"], None, [3, 1])
+    assert qc.cached("ti", ranking, "2016", 2023, "", ["AM", "PA", "PA"], [], [1, 3]) == first
+    assert calls == [("ranking", (2016, 2023, None, ["AM", "PA"], [], [1, 3]))]
+    # mesmo filtro, outra função: entrada própria
+    assert qc.cached("ti", serie, 2016, 2023, None, ["PA", "AM"], None, [3, 1]) == 2
+    assert qc.cached("uc", ranking, 2016, 2023) == 3 and len(calls) == 3
@@ -0,0 +1,39 @@
+# tests/test_ranking.py
+"""Ranking × ``sort_values(kind="stable")`` com muitos empates."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ranking import Ranking
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rnd = np.random.default_rng(7)
+    return pd.DataFrame({"area": np.arange(500) * 3 + 1, "area_ha": rnd.integers(0, 40, 500).astype(float)})
+
+
+@pytest.mark.parametrize("k", [0, 1, 10, 499, 500, 600])
+def test_top_e_bottom(frame, k):
+    r = Ranking(frame, "area")
+    desc, asc = frame.sort_values("area_ha", ascending=False, kind="stable"), frame.sort_values("area_ha", kind="stable")
+    assert r.top(k)["area"].tolist() == desc["area"].head(k).tolist()
+    assert r.bottom(k)["area"].tolist() == asc["area"].head(k).tolist()
+
+
+def test_within(frame):
+    r = Ranking(frame, "area")
+    within = frame["area"].sample(60, random_state=1).tolist()
+    sub = frame[frame["area"].isin(within)]
+    assert r.top(10, within)["area"].tolist() == sub.sort_values("area_ha", ascending=False, kind="stable")["area"].head(10).tolist()
+    assert r.bottom(10, within)["area"].tolist() == sub.sort_values("area_ha", kind="stable")["area"].head(10).tolist()
+    assert r.top(10, [])["area"].tolist() == r.top(10)["area"].tolist()
+
+
+def test_rank(frame):
+    r = Ranking(frame, "area")
+    order = frame.sort_values("area_ha", ascending=False, kind="stable")["area"].tolist()
+    expected = {a: i + 1 for i, a in enumerate(order)}
+    assert r.ranks(frame["area"]).tolist() == [expected[a] for a in frame["area"]]
+    assert [r.rank(a) for a in order[:10]] == list(range(1, 11))
+    assert r.rank(2) is None and r.ranks([2, order[0]]).tolist() == [0, 1]
@@ -0,0 +1,64 @@
+# tests/test_tiles.py
+import math
+
+import pytest
+
+from app import datasets, tiles
+
+KEY = "municipios"   # única camada com limites na árvore distribuída
+
+
+def xy(z, lon, lat):
+    n = 2 ** z
+    return int((lon + 180) / 360 * n), int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+
+
+def route(version, z, x, y):
+    return f"{tiles.ROUTE}/{KEY}/{version}/{z}/{x}/{y}.mvt"
+
+
+def on_disk(z, x, y):
+    return (tiles.TILE_DIR / KEY / datasets.version(KEY) / str(z) / str(x) / f"{y}.mvt").exists()
+
+
+@pytest.fixture()
+def version(server):
+    tiles.clear()
+    return datasets.version(KEY)
+
+
+def test_tile_gravado(client, version):
+    z, (x, y) = 6, xy(6, -52.0, -5.0)   # Pará
+    r = client.get(route(version, z, x, y))
+    assert r.status_code == 200 and r.data and on_disk(z, x, y)
+    assert "immutable" in r.headers["Cache-Control"]
+
+
+def test_fora_da_camada(client, version):
+    for z, (x, y) in [(6, xy(6, 10.0, 45.0)), (3, (0, 0))]:   # Europa, Pacífico
+        assert client.get(route(version, z, x, y)).status_code == 404
+    assert client.get(f"{tiles.ROUTE}/uc/{datasets.version('uc')}/4/5/8.mvt").status_code == 404   # sem limites
+
+
+def test_versao_antiga_nao_grava(client, version):
+    z, (x, y) = 6, xy(6, -52.0, -5.0)
+    r = client.get(route("000000000000", z, x, y))
+    assert r.status_code == 200 and r.data and r.headers["Cache-Control"] == "no-cache"
+    assert not on_disk(z, x, y)
+
+
+def test_zoom_profundo_nao_grava(client, version):
+    z = tiles.ZCUT + 2
+    x, y = xy(z, -48.5, -1.45)   # Belém
+    r = client.get(route(version, z, x, y))
+    assert r.status_code == 200 and r.data and not on_disk(z, x, y)
+
+
+def test_tile_vazio_nao_grava(version):
+    src = tiles.source(KEY, None)
+    z = tiles.ZCUT
+    x0, y1 = xy(z, src.bbox[0], src.bbox[1])
+    x1, y0 = xy(z, src.bbox[2], src.bbox[3])
+    x, y = next((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                if src.inside(z, x, y) and not src.covers(z, x, y))
+    assert tiles.tile(KEY, z, x, y) == b"" and not on_disk(z, x, y)
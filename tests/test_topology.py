@@ -0,0 +1,71 @@
+# tests/test_topology.py
+import json
+
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import box
+
+from app import datasets, features, geo
+from app.topology import Topology
+
+# os seis dashboards têm o mesmo callback do mapa
+MAP = {"output": "choropleth-map.figure", "outputs": {"id": "choropleth-map", "property": "figure"},
+       "inputs": [{"id": "filter-store", "property": "data", "value": [2016, 2023, None, None]},
+                  {"id": "selected-area", "property": "data", "value": []},
+                  {"id": "selected-areas-store", "property": "data", "value": []},
+                  {"id": "choropleth-map", "property": "relayoutData", "value": None}],
+       "changedPropIds": []}
+
+
+def test_vizinhos_compartilham_arco():
+    gdf = gpd.GeoDataFrame(geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)])
+    t = Topology(gdf, np.array([10, 20]), 0.5)
+    shared = {a if a >= 0 else ~a for a in t.areas[0][0][0]} & {a if a >= 0 else ~a for a in t.areas[1][0][0]}
+    assert len(shared) == 1
+
+
+def test_sem_geometria():
+    t = Topology(gpd.GeoDataFrame(geometry=[]), np.array([], dtype=np.int64), 0.01)
+    assert t.ids == [] and t.areas == [] and t.nbytes == 0
+    assert b'"geometries":[]' in t.collection([0, 1]) and t.collection([]).endswith(b'"arcs":[]}')
+
+
+def test_mapa_de_dataset_sem_geometria(client):
+    # UC não tem GeoJSON local (nem SIMEX_REMOTE): o mapa sai em branco, sem erro 500
+    r = client.post("/simex/uc/_dash-update-component", json=MAP)
+    assert r.status_code == 200
+    trace = r.get_json()["response"]["choropleth-map"]["figure"]["data"][0]
+    assert trace["locations"]
+    r = client.get(trace["geojson"])
+    assert r.status_code == 200 and r.get_json()["objects"]["uc"]["geometries"] == []
+
+
+def _vertices(topo: bytes) -> np.ndarray:
+    """Pontos de todos os arcos do TopoJSON, decodificados (deltas → graus)."""
+    t = json.loads(topo)
+    scale, translate = np.array(t["transform"]["scale"]), np.array(t["transform"]["translate"])
+    return np.concatenate([np.cumsum(np.array(a, float), axis=0) * scale + translate for a in t["arcs"]])
+
+
+def _max_error(key: str, level) -> float:
+    """Maior distância (graus) entre os vértices decodificados e os limites carregados."""
+    s = features.store(key, level, "topojson")
+    gdf = datasets.load_geojson(key, datasets.geo_level(key, level))
+    edges = shapely.boundary(gdf.geometry.dropna().to_numpy())
+    _, dist = shapely.STRtree(edges).query_nearest(shapely.points(_vertices(s.collection(range(len(s.ids))))),
+                                                   return_distance=True)
+    return dist.max()
+
+
+@pytest.mark.parametrize("zoom", [4.9, 6.9, 8.9, geo.ZOOM[1]])
+def test_quantizacao_abaixo_de_um_pixel(zoom):
+    assert _max_error("municipios", geo.level(zoom)) < geo.pixel(zoom)
+
+
+def test_quantizacao_sem_piramide(monkeypatch):
+    # sem o arquivo do nível, os limites originais seguem na grade deles e
+    # continuam abaixo de um pixel até o zoom máximo, sem trocar de URL
+    monkeypatch.setattr(datasets, "geo_level", lambda key, level: None)
+    assert _max_error("municipios", 4) < geo.pixel(geo.ZOOM[1])
@@ -0,0 +1,24 @@
+# tests/test_warmup.py
+from app import warmup
+
+
+def test_visoes_por_estado_e_falhas(server, monkeypatch):
+    fire, calls = warmup._fire, []
+
+    def flaky(client, prefix, dep, state, changed):
+        calls.append((dep["output"], changed, state[warmup.FILTER][3]))
+        if dep["output"] == "bar-graph-yearly.figure":
+            raise RuntimeError("falhou")
+        return fire(client, prefix, dep, state, changed)
+
+    client = server.test_client()
+    layout = warmup._props(client.get("/simex/municipios/_dash-layout").get_json(), {})
+    monkeypatch.setattr(warmup, "_fire", flaky)
+    tm = warmup.warm(client, "/simex/municipios/")
+    outputs = {o for o, *_ in calls}
+    assert {"area-dropdown.options", "bar-graph-yearly.figure", "choropleth-map.figure"} <= outputs
+    assert tm["n_states"] > 0 and len(calls) == tm["callbacks"] * (1 + tm["n_states"])
+    # cada estado chega pelo filtro, como depois de update_filter
+    assert {tuple(s) for _, ch, s in calls if ch == [warmup.FILTER]} == {(o["value"],) for o in layout[warmup.STATES]}
+    # a falha das barras não interrompe os outros callbacks nem os outros estados
+    assert tm["failed"] == ["bar-graph-yearly.figure"] * (1 + tm["n_states"])